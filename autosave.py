@@ -0,0 +1,574 @@
+import os
+import re
+import struct
+import time
+import zlib
+
+import globals_
+from dirty import setSetting
+from level import DumpSnapshot
+from levelitems import InstanceDefinition_ObjectItem, InstanceDefinition_SpriteItem, InstanceDefinition_EntranceItem, InstanceDefinition_LocationItem, InstanceDefinition_CommentItem
+from undo import MoveItemUndoAction, SimultaneousUndoAction
+
+AUTOSAVE_FOLDER = 'autosave'
+AUTOSAVE_FILE = os.path.join(AUTOSAVE_FOLDER, 'autosave.bin')
+
+# Number of older autosaves that are kept around, in case the newest one is
+# damaged
+AUTOSAVE_BACKUPS = 2
+
+# Header: magic, format version, uncompressed size, crc32 of the uncompressed
+# level data, serial number of the snapshot
+HEADER = struct.Struct('>4sIIII')
+MAGIC = b'RGAS'
+VERSION = 2
+
+# Incremented whenever the autosave is cleared (e.g. because the level was
+# saved). Autosaves that were started before that are ignored when they finish.
+generation = 0
+
+
+def BackupPath(path, num):
+    """
+    Returns the path of the num'th older autosave
+    """
+    return '%s.%d' % (path, num)
+
+
+def WriteAutosave(data, serial, path=AUTOSAVE_FILE):
+    """
+    Compresses level data and writes it to the autosave file. The file is
+    written to a temporary file first and then moved into place, so a crash
+    never leaves a half-written autosave behind. Returns the path.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    compressed = zlib.compress(data, 1)
+    header = HEADER.pack(MAGIC, VERSION, len(data), zlib.crc32(data), serial)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(compressed)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # Rotate the older autosaves
+    for num in range(AUTOSAVE_BACKUPS - 1, 0, -1):
+        if os.path.isfile(BackupPath(path, num)):
+            os.replace(BackupPath(path, num), BackupPath(path, num + 1))
+
+    if AUTOSAVE_BACKUPS > 0 and os.path.isfile(path):
+        os.replace(path, BackupPath(path, 1))
+
+    os.replace(tmp, path)
+    return path
+
+
+def WriteAutosaveSnapshot(snapshot, serial, path=AUTOSAVE_FILE):
+    """
+    Turns a level snapshot into level data and writes it to the autosave file.
+    This is meant to be run on a worker thread.
+    """
+    return WriteAutosave(DumpSnapshot(snapshot), serial, path)
+
+
+def LoadAutosaveFile(path):
+    """
+    Reads and decompresses a single autosave file. Returns (data, serial), or
+    (None, 0) if the file is missing or damaged.
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None, 0
+
+    if len(raw) < HEADER.size:
+        return None, 0
+
+    magic, version, size, crc, serial = HEADER.unpack_from(raw)
+    if magic != MAGIC or version != VERSION:
+        return None, 0
+
+    try:
+        data = zlib.decompress(raw[HEADER.size:])
+    except zlib.error:
+        return None, 0
+
+    if len(data) != size or zlib.crc32(data) != crc:
+        return None, 0
+
+    return data, serial
+
+
+def ReadAutosave(path):
+    """
+    Returns (data, serial) of the newest intact autosave at path, or (None, 0)
+    """
+    if not path:
+        return None, 0
+
+    for candidate in [path] + [BackupPath(path, num) for num in range(1, AUTOSAVE_BACKUPS + 1)]:
+        data, serial = LoadAutosaveFile(candidate)
+        if data is not None:
+            return data, serial
+
+    return None, 0
+
+
+def ClearAutosave(level_path=None):
+    """
+    Marks the autosave as no longer needed, e.g. because the level was saved
+    """
+    global generation
+    generation += 1
+
+    setSetting('AutoSaveFilePath', level_path)
+    setSetting('AutoSaveFile', None)
+
+    if globals_.Journal is not None:
+        globals_.Journal.Stop()
+
+    RemoveJournals()
+
+
+################################################################################
+# Edit journal
+#
+# Between two autosave snapshots, level items that are moved, added, removed
+# or changed are appended to a journal file as it happens. Snapshot N starts
+# journal N, so the level can be recovered by loading the newest intact
+# snapshot and replaying the journals from its serial number onwards. Edits
+# the journal can't describe write a break record, which makes the next
+# autosave take a full snapshot again.
+################################################################################
+
+JOURNAL_FILE = os.path.join(AUTOSAVE_FOLDER, 'journal.%d.bin')
+JOURNAL_NAME = re.compile(r'^journal\.(\d+)\.bin$')
+
+# Header: magic, format version, serial number, serial number of the journal
+# this one continues (0 if there was no journal right before it), area number
+JOURNAL_HEADER = struct.Struct('>4sIIII')
+JOURNAL_MAGIC = b'RGJL'
+JOURNAL_VERSION = 2
+
+# Every record is prefixed by its length and crc32, so a record that was only
+# partially written before a crash is detected and ignored
+RECORD_HEADER = struct.Struct('>II')
+
+# Record: record type, kind, original x, original y, new x, new y, followed by
+# the identifying fields of the item. Edit records are followed by the
+# original fields and then the new ones; created and deleted items don't
+# move, so their original and new position are the same.
+ITEM_RECORD = struct.Struct('>BBiiii')
+
+# Record types
+RECORD_MOVE = 0
+RECORD_CREATE = 1
+RECORD_DELETE = 2
+RECORD_EDIT = 3
+RECORD_BREAK = 0xFF
+
+# The item kinds the journal can describe, indexed by the kind number
+JOURNAL_KINDS = (
+    InstanceDefinition_ObjectItem,
+    InstanceDefinition_SpriteItem,
+    InstanceDefinition_EntranceItem,
+    InstanceDefinition_LocationItem,
+    InstanceDefinition_CommentItem,
+)
+
+# A new snapshot is taken when the journal grows bigger or older than this
+JOURNAL_COMPACT_SIZE = 64 * 1024
+JOURNAL_COMPACT_AGE = 300
+
+
+def EncodeFields(values):
+    """
+    Encodes the identifying fields of an item
+    """
+    data = bytearray()
+
+    for value in values:
+        if value is None:
+            data += b'n'
+        elif isinstance(value, int):
+            data += b'i' + struct.pack('>q', value)
+        elif isinstance(value, (bytes, bytearray)):
+            data += b'b' + struct.pack('>I', len(value)) + bytes(value)
+        elif isinstance(value, str):
+            value = value.encode('utf-8')
+            data += b's' + struct.pack('>I', len(value)) + value
+        else:
+            raise TypeError(type(value))
+
+    return bytes(data)
+
+
+def DecodeFields(data, offset):
+    """
+    Decodes the identifying fields of an item, starting at offset
+    """
+    values = []
+
+    while offset < len(data):
+        tag = data[offset:offset + 1]
+        offset += 1
+
+        if tag == b'n':
+            values.append(None)
+        elif tag == b'i':
+            values.append(struct.unpack_from('>q', data, offset)[0])
+            offset += 8
+        else:
+            length, = struct.unpack_from('>I', data, offset)
+            value = data[offset + 4:offset + 4 + length]
+            offset += 4 + length
+
+            values.append(value.decode('utf-8') if tag == b's' else value)
+
+    return values
+
+
+class EditJournal:
+    """
+    Append-only journal of the edits made since the last autosave snapshot
+    """
+
+    def __init__(self, serial=0):
+        """
+        Creates an inactive journal. It becomes active when a snapshot is
+        taken (see Start).
+        """
+        self.serial = serial
+        self.file = None
+        self.broken = False
+        self.size = 0
+        self.started = 0
+
+    def Start(self, area):
+        """
+        Starts a new journal for a snapshot of the given area that is taken
+        right now. Returns the serial number of the snapshot.
+        """
+        # Changes made while there was no journal are only in the new
+        # snapshot, so the new journal can only be replayed on top of the old
+        # one if the old one was recording until now
+        previous = self.serial if self.file is not None else 0
+        self.Stop()
+
+        self.serial += 1
+        os.makedirs(AUTOSAVE_FOLDER, exist_ok=True)
+
+        self.file = open(JOURNAL_FILE % self.serial, 'wb')
+        self.file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, self.serial, previous, area))
+        self.file.flush()
+
+        self.broken = False
+        self.size = JOURNAL_HEADER.size
+        self.started = time.monotonic()
+
+        return self.serial
+
+    def Stop(self):
+        """
+        Closes the journal. Nothing is recorded until the next snapshot.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def NeedsSnapshot(self):
+        """
+        Returns whether the changes since the last snapshot can only be saved
+        by taking a new snapshot
+        """
+        if self.file is None or self.broken:
+            return True
+
+        return self.size > JOURNAL_COMPACT_SIZE or time.monotonic() - self.started > JOURNAL_COMPACT_AGE
+
+    def Write(self, payload):
+        """
+        Appends a record to the journal
+        """
+        self.file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self.file.write(payload)
+        self.file.flush()
+
+        self.size += RECORD_HEADER.size + len(payload)
+
+    def Break(self):
+        """
+        Records that a change was made that the journal can't describe. The
+        journal is not replayed past this point.
+        """
+        if self.file is None or self.broken:
+            return
+
+        self.Write(bytes([RECORD_BREAK]))
+        self.broken = True
+
+    def Record(self, recordType, defType, oldx, oldy, x, y, values):
+        """
+        Records a change to the item described by defType and values
+        """
+        if self.file is None or self.broken:
+            return
+
+        if defType not in JOURNAL_KINDS:
+            self.Break()
+            return
+
+        kind = JOURNAL_KINDS.index(defType)
+
+        try:
+            fields = EncodeFields(values)
+        except TypeError:
+            self.Break()
+            return
+
+        self.Write(ITEM_RECORD.pack(recordType, kind, oldx, oldy, x, y) + fields)
+
+    def RecordMove(self, defType, oldx, oldy, x, y, values):
+        """
+        Records that the item described by defType and values moved
+        """
+        self.Record(RECORD_MOVE, defType, oldx, oldy, x, y, values)
+
+    def RecordItemMove(self, item, oldx, oldy, x, y):
+        """
+        Records that a level item was moved
+        """
+        defType = item.instanceDef
+        values = [getattr(item, name) for name in defType.fieldNames]
+
+        self.RecordMove(defType, oldx, oldy, x, y, values)
+
+    def RecordItemCreate(self, item):
+        """
+        Records that a level item was added to the level
+        """
+        defType = item.instanceDef
+        values = [getattr(item, name) for name in defType.fieldNames]
+
+        self.Record(RECORD_CREATE, defType, item.objx, item.objy, item.objx, item.objy, values)
+
+    def RecordItemDelete(self, item):
+        """
+        Records that a level item was removed from the level
+        """
+        defType = item.instanceDef
+        values = [getattr(item, name) for name in defType.fieldNames]
+
+        self.Record(RECORD_DELETE, defType, item.objx, item.objy, item.objx, item.objy, values)
+
+    def RecordItemEdit(self, item, before):
+        """
+        Records that the position or data of a level item was changed. before
+        is an instance definition of the item from before the change.
+        """
+        if before.matches(item):
+            return
+
+        defType = type(before)
+        oldValues = [field[1] for field in before.fields]
+
+        if before.matchesData(item):
+            self.RecordMove(defType, before.objx, before.objy, item.objx, item.objy, oldValues)
+            return
+
+        values = [getattr(item, name) for name in defType.fieldNames]
+        self.Record(RECORD_EDIT, defType, before.objx, before.objy, item.objx, item.objy, oldValues + values)
+
+    def RecordAction(self, act, undo=False):
+        """
+        Records the effect of undoing or redoing an undo action
+        """
+        if self.file is None or self.broken:
+            return
+
+        if isinstance(act, SimultaneousUndoAction):
+            for child in act.children:
+                self.RecordAction(child, undo)
+
+        elif isinstance(act, MoveItemUndoAction):
+            if act.isNull():
+                return
+
+            src, dst = (act.finalDef, act.origDef) if undo else (act.origDef, act.finalDef)
+            self.RecordMove(type(src), src.objx, src.objy, dst.objx, dst.objy, [field[1] for field in src.fields])
+
+        elif not act.isNull():
+            self.Break()
+
+
+def JournalSerials():
+    """
+    Returns the serial numbers of the journals on disk, in ascending order
+    """
+    if not os.path.isdir(AUTOSAVE_FOLDER):
+        return []
+
+    serials = []
+    for name in os.listdir(AUTOSAVE_FOLDER):
+        match = JOURNAL_NAME.match(name)
+        if match is not None:
+            serials.append(int(match.group(1)))
+
+    return sorted(serials)
+
+
+def RemoveJournals(below=None):
+    """
+    Deletes the journals with a serial number lower than below, or all of
+    them. Journals that are still open are never deleted.
+    """
+    current = None
+    if globals_.Journal is not None and globals_.Journal.file is not None:
+        current = globals_.Journal.serial
+
+    for serial in JournalSerials():
+        if serial == current or (below is not None and serial >= below):
+            continue
+
+        try:
+            os.remove(JOURNAL_FILE % serial)
+        except OSError:
+            pass
+
+
+def ReadJournal(serial):
+    """
+    Reads a journal. Returns (previous, area, records, complete), where
+    records is a list of (record type, original, new) tuples, with instance
+    definitions of the item before and after the change, and complete is
+    False if the journal ended with a break record.
+    """
+    try:
+        with open(JOURNAL_FILE % serial, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return 0, None, [], False
+
+    if len(data) < JOURNAL_HEADER.size:
+        return 0, None, [], False
+
+    magic, version, file_serial, previous, area = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION or file_serial != serial:
+        return 0, None, [], False
+
+    records = []
+    offset = JOURNAL_HEADER.size
+
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        offset += RECORD_HEADER.size + length
+
+        # Truncated or damaged record: this is where the editor crashed
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+
+        if payload[0] == RECORD_BREAK:
+            return previous, area, records, False
+
+        recordType, kind, oldx, oldy, x, y = ITEM_RECORD.unpack_from(payload)
+        values = DecodeFields(payload, ITEM_RECORD.size)
+
+        defType = JOURNAL_KINDS[kind]
+        count = len(defType.fieldNames)
+
+        original = defType()
+        original.objx, original.objy = oldx, oldy
+        new = defType()
+        new.objx, new.objy = x, y
+
+        for field, value in zip(original.fields, values):
+            field[1] = value
+
+        newValues = values[count:] if recordType == RECORD_EDIT else values
+        for field, value in zip(new.fields, newValues):
+            field[1] = value
+
+        records.append((recordType, original, new))
+
+    return previous, area, records, True
+
+
+def RecoverJournal(serial):
+    """
+    Collects the edits that were made after the snapshot with the given
+    serial number. Returns (area, records); area is None if there is nothing
+    to replay.
+    """
+    journal_area = None
+    all_records = []
+
+    for journal in JournalSerials():
+        if journal < serial:
+            continue
+
+        # Only an unbroken sequence of journals can be replayed
+        if journal != serial:
+            break
+
+        previous, area, records, complete = ReadJournal(journal)
+        if area is None:
+            break
+
+        if journal_area is not None and previous != serial - 1:
+            break
+
+        serial += 1
+
+        # Consecutive journals always belong to the same area, because
+        # switching areas requires saving
+        if journal_area is not None and area != journal_area:
+            break
+
+        journal_area = area
+        all_records += records
+
+        if not complete:
+            break
+
+    return journal_area, all_records
+
+
+def ReplayJournal(records):
+    """
+    Replays recovered journal records on the currently loaded area. Returns
+    the number of records that could be replayed.
+    """
+    replayed = 0
+
+    for recordType, original, new in records:
+        if recordType == RECORD_CREATE:
+            instance = new.addNew()
+        else:
+            instance = original.findInstance()
+
+        if instance is None:
+            continue
+
+        if recordType == RECORD_DELETE:
+            instance.delete()
+            instance.setSelected(False)
+            globals_.mainWindow.scene.removeItem(instance)
+
+        elif recordType != RECORD_CREATE:
+            MoveItemUndoAction.changeObjectPos(instance, new.objx, new.objy)
+
+            if recordType == RECORD_EDIT:
+                new.applyDataTo(instance)
+
+            instance.UpdateListItem()
+
+        replayed += 1
+
+    globals_.mainWindow.levelOverview.Invalidate()
+    return replayed
@@ -9,6 +9,8 @@ from levelitems import ListWidgetItem_SortsByOther, SpriteItem, ZoneItem
 from dirty import SetDirty
 from zones import CameraModeZoomSettingsLayout
 from ui import createHorzLine
+from stageindex import StageIndex
+from screenshot import SCREENSHOT_SCALES
 
 class AboutDialog(QtWidgets.QDialog):
     """
@@ -460,6 +462,10 @@ class ScreenCapChoiceDialog(QtWidgets.QDialog):
         for i in range(len(globals_.Area.zones)):
             self.zoneCombo.addItem(globals_.trans.string('ScrShtDlg', 3, '[zone]', i + 1))
 
+        self.scaleCombo = QtWidgets.QComboBox()
+        for scale in SCREENSHOT_SCALES:
+            self.scaleCombo.addItem('%d%%' % (scale * 100))
+
         self.hide_background = QtWidgets.QCheckBox()
         self.save_img = QtWidgets.QRadioButton()
         self.save_clip = QtWidgets.QRadioButton()
@@ -473,6 +479,7 @@ class ScreenCapChoiceDialog(QtWidgets.QDialog):
 
         mainLayout = QtWidgets.QFormLayout()
         mainLayout.addRow(globals_.trans.string('ScrShtDlg', 4), self.zoneCombo)
+        mainLayout.addRow(globals_.trans.string('ScrShtDlg', 8), self.scaleCombo)
         mainLayout.addRow(globals_.trans.string('ScrShtDlg', 5), self.hide_background)
         mainLayout.addRow(globals_.trans.string('ScrShtDlg', 6), self.save_img)
         mainLayout.addRow(globals_.trans.string('ScrShtDlg', 7), self.save_clip)
@@ -768,7 +775,7 @@ class DiagnosticToolDialog(QtWidgets.QDialog):
             obj.setSelected(False)
             globals_.mainWindow.scene.removeItem(obj)
 
-        globals_.mainWindow.levelOverview.update()
+        globals_.mainWindow.levelOverview.Invalidate()
 
     def CrashSprites(self, mode='f'):
         """
@@ -788,7 +795,7 @@ class DiagnosticToolDialog(QtWidgets.QDialog):
                 sprite.delete()
                 sprite.setSelected(False)
                 globals_.mainWindow.scene.removeItem(sprite)
-                globals_.mainWindow.levelOverview.update()
+                globals_.mainWindow.levelOverview.Invalidate()
 
     def CrashSpriteSettings(self, mode='f'):
         """
@@ -888,7 +895,7 @@ class DiagnosticToolDialog(QtWidgets.QDialog):
 
         globals_.Area.sprites = globals_.Area.sprites[:max_]
         globals_.mainWindow.scene.update()
-        globals_.mainWindow.levelOverview.update()
+        globals_.mainWindow.levelOverview.Invalidate()
 
     def DuplicateEntranceIDs(self, mode='f'):
         """
@@ -1024,7 +1031,7 @@ class DiagnosticToolDialog(QtWidgets.QDialog):
             globals_.Area.zones = globals_.Area.zones[:6]
 
             globals_.mainWindow.scene.update()
-            globals_.mainWindow.levelOverview.update()
+            globals_.mainWindow.levelOverview.Invalidate()
 
     def NoZones(self, mode='f'):
         """
@@ -1224,7 +1231,7 @@ class DiagnosticToolDialog(QtWidgets.QDialog):
             z.UpdateRects()
 
         globals_.mainWindow.scene.update()
-        globals_.mainWindow.levelOverview.update()
+        globals_.mainWindow.levelOverview.Invalidate()
 
 
 class InfoPreviewWidget(QtWidgets.QWidget):
@@ -1413,3 +1420,151 @@ class CameraProfilesDialog(QtWidgets.QDialog):
 
     def updateItemTitle(self, item):
         item.setText(globals_.trans.string('CamProfsDlg', 7, '[id]', item.data(QtCore.Qt.UserRole)[0]))
+
+
+class StageSearchDialog(QtWidgets.QDialog):
+    """
+    Dialog which searches the contents of all levels in the Stage folder
+    """
+
+    def __init__(self, stage):
+        """
+        Creates and initialises the dialog
+        """
+        super(StageSearchDialog, self).__init__()
+        self.setWindowTitle(globals_.trans.string('StageSearchDlg', 0))
+        self.setWindowIcon(GetIcon('open'))
+        self.setMinimumSize(500, 400)
+
+        self.stage = stage
+        self.level = None
+        self.area = 1
+
+        self.searchType = QtWidgets.QComboBox()
+        self.searchType.addItem(globals_.trans.string('StageSearchDlg', 1))
+        self.searchType.addItem(globals_.trans.string('StageSearchDlg', 2))
+        self.searchType.addItem(globals_.trans.string('StageSearchDlg', 3))
+
+        self.searchText = QtWidgets.QLineEdit()
+        self.searchText.returnPressed.connect(self.HandleSearch)
+
+        searchButton = QtWidgets.QPushButton(globals_.trans.string('StageSearchDlg', 4))
+        searchButton.clicked.connect(self.HandleSearch)
+
+        refreshButton = QtWidgets.QPushButton(globals_.trans.string('StageSearchDlg', 5))
+        refreshButton.clicked.connect(self.HandleRebuild)
+
+        self.results = QtWidgets.QTreeWidget()
+        self.results.setHeaderLabels([globals_.trans.string('StageSearchDlg', i) for i in (6, 7, 8)])
+        self.results.setRootIsDecorated(False)
+        self.results.itemDoubleClicked.connect(self.HandleResultDoubleClicked)
+
+        self.statusLabel = QtWidgets.QLabel()
+
+        buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Open | QtWidgets.QDialogButtonBox.Cancel)
+        buttonBox.accepted.connect(self.HandleOpen)
+        buttonBox.rejected.connect(self.reject)
+
+        searchLayout = QtWidgets.QHBoxLayout()
+        searchLayout.addWidget(self.searchType)
+        searchLayout.addWidget(self.searchText, 1)
+        searchLayout.addWidget(searchButton)
+
+        bottomLayout = QtWidgets.QHBoxLayout()
+        bottomLayout.addWidget(self.statusLabel, 1)
+        bottomLayout.addWidget(refreshButton)
+
+        mainLayout = QtWidgets.QVBoxLayout()
+        mainLayout.addLayout(searchLayout)
+        mainLayout.addWidget(self.results)
+        mainLayout.addLayout(bottomLayout)
+        mainLayout.addWidget(buttonBox)
+        self.setLayout(mainLayout)
+
+        self.index = StageIndex()
+        self.finished.connect(self.index.close)
+
+        # Only the files that changed since the last time are parsed again
+        self.RefreshIndex()
+
+    def RefreshIndex(self):
+        """
+        Brings the index up to date, showing a progress dialog while doing so
+        """
+        progress = QtWidgets.QProgressDialog(globals_.trans.string('StageSearchDlg', 9), globals_.trans.string('StageSearchDlg', 10), 0, 0, self)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def update(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            return not progress.wasCanceled()
+
+        count = self.index.Refresh(self.stage, update)
+        progress.close()
+
+        self.statusLabel.setText(globals_.trans.string('StageSearchDlg', 11, '[count]', count))
+
+    def HandleRebuild(self):
+        """
+        Throws away the index and builds it again from scratch
+        """
+        self.index.CreateTables()
+        self.RefreshIndex()
+        self.HandleSearch()
+
+    def HandleSearch(self):
+        """
+        Runs the search and fills the result list
+        """
+        text = self.searchText.text().strip()
+        self.results.clear()
+
+        if not text:
+            return
+
+        type_ = self.searchType.currentIndex()
+
+        if type_ == 0:
+            try:
+                sprite = int(text, 0)
+            except ValueError:
+                return
+
+            rows = [
+                (name, path, area, globals_.trans.string('StageSearchDlg', 12, '[count]', count))
+                for name, path, area, count in self.index.FindSprite(self.stage, sprite)
+            ]
+        elif type_ == 1:
+            rows = self.index.FindTileset(self.stage, text)
+        else:
+            rows = [
+                (name, path, 1, '%s: %s' % (key, value))
+                for name, path, key, value in self.index.FindMetadata(self.stage, text)
+            ]
+
+        for name, path, area, info in rows:
+            item = QtWidgets.QTreeWidgetItem([name, str(area), info])
+            item.setData(0, QtCore.Qt.UserRole, (path, area))
+            self.results.addTopLevelItem(item)
+
+        self.results.resizeColumnToContents(0)
+        self.statusLabel.setText(globals_.trans.string('StageSearchDlg', 13, '[count]', len(rows)))
+
+    def HandleResultDoubleClicked(self, item, column):
+        """
+        Opens the level that was double-clicked
+        """
+        self.results.setCurrentItem(item)
+        self.HandleOpen()
+
+    def HandleOpen(self):
+        """
+        Accepts the dialog if a result is selected
+        """
+        item = self.results.currentItem()
+        if item is None:
+            return
+
+        self.level, self.area = item.data(0, QtCore.Qt.UserRole)
+        self.accept()
@@ -1,3 +1,5 @@
+import functools
+
 from PyQt5 import QtCore
 
 import globals_
@@ -5,6 +7,15 @@ import globals_
 def SetDirty(noautosave = False):
     if globals_.DirtyOverride > 0: return
 
+    if globals_.JournalOverride == 0 and globals_.Journal is not None:
+        # This change is not recorded in the edit journal, so the journal
+        # can't be replayed past this point anymore
+        globals_.Journal.Break()
+
+    # Lets a save that is in progress know that the level was changed after
+    # it was snapshotted
+    globals_.DirtyCount += 1
+
     if not noautosave: globals_.AutoSaveDirty = True
     if globals_.Dirty: return
 
@@ -15,6 +26,99 @@ def SetDirty(noautosave = False):
         pass
 
 
+def JournalMove(item, oldx, oldy, x, y):
+    """
+    Records an item being moved in the edit journal
+    """
+    if globals_.DirtyOverride > 0 or globals_.Journal is None: return
+
+    globals_.Journal.RecordItemMove(item, oldx, oldy, x, y)
+
+
+def JournalCreate(item):
+    """
+    Records an item being added to the level in the edit journal
+    """
+    if globals_.DirtyOverride > 0 or globals_.Journal is None: return
+
+    globals_.Journal.RecordItemCreate(item)
+
+
+def JournalDelete(item):
+    """
+    Records an item being removed from the level in the edit journal
+    """
+    if globals_.DirtyOverride > 0 or globals_.Journal is None: return
+
+    globals_.Journal.RecordItemDelete(item)
+
+
+class Journaled:
+    """
+    Context manager for changes that are recorded in the edit journal, so
+    the SetDirty calls they make don't break the journal
+    """
+
+    def __enter__(self):
+        globals_.JournalOverride += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        globals_.JournalOverride -= 1
+
+
+class JournalEdit(Journaled):
+    """
+    Context manager that records the changes made to the position and data
+    of some level items in the edit journal
+    """
+
+    def __init__(self, *items):
+        self.items = items
+        self.before = []
+
+    def __enter__(self):
+        self.before = [(item, item.instanceDef(item)) for item in self.items]
+        return Journaled.__enter__(self)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Journaled.__exit__(self, exc_type, exc_value, traceback)
+
+        if globals_.DirtyOverride > 0 or globals_.Journal is None: return
+
+        if exc_type is not None:
+            # Nobody knows how far the change got
+            globals_.Journal.Break()
+            return
+
+        for item, before in self.before:
+            globals_.Journal.RecordItemEdit(item, before)
+
+
+def JournalEditsOf(attr=None):
+    """
+    Decorator for slots that change a level item, which records the changes
+    in the edit journal. The item is in the given attribute of the slot's
+    object (e.g. of an editor widget), or is the object itself.
+    """
+    def decorator(func):
+        # Qt passes every argument of the signal, but slots may take fewer
+        count = func.__code__.co_argcount - 1
+
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            item = self if attr is None else getattr(self, attr, None)
+            if item is None:
+                return func(self, *args[:count])
+
+            with JournalEdit(item):
+                return func(self, *args[:count])
+
+        return wrapper
+
+    return decorator
+
+
 def setting(name, default=None):
     """
     Thin wrapper around QSettings, fixes the type=bool bug
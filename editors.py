@@ -3,7 +3,7 @@ import sys
 
 import globals_
 from ui import createHorzLine
-from dirty import SetDirty
+from dirty import SetDirty, JournalEditsOf
 from misc import LoadEntranceNames
 
 class EntranceEditorWidget(QtWidgets.QWidget):
@@ -182,6 +182,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
 
         self.UpdateFlag = False
 
+    @JournalEditsOf('ent')
     def HandleEntranceIDChanged(self, i):
         """
         Handler for the entrance ID changing
@@ -194,6 +195,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         self.ent.UpdateListItem()
         self.editingLabel.setText(globals_.trans.string('EntranceDataEditor', 23, '[id]', i))
 
+    @JournalEditsOf('ent')
     def HandleSpawnHalfTileLeftClicked(self, checked):
         """
         Handle for the Spawn Half a Tile Left checkbox being clicked
@@ -205,6 +207,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         else:
             self.ent.entsettings &= ~0x40
 
+    @JournalEditsOf('ent')
     def HandleEntranceTypeChanged(self, new_index):
         """
         Handler for the entrance type changing
@@ -229,6 +232,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         globals_.mainWindow.scene.update()
         self.ent.UpdateListItem()
 
+    @JournalEditsOf('ent')
     def HandleDestAreaChanged(self, i):
         """
         Handler for the destination area changing
@@ -239,6 +243,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         self.ent.UpdateTooltip()
         self.ent.UpdateListItem()
 
+    @JournalEditsOf('ent')
     def HandleDestEntranceChanged(self, i):
         """
         Handler for the destination entrance changing
@@ -249,6 +254,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         self.ent.UpdateTooltip()
         self.ent.UpdateListItem()
 
+    @JournalEditsOf('ent')
     def HandleAllowEntryClicked(self, checked):
         """
         Handle for the Allow Entry checkbox being clicked
@@ -262,6 +268,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         self.ent.UpdateTooltip()
         self.ent.UpdateListItem()
 
+    @JournalEditsOf('ent')
     def HandleUnknownFlagClicked(self, checked):
         """
         Handle for the Unknown Flag checkbox being clicked
@@ -283,6 +290,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         self.ent.UpdateTooltip()
         self.ent.UpdateListItem()
 
+    @JournalEditsOf('ent')
     def HandleConnectedPipeClicked(self, checked):
         """
         Handle for the connected pipe checkbox being clicked
@@ -300,6 +308,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         else:
             self.ent.entsettings &= ~8
 
+    @JournalEditsOf('ent')
     def HandleConnectedPipeReverseClicked(self, checked):
         """
         Handle for the connected pipe reverse checkbox being clicked
@@ -311,6 +320,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         else:
             self.ent.entsettings &= ~1
 
+    @JournalEditsOf('ent')
     def HandlePathIDChanged(self, i):
         """
         Handler for the path ID changing
@@ -319,6 +329,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         SetDirty()
         self.ent.entpath = i
 
+    @JournalEditsOf('ent')
     def HandleForwardPipeClicked(self, checked):
         """
         Handle for the forward pipe checkbox being clicked
@@ -330,6 +341,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         else:
             self.ent.entsettings &= ~4
 
+    @JournalEditsOf('ent')
     def HandleActiveLayerChanged(self, i):
         """
         Handle for the active layer changing
@@ -338,6 +350,7 @@ class EntranceEditorWidget(QtWidgets.QWidget):
         SetDirty()
         self.ent.entlayer = i
 
+    @JournalEditsOf('ent')
     def HandleCpDirectionChanged(self, i):
         """
         Handle for CP Direction changing
@@ -598,6 +611,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
     def FixTitle(self):
         self.editingLabel.setText(globals_.trans.string('LocationDataEditor', 11, '[id]', self.loc.id))
 
+    @JournalEditsOf('loc')
     def HandleLocationIDChanged(self, i):
         """
         Handler for the location ID changing
@@ -609,6 +623,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
         self.loc.UpdateTitle()
         self.FixTitle()
 
+    @JournalEditsOf('loc')
     def HandleLocationXChanged(self, i):
         """
         Handler for the location X-pos changing
@@ -622,6 +637,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
         self.loc.UpdateRects()
         self.loc.update()
 
+    @JournalEditsOf('loc')
     def HandleLocationYChanged(self, i):
         """
         Handler for the location Y-pos changing
@@ -635,6 +651,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
         self.loc.UpdateRects()
         self.loc.update()
 
+    @JournalEditsOf('loc')
     def HandleLocationWidthChanged(self, i):
         """
         Handler for the location width changing
@@ -645,6 +662,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
         self.loc.UpdateRects()
         self.loc.update()
 
+    @JournalEditsOf('loc')
     def HandleLocationHeightChanged(self, i):
         """
         Handler for the location height changing
@@ -655,6 +673,7 @@ class LocationEditorWidget(QtWidgets.QWidget):
         self.loc.UpdateRects()
         self.loc.update()
 
+    @JournalEditsOf('loc')
     def HandleSnapToGrid(self):
         """
         Snaps the current location to an 8x8 grid
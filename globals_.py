@@ -1,6 +1,8 @@
 Area = None
+AutoSaveArea = 1
 AutoSaveData = b''
 AutoSaveDirty = False
+AutoSaveJournal = None
 AutoSavePath = ''
 BgANames = None
 BgBNames = None
@@ -13,6 +15,7 @@ CurrentObject = -1
 CurrentPaintType = 0
 CurrentSprite = -1
 Dirty = False
+DirtyCount = 0
 DirtyOverride = 0
 DrawEntIndicators = False
 EditActions = None
@@ -27,6 +30,8 @@ HideResetSpritedata = False
 HelpActions = None
 Initializing = None
 InsertPathNode = False
+Journal = None
+JournalOverride = 0
 Layer0Shown = True
 Layer1Shown = True
 Layer2Shown = True
@@ -54,6 +59,8 @@ Overrides = None # 320 tiles, this is put into Tiles usually
 Overrides_safe = None
 OVERRIDE_UNKNOWN = 0
 PaddingLength = 0
+PaintProfiler = None
+PaintProfilerShown = False
 PathsFrozen = False
 PathsShown = True
 PlaceObjectsAtFullSize = True
@@ -63,6 +70,7 @@ ReggieVersionFloat = 4.9
 ReggieVersionShort = 'v4.9.0'
 ResetDataWhenHiding = False
 RestoredFromAutoSave = False
+SelectionDrag = None
 SettingsActions = None
 SpriteCategories = None
 SpriteImagesShown = True
@@ -70,12 +78,14 @@ SpriteListData = None
 SpritesFrozen = False
 SpritesShown = True
 Sprites = None
+TileCacheStatsShown = False
 Tiles = None # 0x200 tiles per tileset, plus 64 for each type of override
 TilesetAnimTimer = None
 TilesetFilesLoaded = [None, None, None, None]
 TilesetInfo = None
 TilesetNames = None
 TilesetsAnimating = False
+UseOpenGL = False
 ViewActions = None
 ZoneThemeValues = None
 
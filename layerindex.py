@@ -0,0 +1,211 @@
+from array import array
+from itertools import product
+
+import globals_
+
+# Size of an index cell, in tiles. A zoomed-in screen shows about 4x3 cells.
+INDEX_CELL_SIZE = 16
+
+# Size of a layer, in tiles
+LAYER_WIDTH = 1024
+LAYER_HEIGHT = 512
+
+# Values in a layer grid that aren't tile numbers
+GRID_EMPTY = 0
+GRID_UNKNOWN = -1
+
+
+class LayerIndex:
+    """
+    Spatial index for the objects of one layer. The level is divided into a
+    grid of square cells, and every object is filed under each cell it
+    overlaps, so finding the objects in a rect only has to look at the cells
+    the rect covers.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty index
+        """
+        self.cells = {}
+        self.rects = {}
+
+        # Cells whose objects changed since the layer grid last looked
+        self.dirty = set()
+
+    @staticmethod
+    def CellRange(rect):
+        """
+        Returns the cells a rect (in tiles) overlaps
+        """
+        x, y, width, height = rect
+
+        return product(
+            range(x // INDEX_CELL_SIZE, (x + max(width, 1) - 1) // INDEX_CELL_SIZE + 1),
+            range(y // INDEX_CELL_SIZE, (y + max(height, 1) - 1) // INDEX_CELL_SIZE + 1),
+        )
+
+    def Add(self, obj):
+        """
+        Adds an object to the index
+        """
+        rect = (obj.objx, obj.objy, obj.width, obj.height)
+        self.rects[obj] = rect
+        self.FileUnder(obj, rect)
+
+    def Remove(self, obj):
+        """
+        Removes an object from the index, if it's in it
+        """
+        rect = self.rects.pop(obj, None)
+        if rect is None: return
+
+        cells = self.cells
+
+        for key in self.CellRange(rect):
+            cell = cells[key]
+            cell.discard(obj)
+
+            if not cell:
+                del cells[key]
+
+            self.dirty.add(key)
+
+    def Update(self, obj):
+        """
+        Refiles an object after it has been moved or resized, or marks its
+        cells as changed if its tiles changed. Objects that aren't in the index
+        are ignored.
+        """
+        if obj not in self.rects: return
+
+        self.Remove(obj)
+        self.Add(obj)
+
+    def FileUnder(self, obj, rect):
+        """
+        Adds an object to every cell a rect overlaps
+        """
+        cells = self.cells
+
+        for key in self.CellRange(rect):
+            cell = cells.get(key)
+
+            if cell is None:
+                cells[key] = {obj}
+            else:
+                cell.add(obj)
+
+            self.dirty.add(key)
+
+    def ObjectsIn(self, x, y, width, height):
+        """
+        Returns a set of the objects that may overlap the given rect (in
+        tiles). Objects that only share a cell with the rect are included too,
+        so callers should still check the object rects.
+        """
+        x1 = int(x) // INDEX_CELL_SIZE
+        y1 = int(y) // INDEX_CELL_SIZE
+        x2 = int(x + width) // INDEX_CELL_SIZE + 1
+        y2 = int(y + height) // INDEX_CELL_SIZE + 1
+
+        cells = self.cells
+        found = set()
+
+        for key in product(range(x1, x2), range(y1, y2)):
+            cell = cells.get(key)
+
+            if cell is not None:
+                found |= cell
+
+        return found
+
+
+class LayerGrid:
+    """
+    The tiles of one layer, composited from its objects. Every entry is a tile
+    number, GRID_EMPTY or GRID_UNKNOWN (for objects that aren't defined in the
+    tileset). Cells that the layer index marked as changed are composited
+    again when they are drawn next.
+    """
+
+    def __init__(self, index):
+        """
+        Creates an empty grid for the layer with the given index
+        """
+        self.index = index
+        self.tiles = array('h', bytes(2 * LAYER_WIDTH * LAYER_HEIGHT))
+        self.blank = array('h', bytes(2 * INDEX_CELL_SIZE))
+
+        # How often each cell has been composited, so anything derived from
+        # a cell can tell when it's out of date
+        self.versions = {}
+
+    def Refresh(self, x1, y1, x2, y2):
+        """
+        Composites the cells in the given window (in tiles, with the end being
+        exclusive) that changed since they were last composited
+        """
+        index = self.index
+        if not index.dirty: return
+
+        cx1 = x1 // INDEX_CELL_SIZE
+        cy1 = y1 // INDEX_CELL_SIZE
+        cx2 = (x2 - 1) // INDEX_CELL_SIZE
+        cy2 = (y2 - 1) // INDEX_CELL_SIZE
+
+        visible = [key for key in index.dirty if cx1 <= key[0] <= cx2 and cy1 <= key[1] <= cy2]
+
+        for key in visible:
+            index.dirty.discard(key)
+            self.CompositeCell(key, index.cells.get(key, ()))
+
+    def CompositeCell(self, key, objects):
+        """
+        Composites one index cell from the objects in it, in Z order
+        """
+        tiles = self.tiles
+        odefs = globals_.ObjectDefinitions
+
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+        x1 = key[0] * INDEX_CELL_SIZE
+        y1 = key[1] * INDEX_CELL_SIZE
+        x2 = min(x1 + INDEX_CELL_SIZE, LAYER_WIDTH)
+        y2 = min(y1 + INDEX_CELL_SIZE, LAYER_HEIGHT)
+        if x1 >= x2 or y1 >= y2: return
+
+        blank = self.blank[:x2 - x1]
+        for y in range(y1, y2):
+            tiles[y * LAYER_WIDTH + x1:y * LAYER_WIDTH + x2] = blank
+
+        for obj in sorted(objects, key=lambda obj: obj.zValue()):
+            if obj.objdata is None: continue
+
+            unknown = odefs is None or odefs[obj.tileset] is None or odefs[obj.tileset][obj.type] is None
+
+            startx = max(x1, obj.objx)
+            endy = min(y2, obj.objy + len(obj.objdata))
+
+            for y in range(max(y1, obj.objy), endy):
+                row = obj.objdata[y - obj.objy]
+                endx = min(x2, obj.objx + len(row))
+                offset = y * LAYER_WIDTH
+
+                if unknown:
+                    for x in range(startx, endx):
+                        tiles[offset + x] = GRID_UNKNOWN
+
+                    continue
+
+                for x in range(startx, endx):
+                    tile = row[x - obj.objx]
+                    if tile > 0:
+                        tiles[offset + x] = tile
+
+    def Row(self, y, x1, x2):
+        """
+        Returns the tiles in one row of the grid, from x1 up to x2
+        """
+        offset = y * LAYER_WIDTH
+        return self.tiles[offset + x1:offset + x2]
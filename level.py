@@ -1,15 +1,35 @@
+import os
 import struct
 from PyQt5 import QtWidgets
 
 import globals_
 import spritelib as SLib
 import archive
+from libs import lh, lz77
 
 from tiles import CreateTilesets, LoadTileset
 from levelitems import EntranceItem, SpriteItem, ZoneItem, LocationItem, ObjectItem, PathItem, CommentItem
+from layerindex import LayerIndex, LayerGrid
 from misc2 import DecodeOldReggieInfo
 from spriteeditor import SpriteEditorWidget
 
+# Number of level items that are created at once while loading an area step by
+# step (see Area.LoadIter)
+LOAD_BATCH_SIZE = 64
+
+# Every object layer has its own range of Z values, starting at
+# (2 - layer) * LAYER_Z_RANGE. Objects are numbered with gaps, so an object can
+# be inserted between two others by giving it the Z value in the middle. Only
+# when the gap becomes too small are the objects around it renumbered, and
+# only when the range is used up is the whole layer renumbered. A layer that
+# doesn't fit into its range with LAYER_Z_STEP is renumbered into the first
+# half of it with a smaller step, and objects are added on top with that
+# step, so the layer isn't renumbered again until it has doubled in size. The order of the layer list is the order of the
+# objects in the level file, and it always matches the Z order.
+LAYER_Z_RANGE = 8192
+LAYER_Z_STEP = 1
+LAYER_Z_MIN_GAP = 1e-6
+
 class AbstractLevel:
     """
     Class for an abstract level from any game. Defines the API.
@@ -92,41 +112,23 @@ class Level_NSMBW(AbstractLevel):
         """
         super().load(data, areaToLoad)
 
-        arc = archive.U8.load(data)
+        areaData = SplitLevelArchive(data)
 
-        if "course" not in arc:
+        if areaData is None:
             return False
 
-        # Sort the area data
-        areaData = [[None, None, None, None], [None, None, None, None], [None, None, None, None], [None, None, None, None]]
-        for name, val in arc.files:
-            if val is None: continue
-            name = name.replace('\\', '/').split('/')[-1]
-
-            if not name.startswith('course'): continue
-            if not name.endswith('.bin'): continue
-            if '_bgdatL' in name:
-                # It's a layer file
-                if len(name) != 19: continue
-                try:
-                    thisArea = int(name[6])
-                    laynum = int(name[14])
-                except ValueError:
-                    continue
-                if not (0 < thisArea < 5): continue
+        for _ in self.LoadIter(areaData, areaToLoad):
+            pass
 
-                areaData[thisArea - 1][laynum + 1] = val
-            else:
-                # It's the course file
-                if len(name) != 11: continue
-                try:
-                    thisArea = int(name[6])
-                except ValueError:
-                    continue
-                if not (0 < thisArea < 5): continue
-
-                areaData[thisArea - 1][0] = val
+        return True
 
+    def LoadIter(self, areaData, areaToLoad, parsed=None, tilesets=None):
+        """
+        Creates the areas from the files returned by SplitLevelArchive and
+        loads one of them step by step (see Area.LoadIter). parsed and
+        tilesets can be given if the area has already been parsed and its
+        tilesets have been read in the background.
+        """
         # Create area objects
         self.areas = []
         for i, data in enumerate(areaData, 1):
@@ -139,42 +141,35 @@ class Level_NSMBW(AbstractLevel):
             new_area.set_data(course, L0, L1, L2)
             self.areas.append(new_area)
 
-        self.areas[areaToLoad - 1].load()
         globals_.Area = self.areas[areaToLoad - 1]
         SLib.Area = self.areas[areaToLoad - 1]
 
-        return True
+        yield from self.areas[areaToLoad - 1].LoadIter(parsed, tilesets)
 
     def save(self):
         """
         Save the level back to a file
         """
 
-        # Make a new archive
-        newArchive = archive.U8()
-
-        # Create a folder within the archive
-        newArchive['course'] = None
-
-        # Go through the areas, save them and add them back to the archive
+        areas = []
         for i, area in enumerate(self.areas):
             assert area.areanum == i + 1, (area.areanum, i + 1)
+            areas.append((area.areanum, *area.save()))
 
-            course, L0, L1, L2 = area.save()
+        return DumpSnapshot(areas)
 
-            # Layers 0 and 2 are optional, but the game assumes that the course
-            # file and layer 1 will always exist (see dBg_c::CheckExistLayer())
-            newArchive['course/course%d.bin' % area.areanum] = course
-            newArchive['course/course%d_bgdatL1.bin' % area.areanum] = L1
-
-            if L0 is not None:
-                newArchive['course/course%d_bgdatL0.bin' % area.areanum] = L0
-
-            if L2 is not None:
-                newArchive['course/course%d_bgdatL2.bin' % area.areanum] = L2
+    def snapshot(self):
+        """
+        Returns a snapshot of the level that only consists of plain Python data.
+        It can be turned into the level file with DumpSnapshot, which is safe
+        to do from another thread.
+        """
+        areas = []
+        for i, area in enumerate(self.areas):
+            assert area.areanum == i + 1, (area.areanum, i + 1)
+            areas.append((area.areanum, *area.snapshot()))
 
-        # return the U8 archive data
-        return newArchive._dump()
+        return areas
 
     def appendArea(self, course_new, L0_new, L1_new, L2_new):
         """
@@ -256,6 +251,9 @@ class Area:
         self.paths = []
         self.comments = []
         self.layers = [[], [], []]
+        self.layerZSteps = [LAYER_Z_STEP] * 3
+        self.layerIndexes = [LayerIndex(), LayerIndex(), LayerIndex()]
+        self.layerGrids = [LayerGrid(index) for index in self.layerIndexes]
         self.loaded_sprites = set()
         self.force_loaded_sprites = set()
         self.sprite_idtypes = {}  # {idtype: {id: number of usages of id}}
@@ -305,6 +303,8 @@ class Area:
 
         del self.blocks
         del self.layers
+        del self.layerIndexes
+        del self.layerGrids
         del self.Metadata
         del self.tileset0
         del self.tileset1
@@ -329,40 +329,47 @@ class Area:
 
         self._is_loaded = False
 
-    def load(self):
+    def load(self, parsed=None, tilesets=None):
         """
         Loads an area from the archive files
         """
+        for _ in self.LoadIter(parsed, tilesets):
+            pass
+
+        return True
+
+    def LoadIter(self, parsed=None, tilesets=None):
+        """
+        Loads an area from the archive files step by step. This is a generator
+        that yields (kind, items) whenever a batch of level items has been
+        created, so they can be added to the scene before the whole area has
+        been loaded. parsed is the result of ParseArea and tilesets a list of
+        the results of ReadTileset, if those have already been done in the
+        background.
+        """
         assert not self._is_loaded
 
-        # Load in the course file and blocks - if the course file is None, we
+        # Parse the course file and blocks - if the course file is None, we
         # just create a new area with the default settings (as stored in the
         # already initialised self.blocks)
-        if self.course is not None:
-            self.LoadBlocks(self.course)
-
-        # Load the editor metadata
-        if self.course is not None and self.block1pos[0] != 0x70:
-            rddata = self.course[0x70:self.block1pos[0]]
-            self.LoadReggieInfo(rddata)
-        else:
-            self.LoadReggieInfo(None)
+        if parsed is None:
+            parsed = ParseArea(self.areanum, self.course, self.L0, self.L1, self.L2, self.blocks)
 
-        if hasattr(self, "block1pos"):
-            del self.block1pos
+        self.blocks = parsed['blocks']
+        self.Metadata = parsed['metadata']
 
         # Load stuff from individual blocks
-        self.LoadTilesetNames()  # block 1
-        self.LoadOptions()  # block 2
-        self.LoadEntrances()  # block 7
-        self.LoadLoadedSprites()  # block 9
-        self.LoadZones()  # block 10 (also blocks 3, 5, and 6)
-        self.LoadLocations()  # block 11
-        self.LoadCamProfiles()  # block 12
-        self.LoadPaths()  # block 13 and 14
+        self.LoadTilesetNames(parsed['tilesets'])  # block 1
+        self.LoadOptions(parsed['options'])  # block 2 (and 4)
+        self.LoadEntrances(parsed['entrances'])  # block 7
+        self.LoadLoadedSprites(parsed['loaded_sprites'])  # block 9
+        self.LoadZones(parsed['zones'])  # block 10 (also blocks 3, 5, and 6)
+        self.LoadLocations(parsed['locations'])  # block 11
+        self.LoadCamProfiles(parsed['camprofiles'])  # block 12
+        self.LoadPaths(parsed['paths'])  # block 13 and 14
 
         # Now, load the comments
-        self.LoadComments()
+        self.LoadComments(parsed['comments'])
 
         # Reset the tilesets if this is not the first load
         if not globals_.firstLoad:
@@ -371,27 +378,37 @@ class Area:
             globals_.firstLoad = False
 
         # Load the tilesets
-        LoadTileset(0, self.tileset0)
-        LoadTileset(1, self.tileset1)
-        LoadTileset(2, self.tileset2)
-        LoadTileset(3, self.tileset3)
+        names = (self.tileset0, self.tileset1, self.tileset2, self.tileset3)
+        for idx, name in enumerate(names):
+            LoadTileset(idx, name, data=tilesets[idx] if tilesets is not None else None)
+
+        yield 'entrances', self.entrances
+        yield 'zones', self.zones
+        yield 'locations', self.locations
+        yield 'paths', self.paths
+        yield 'comments', self.comments
 
         # Load the object layers
         self.layers = [[], [], []]
+        self.layerZSteps = [LAYER_Z_STEP] * 3
+        self.layerIndexes = [LayerIndex(), LayerIndex(), LayerIndex()]
+        self.layerGrids = [LayerGrid(index) for index in self.layerIndexes]
+
+        for idx, records in enumerate(parsed['layers']):
+            for start in range(0, len(records), LOAD_BATCH_SIZE):
+                yield 'objects', self.LoadLayer(idx, records[start:start + LOAD_BATCH_SIZE])
+
+        # block 8
+        self.sprites = []
 
-        if self.L0 is not None:
-            self.LoadLayer(0, self.L0)
-        if self.L1 is not None:
-            self.LoadLayer(1, self.L1)
-        if self.L2 is not None:
-            self.LoadLayer(2, self.L2)
+        for start in range(0, len(parsed['sprites']), LOAD_BATCH_SIZE):
+            yield 'sprites', self.LoadSprites(parsed['sprites'][start:start + LOAD_BATCH_SIZE])
 
-        self.LoadSprites()  # block 8
+        self.force_loaded_sprites = self.loaded_sprites - set(sprite.type for sprite in self.sprites)
 
         self.InitialiseIdTypes()
 
         self._is_loaded = True
-        return True
 
     def save(self):
         """
@@ -401,6 +418,24 @@ class Area:
         if not self._is_loaded:
             return (self.course, self.L0, self.L1, self.L2)
 
+        course, L0, L1, L2 = self.snapshot()
+
+        self.course = course
+        self.L0 = PackLayer(L0)
+        self.L1 = PackLayer(L1)
+        self.L2 = PackLayer(L2)
+
+        return (self.course, self.L0, self.L1, self.L2)
+
+    def snapshot(self):
+        """
+        Saves the blocks of the area and returns the course file together with
+        the unpacked object layers (see SnapshotLayer). Unloaded areas return
+        their raw file data instead.
+        """
+        if not self._is_loaded:
+            return (self.course, self.L0, self.L1, self.L2)
+
         # prepare this because otherwise the game refuses to load some sprites
         self.SortSpritesByZone()
 
@@ -445,23 +480,109 @@ class Area:
             HeaderOffset += 8
             FileOffset += blocksize
 
-        self.course = bytes(course)
-        self.L0 = self.SaveLayer(0)
-        self.L1 = self.SaveLayer(1)
-        self.L2 = self.SaveLayer(2)
-
-        return (self.course, self.L0, self.L1, self.L2)
+        return (bytes(course), self.SnapshotLayer(0), self.SnapshotLayer(1), self.SnapshotLayer(2))
 
     def RemoveFromLayer(self, obj):
         """
-        Removes a specific object from the level and updates Z-indices accordingly
+        Removes a specific object from the level. The Z values of the other
+        objects don't need to change.
+        """
+        self.layers[obj.layer].remove(obj)
+        self.layerIndexes[obj.layer].Remove(obj)
+
+    def NextLayerZ(self, idx):
+        """
+        Returns the Z value for an object that is added on top of a layer
+        """
+        layer = self.layers[idx]
+        if not layer:
+            return (2 - idx) * LAYER_Z_RANGE + self.layerZSteps[idx]
+
+        return layer[-1].zValue() + self.layerZSteps[idx]
+
+    def AppendToLayer(self, obj):
+        """
+        Adds an object on top of its layer
+        """
+        z = self.NextLayerZ(obj.layer)
+        self.layers[obj.layer].append(obj)
+        self.layerIndexes[obj.layer].Add(obj)
+
+        if z >= (3 - obj.layer) * LAYER_Z_RANGE:
+            self.RenumberLayer(obj.layer)
+        else:
+            obj.setZValue(z)
+
+    def InsertIntoLayer(self, obj, index):
+        """
+        Inserts an object into its layer, right below the object that is at the
+        given index
         """
         layer = self.layers[obj.layer]
-        idx = layer.index(obj)
-        del layer[idx]
+        if index >= len(layer):
+            self.AppendToLayer(obj)
+            return
+
+        above = layer[index].zValue()
+        below = layer[index - 1].zValue() if index > 0 else (2 - obj.layer) * LAYER_Z_RANGE
+
+        layer.insert(index, obj)
+        self.layerIndexes[obj.layer].Add(obj)
+
+        if above - below < LAYER_Z_MIN_GAP:
+            self.RenumberAround(obj.layer, index)
+        else:
+            obj.setZValue((above + below) / 2)
+
+    def RenumberAround(self, idx, index):
+        """
+        Spreads the Z values of the objects around an index of a layer out
+        evenly again. Only the smallest window around the index that has
+        enough room is renumbered, so inserting at the same place over and
+        over doesn't renumber the whole layer every time. The whole layer is
+        only renumbered if it has no room at all.
+        """
+        layer = self.layers[idx]
+        base = (2 - idx) * LAYER_Z_RANGE
+        top = min(layer[-1].zValue() + self.layerZSteps[idx], base + LAYER_Z_RANGE)
+
+        size = 2
+        while True:
+            lo = max(min(index - size // 2, len(layer) - size), 0)
+            hi = min(lo + size, len(layer))
+
+            below = layer[lo - 1].zValue() if lo > 0 else base
+            above = layer[hi].zValue() if hi < len(layer) else top
+            step = (above - below) / (hi - lo + 1)
+
+            # Larger windows need more room per object, so the next inserts
+            # nearby still find a gap
+            if step >= LAYER_Z_MIN_GAP * size:
+                z = below
+                for obj in layer[lo:hi]:
+                    z += step
+                    obj.setZValue(z)
 
-        for upd in layer[idx:]:
-            upd.setZValue(upd.zValue() - 1)
+                return
+
+            if hi - lo == len(layer):
+                self.RenumberLayer(idx)
+                return
+
+            size *= 2
+
+    def RenumberLayer(self, idx):
+        """
+        Spreads the Z values of the objects in a layer out evenly again
+        """
+        layer = self.layers[idx]
+        step = min(LAYER_Z_STEP, LAYER_Z_RANGE / (2 * len(layer) + 2))
+        self.layerZSteps[idx] = step
+        z = (2 - idx) * LAYER_Z_RANGE
+
+        for obj in layer:
+            z += step
+            obj.setZValue(z)
 
     def SortSpritesByZone(self):
         """
@@ -484,213 +605,118 @@ class Area:
         except Exception:
             self.Metadata = Metadata()  # fallback
 
-    def LoadBlocks(self, course):
-        """
-        Loads self.blocks from the course file
-        """
-        self.blocks = [None] * 14
-        getblock = struct.Struct('>II')
-        for i in range(14):
-            start, length = getblock.unpack_from(course, i * 8)
-            self.blocks[i] = course[start:start + length]
-
-        self.block1pos = getblock.unpack_from(course, 0)
-
-    def LoadTilesetNames(self):
+    def LoadTilesetNames(self, names):
         """
         Loads block 1, the tileset names
         """
-        data = struct.unpack('>32s32s32s32s', self.blocks[0])
-        self.tileset0 = data[0].strip(b'\0').decode('latin-1')
-        self.tileset1 = data[1].strip(b'\0').decode('latin-1')
-        self.tileset2 = data[2].strip(b'\0').decode('latin-1')
-        self.tileset3 = data[3].strip(b'\0').decode('latin-1')
+        self.tileset0, self.tileset1, self.tileset2, self.tileset3 = names
 
-    def LoadOptions(self):
+    def LoadOptions(self, data):
         """
-        Loads block 2, the general options
+        Loads block 2, the general options, and block 4, the unknown
+        maybe-more-general-options block
         """
-        data = struct.unpack('>IIHh?BxxB?Bx', self.blocks[1])
-        defEventsA, defEventsB, wrapByte, self.timeLimit, self.creditsFlag, unkVal, self.startEntrance, self.ambushFlag, self.toadHouseType = data
+        defEventsA, defEventsB, wrapByte, self.timeLimit, self.creditsFlag, unkVal, self.startEntrance, self.ambushFlag, self.toadHouseType, self.unkVal1, self.unkVal2 = data
 
         self.wrapFlag = bool(wrapByte & 1)
         self.unkFlag1 = bool(wrapByte >> 3)
         self.unkFlag2 = unkVal == 100
         self.defEvents = defEventsA | defEventsB << 32
 
-        """
-        Loads block 4, the unknown maybe-more-general-options block
-        """
-        optdata2 = self.blocks[3]
-        optdata2struct = struct.Struct('>xxHHxx')
-        data = optdata2struct.unpack(optdata2)
-        self.unkVal1, self.unkVal2 = data
-
-    def LoadEntrances(self):
+    def LoadEntrances(self, records):
         """
         Loads block 7, the entrances
         """
-        entdata = self.blocks[6]
-        entstruct = struct.Struct('>HHxxxxBBBBxBBBHBB')
-
-        entrances = []
-        for offset in range(0, len(entdata), 20):
-            data = entstruct.unpack_from(entdata, offset)
-            entrances.append(EntranceItem(*data))
+        self.entrances = [EntranceItem(*data) for data in records]
 
-        self.entrances = entrances
-
-    def LoadSprites(self):
+    def LoadSprites(self, records):
         """
-        Loads block 8, the sprites. This needs to be called after
-        'LoadLoadedSprites', because this relies on the loaded sprite ids being
-        loaded for calculating the sprites that are forced to load.
+        Loads a batch of block 8, the sprites. Returns the new sprites.
         """
-        spritedata = self.blocks[7]
-        sprstruct = struct.Struct('>HHH8sxx')
         sprites = []
 
-        unpack = sprstruct.unpack_from
         append = sprites.append
         obj = SpriteItem
 
-        # Ignore the last 4 bytes because they are always 0xFFFFFFFF
-        for offset in range(0, len(spritedata) - 4, 16):
-            data = unpack(spritedata, offset)
+        for data in records:
             append(obj(*data))
 
-        self.sprites = sprites
-        self.force_loaded_sprites = self.loaded_sprites - set(sprite.type for sprite in sprites)
+        self.sprites += sprites
+        return sprites
 
-    def LoadLoadedSprites(self):
+    def LoadLoadedSprites(self, loaded_sprites):
         """
         Loads block 9, the loaded sprite resources.
         """
-        self.loaded_sprites = set()
-        loading_data = self.blocks[8]
-        struct_ = struct.Struct('>Hxx')
+        self.loaded_sprites = set(loaded_sprites)
 
-        for offset in range(0, len(loading_data), 4):
-            sprite_id, = struct_.unpack_from(loading_data, offset)
-            self.loaded_sprites.add(sprite_id)
-
-    def LoadZones(self):
+    def LoadZones(self, data):
         """
-        Loads block 3, the bounding preferences
+        Loads block 10, the zone data (and blocks 3, 5 and 6)
         """
-        bdngdata = self.blocks[2]
-        bdngstruct = struct.Struct('>4lHHhh')
-        bounding = []
-
-        for offset in range(0, len(bdngdata), 24):
-            data = bdngstruct.unpack_from(bdngdata, offset)
-            bounding.append(data)
+        bounding, bgA, bgB, records = data
 
         self.bounding = bounding
-
-        """
-        Loads block 5, the top level background values
-        """
-        bgAdata = self.blocks[4]
-        bgAstruct = struct.Struct('>xBhhhhHHHxxxBxxxx')
-        bgA = []
-
-        for offset in range(0, len(bgAdata), 24):
-            data = bgAstruct.unpack_from(bgAdata, offset)
-            bgA.append(data)
-
         self.bgA = bgA
-
-        """
-        Loads block 6, the bottom level background values
-        """
-        bgBdata = self.blocks[5]
-        bgBstruct = struct.Struct('>xBhhhhHHHxxxBxxxx')
-        bgB = []
-
-        for offset in range(0, len(bgBdata), 24):
-            data = bgBstruct.unpack_from(bgBdata, offset)
-            bgB.append(data)
-
         self.bgB = bgB
 
-        """
-        Loads block 10, the zone data
-        """
-        zonedata = self.blocks[9]
-        zonestruct = struct.Struct('>HHHHHHBBBBxBBBBxBB')
         zones = []
 
-        for offset in range(0, len(zonedata), 24):
-            dataz = zonestruct.unpack_from(zonedata, offset)
-            zones.append(ZoneItem(*dataz, bounding, bgA, bgB, offset // 24))
+        for i, dataz in enumerate(records):
+            zones.append(ZoneItem(*dataz, bounding, bgA, bgB, i))
 
         self.zones = zones
 
-    def LoadLocations(self):
+    def LoadLocations(self, records):
         """
         Loads block 11, the locations
         """
-        locdata = self.blocks[10]
-        locstruct = struct.Struct('>HHHHBxxx')
-        locations = []
-
-        for offset in range(0, len(locdata), 12):
-            data = locstruct.unpack_from(locdata, offset)
-            locations.append(LocationItem(*data))
-
-        self.locations = locations
+        self.locations = [LocationItem(*data) for data in records]
 
-    def LoadLayer(self, idx, layerdata):
+    def LoadLayer(self, idx, records):
         """
-        Loads a specific object layer from a string
+        Loads a batch of objects of a specific layer. Returns the new objects.
         """
-        objstruct = struct.Struct('>HHHHH')
-        z = (2 - idx) * 8192
+        layer = self.layers[idx]
+        z = self.NextLayerZ(idx)
 
-        append = self.layers[idx].append
+        objects = []
+        append = objects.append
         obj = ObjectItem
-        unpack = objstruct.unpack_from
 
-        # Ignore the last 2 bytes, because they are always 0xFFFF.
-        for offset in range(0, len(layerdata) - 2, 10):
-            data = unpack(layerdata, offset)
-            append(obj(data[0] >> 12, data[0] & 4095, idx, *data[1:], z))
-            z += 1
+        step = self.layerZSteps[idx]
+        for data in records:
+            append(obj(data[0], data[1], idx, *data[2:], z))
+            z += step
 
-    def LoadCamProfiles(self):
-        """
-        Loads block 12, the camera profiles
-        """
-        profiledata = self.blocks[11]
-        profilestruct = struct.Struct('>xxxxxxxxxxxxBBBBxxBx')
-        offset = 0
-        camprofiles = []
+        layer += objects
 
-        for offset in range(0, len(profiledata), 20):
-            data = profilestruct.unpack_from(profiledata, offset)
+        add = self.layerIndexes[idx].Add
+        for obj in objects:
+            add(obj)
 
-            if offset > 0 or any(data):
-                camprofiles.append([data[4], data[1], data[2]])
+        # Very large layers don't fit into the Z range with the default step
+        if z >= (3 - idx) * LAYER_Z_RANGE:
+            self.RenumberLayer(idx)
 
-        self.camprofiles = camprofiles
+        return objects
 
-    def LoadPaths(self):
+    def LoadCamProfiles(self, camprofiles):
+        """
+        Loads block 12, the camera profiles
+        """
+        self.camprofiles = [list(profile) for profile in camprofiles]
+
+    def LoadPaths(self, records):
         """
         Loads blocks 13 and 14, the paths and path nodes
         """
-        pathdata = self.blocks[12]
-        pathstruct = struct.Struct('>BxHHH')
-        unpack = pathstruct.unpack_from
         paths = []
 
         from levelitems import Path
 
-        for offset in range(0, len(pathdata), 8):
-            data = unpack(pathdata, offset)
-            nodes = self.LoadPathNodes(data[1], data[2])
-
-            path = Path(int(data[0]), globals_.mainWindow.scene, data[3] == 2)
+        for path_id, loops, nodes in records:
+            path = Path(path_id, globals_.mainWindow.scene, loops)
 
             for node in nodes:
                 path.add_node(node['x'], node['y'], node['speed'], node['accel'], node['delay'], add_to_scene=False)
@@ -699,68 +725,13 @@ class Area:
 
         self.paths = paths
 
-    def LoadPathNodes(self, startindex, count):
-        """
-        Loads block 14, the path nodes
-        """
-        nodes = []
-        nodedata = self.blocks[13]
-        nodestruct = struct.Struct('>HHffhxx')
-        unpack = nodestruct.unpack_from
-
-        for offset in range(startindex * 16, (startindex + count) * 16, 16):
-            data = unpack(nodedata, offset)
-
-            nodes.append({
-                'x': int(data[0]),
-                'y': int(data[1]),
-                'speed': float(data[2]),
-                'accel': float(data[3]),
-                'delay': int(data[4])
-            })
-
-        return nodes
-
-    def LoadComments(self):
+    def LoadComments(self, records):
         """
         Loads the comments from self.Metadata
         """
         self.comments = []
-        data = self.Metadata.binData('InLevelComments_A%d' % self.areanum)
-        if data is None:
-            return
-
-        idx = 0
-        while idx < len(data):
-            xpos, ypos, tlen_maybe = struct.unpack_from(">3I", data, idx)
-            idx += 3 * 4
-
-            if tlen_maybe == 0xFFFF_FFFF:
-                # Updated version - the number of code points is stored in the
-                # next int.
-                tlen, = struct.unpack_from(">I", data, idx)
-                text = data[idx + 4: idx + 4 + tlen].decode("utf-8")
-                idx += 4 + tlen
-            else:
-                # Old version provided for compatibility. Also tries to properly
-                # load non-ascii comments, but that might not work out...
-                tlen = tlen_maybe
-                try:
-                    text = data[idx: idx + tlen].decode("ascii")
-                    idx += tlen
-                except UnicodeDecodeError:
-                    # You used non-ascii characters... Try to save the comment
-                    # The xpos is probably not > 2 ** 24, so the next comment
-                    # starts with a null byte. We can use that to find the end
-                    # of our string
-                    null_idx = data.find(b"\0", idx)
-                    if null_idx == -1:
-                        # This is probably the last comment...
-                        null_idx = len(data)
-
-                    text = data[idx: null_idx].decode("utf-8")[:tlen]
-                    idx = null_idx
 
+        for xpos, ypos, text in records:
             com = CommentItem(xpos, ypos, text)
             com.listitem = QtWidgets.QListWidgetItem()
 
@@ -802,28 +773,23 @@ class Area:
         """
         Saves an object layer to a string
         """
+        return PackLayer(self.SnapshotLayer(idx))
+
+    def SnapshotLayer(self, idx):
+        """
+        Returns an object layer as a list of (tileset and type, x, y, width,
+        height) tuples, or None if the layer is empty
+        """
         layer = self.layers[idx]
         if not layer:
             # Don't create a layer file for an empty layer.
             return None
 
-        offset = 0
-        objstruct = struct.Struct('>HHHHH')
-        buffer = bytearray((len(layer) * 10) + 2)
         f_int = int
-        for obj in layer:
-            objstruct.pack_into(buffer,
-                                offset,
-                                f_int((obj.tileset << 12) | obj.type),
-                                f_int(obj.objx),
-                                f_int(obj.objy),
-                                f_int(obj.width),
-                                f_int(obj.height))
-            offset += 10
-
-        buffer[offset] = 0xFF
-        buffer[offset + 1] = 0xFF
-        return bytes(buffer)
+        return [
+            (f_int((obj.tileset << 12) | obj.type), f_int(obj.objx), f_int(obj.objy), f_int(obj.width), f_int(obj.height))
+            for obj in layer
+        ]
 
     def SaveEntrances(self):
         """
@@ -1107,6 +1073,383 @@ class Area:
                 counter[value] -= 1
 
 
+class LevelLoadError(Exception):
+    """
+    Raised by ReadLevelFile if a level file can't be loaded. Holds the
+    arguments for the translation string that describes the problem.
+    """
+
+
+def ReadLevelFile(path, areaToLoad):
+    """
+    Reads and decompresses a level file, and parses the area that should be
+    loaded. Returns (area files, parsed area), see SplitLevelArchive and
+    ParseArea. This does not touch any editor state, so it can be called from
+    a worker thread.
+    """
+    with open(path, 'rb') as fileobj:
+        levelData = fileobj.read()
+
+    # Decompress, if needed
+    if (levelData[0] & 0xF0) == 0x40:  # If LH-compressed
+        try:
+            levelData = lh.UncompressLH(levelData)
+        except IndexError:
+            raise LevelLoadError('Err_Decompress', 1, '[file]', path)
+    elif not levelData.startswith(b"U\xAA8-"):  # If LZ-compressed
+        try:
+            levelData = lz77.UncompressLZ77(levelData)
+        except IndexError:
+            raise LevelLoadError('Err_Decompress', 2, '[file]', path)
+
+    areaData = SplitLevelArchive(levelData)
+    if areaData is None:
+        raise LevelLoadError('Err_InvalidLevel', 0)
+
+    # Areas are numbered by their position in the level, not by their file name
+    areas = [(i, data) for i, data in enumerate(areaData, 1) if data[0] is not None]
+    if not (0 < areaToLoad <= len(areas)):
+        raise LevelLoadError('Err_InvalidLevel', 0)
+
+    areanum, (course, L0, L1, L2) = areas[areaToLoad - 1]
+    return areaData, ParseArea(areanum, course, L0, L1, L2)
+
+
+def SplitLevelArchive(data):
+    """
+    Sorts the files of a level archive by area. Returns a list of
+    [course, L0, L1, L2] for each of the four areas, or None if the archive is
+    not a level.
+    """
+    arc = archive.U8.load(data)
+
+    if "course" not in arc:
+        return None
+
+    # Sort the area data
+    areaData = [[None, None, None, None], [None, None, None, None], [None, None, None, None], [None, None, None, None]]
+    for name, val in arc.files:
+        if val is None: continue
+        name = name.replace('\\', '/').split('/')[-1]
+
+        if not name.startswith('course'): continue
+        if not name.endswith('.bin'): continue
+        if '_bgdatL' in name:
+            # It's a layer file
+            if len(name) != 19: continue
+            try:
+                thisArea = int(name[6])
+                laynum = int(name[14])
+            except ValueError:
+                continue
+            if not (0 < thisArea < 5): continue
+
+            areaData[thisArea - 1][laynum + 1] = val
+        else:
+            # It's the course file
+            if len(name) != 11: continue
+            try:
+                thisArea = int(name[6])
+            except ValueError:
+                continue
+            if not (0 < thisArea < 5): continue
+
+            areaData[thisArea - 1][0] = val
+
+    return areaData
+
+
+def ParseArea(areanum, course, L0, L1, L2, blocks=None):
+    """
+    Parses the course file and the object layers of an area into plain Python
+    data, which Area.LoadIter turns into level items. If course is None, the
+    given blocks are parsed instead. This does not touch any editor state, so
+    it can be called from a worker thread.
+    """
+    getblock = struct.Struct('>II')
+    block1pos = 0x70
+
+    # Load in the course file and blocks
+    if course is not None:
+        blocks = [None] * 14
+        for i in range(14):
+            start, length = getblock.unpack_from(course, i * 8)
+            blocks[i] = course[start:start + length]
+
+        block1pos = getblock.unpack_from(course, 0)[0]
+
+    # Load the editor metadata
+    metadata = Metadata()
+    if course is not None and block1pos != 0x70:
+        try:
+            metadata = Metadata(course[0x70:block1pos])
+        except Exception:
+            pass  # fallback
+
+    parsed = {'blocks': blocks, 'metadata': metadata}
+
+    # Block 1, the tileset names
+    data = struct.unpack('>32s32s32s32s', blocks[0])
+    parsed['tilesets'] = [name.strip(b'\0').decode('latin-1') for name in data]
+
+    # Block 2, the general options, and block 4, the unknown
+    # maybe-more-general-options block
+    parsed['options'] = struct.unpack('>IIHh?BxxB?Bx', blocks[1]) + struct.unpack('>xxHHxx', blocks[3])
+
+    # Block 7, the entrances
+    entstruct = struct.Struct('>HHxxxxBBBBxBBBHBB')
+    parsed['entrances'] = [entstruct.unpack_from(blocks[6], offset) for offset in range(0, len(blocks[6]), 20)]
+
+    # Block 8, the sprites. Ignore the last 4 bytes because they are always
+    # 0xFFFFFFFF
+    sprstruct = struct.Struct('>HHH8sxx')
+    parsed['sprites'] = [sprstruct.unpack_from(blocks[7], offset) for offset in range(0, len(blocks[7]) - 4, 16)]
+
+    # Block 9, the loaded sprite resources
+    struct_ = struct.Struct('>Hxx')
+    parsed['loaded_sprites'] = [struct_.unpack_from(blocks[8], offset)[0] for offset in range(0, len(blocks[8]), 4)]
+
+    # Block 3, the bounding preferences
+    bdngstruct = struct.Struct('>4lHHhh')
+    bounding = [bdngstruct.unpack_from(blocks[2], offset) for offset in range(0, len(blocks[2]), 24)]
+
+    # Blocks 5 and 6, the top and bottom level background values
+    bgstruct = struct.Struct('>xBhhhhHHHxxxBxxxx')
+    bgA = [bgstruct.unpack_from(blocks[4], offset) for offset in range(0, len(blocks[4]), 24)]
+    bgB = [bgstruct.unpack_from(blocks[5], offset) for offset in range(0, len(blocks[5]), 24)]
+
+    # Block 10, the zone data
+    zonestruct = struct.Struct('>HHHHHHBBBBxBBBBxBB')
+    zones = [zonestruct.unpack_from(blocks[9], offset) for offset in range(0, len(blocks[9]), 24)]
+    parsed['zones'] = (bounding, bgA, bgB, zones)
+
+    # Block 11, the locations
+    locstruct = struct.Struct('>HHHHBxxx')
+    parsed['locations'] = [locstruct.unpack_from(blocks[10], offset) for offset in range(0, len(blocks[10]), 12)]
+
+    # Block 12, the camera profiles
+    profilestruct = struct.Struct('>xxxxxxxxxxxxBBBBxxBx')
+    camprofiles = []
+
+    for offset in range(0, len(blocks[11]), 20):
+        data = profilestruct.unpack_from(blocks[11], offset)
+
+        if offset > 0 or any(data):
+            camprofiles.append([data[4], data[1], data[2]])
+
+    parsed['camprofiles'] = camprofiles
+
+    # Blocks 13 and 14, the paths and path nodes
+    pathstruct = struct.Struct('>BxHHH')
+    nodestruct = struct.Struct('>HHffhxx')
+    paths = []
+
+    for offset in range(0, len(blocks[12]), 8):
+        path_id, startindex, count, loops = pathstruct.unpack_from(blocks[12], offset)
+        nodes = []
+
+        for nodeoffset in range(startindex * 16, (startindex + count) * 16, 16):
+            data = nodestruct.unpack_from(blocks[13], nodeoffset)
+
+            nodes.append({
+                'x': int(data[0]),
+                'y': int(data[1]),
+                'speed': float(data[2]),
+                'accel': float(data[3]),
+                'delay': int(data[4])
+            })
+
+        paths.append((int(path_id), loops == 2, nodes))
+
+    parsed['paths'] = paths
+
+    # The comments, which are stored in the metadata
+    parsed['comments'] = ParseComments(metadata.binData('InLevelComments_A%d' % areanum))
+
+    # The object layers. Ignore the last 2 bytes, because they are always
+    # 0xFFFF.
+    objstruct = struct.Struct('>HHHHH')
+    layers = []
+
+    for layerdata in (L0, L1, L2):
+        records = []
+
+        if layerdata is not None:
+            for offset in range(0, len(layerdata) - 2, 10):
+                data = objstruct.unpack_from(layerdata, offset)
+                records.append((data[0] >> 12, data[0] & 4095) + data[1:])
+
+        layers.append(records)
+
+    parsed['layers'] = layers
+
+    return parsed
+
+
+def ParseComments(data):
+    """
+    Parses the in-level comments stored in the metadata. Returns a list of
+    (x, y, text) tuples.
+    """
+    comments = []
+    if data is None:
+        return comments
+
+    idx = 0
+    while idx < len(data):
+        xpos, ypos, tlen_maybe = struct.unpack_from(">3I", data, idx)
+        idx += 3 * 4
+
+        if tlen_maybe == 0xFFFF_FFFF:
+            # Updated version - the number of code points is stored in the
+            # next int.
+            tlen, = struct.unpack_from(">I", data, idx)
+            text = data[idx + 4: idx + 4 + tlen].decode("utf-8")
+            idx += 4 + tlen
+        else:
+            # Old version provided for compatibility. Also tries to properly
+            # load non-ascii comments, but that might not work out...
+            tlen = tlen_maybe
+            try:
+                text = data[idx: idx + tlen].decode("ascii")
+                idx += tlen
+            except UnicodeDecodeError:
+                # You used non-ascii characters... Try to save the comment
+                # The xpos is probably not > 2 ** 24, so the next comment
+                # starts with a null byte. We can use that to find the end
+                # of our string
+                null_idx = data.find(b"\0", idx)
+                if null_idx == -1:
+                    # This is probably the last comment...
+                    null_idx = len(data)
+
+                text = data[idx: null_idx].decode("utf-8")[:tlen]
+                idx = null_idx
+
+        comments.append((xpos, ypos, text))
+
+    return comments
+
+
+def PackLayer(layer):
+    """
+    Packs an object layer snapshot (see Area.SnapshotLayer) into the layer file
+    format. Raw layer data and missing layers are returned as they are.
+    """
+    if layer is None or isinstance(layer, bytes):
+        return layer
+
+    offset = 0
+    objstruct = struct.Struct('>HHHHH')
+    buffer = bytearray((len(layer) * 10) + 2)
+    pack_into = objstruct.pack_into
+    for obj in layer:
+        pack_into(buffer, offset, *obj)
+        offset += 10
+
+    buffer[offset] = 0xFF
+    buffer[offset + 1] = 0xFF
+    return bytes(buffer)
+
+
+def DumpSnapshot(areas):
+    """
+    Turns a level snapshot (see Level_NSMBW.snapshot) into the bytes of the
+    level file. This does not touch any editor state, so it can be called
+    from a worker thread.
+    """
+    # Make a new archive
+    newArchive = archive.U8()
+
+    # Create a folder within the archive
+    newArchive['course'] = None
+
+    # Add the areas to the archive
+    for areanum, course, L0, L1, L2 in areas:
+        L0 = PackLayer(L0)
+        L1 = PackLayer(L1)
+        L2 = PackLayer(L2)
+
+        # Layers 0 and 2 are optional, but the game assumes that the course
+        # file and layer 1 will always exist (see dBg_c::CheckExistLayer())
+        newArchive['course/course%d.bin' % areanum] = course
+        newArchive['course/course%d_bgdatL1.bin' % areanum] = L1
+
+        if L0 is not None:
+            newArchive['course/course%d_bgdatL0.bin' % areanum] = L0
+
+        if L2 is not None:
+            newArchive['course/course%d_bgdatL2.bin' % areanum] = L2
+
+    # return the U8 archive data
+    return newArchive._dump()
+
+
+class LevelSaveError(Exception):
+    """
+    Raised by WriteSnapshot if the level can't be turned into a level file.
+    Holds the arguments for the Err_Save string that describes the problem.
+    """
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.compression = args[0] == 3
+
+
+def WriteSnapshot(areas, path, compress=False, padding=None, progress=None):
+    """
+    Turns a level snapshot into a level file and writes it to path. The data
+    is compressed if compress is set and padded to the given length if padding
+    is not None. The file is replaced atomically, so it is never left half
+    written. This can be called from a worker thread, and reports its progress
+    through the optional progress callback.
+    """
+    steps = 4
+    if progress is not None: progress(0, steps)
+
+    data = DumpSnapshot(areas)
+    if progress is not None: progress(1, steps)
+
+    # maybe need to compress the data
+    if compress:
+        compressed = lz77.CompressLZ77(data)
+
+        if compressed is None:
+            raise LevelSaveError(3, '[file-size]', len(data))
+
+        data = compressed
+
+    if progress is not None: progress(2, steps)
+
+    # maybe pad with null bytes
+    if padding is not None:
+        pad_length = padding - len(data)
+
+        if pad_length < 0:
+            # err: orig data is longer than padding data
+            raise LevelSaveError(2, '[orig-len]', len(data), '[pad-len]', padding)
+
+        data = bytes(data) + bytes(pad_length)
+
+    if progress is not None: progress(3, steps)
+
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        raise
+
+    if progress is not None: progress(steps, steps)
+
+    return path
+
+
 class Metadata:
     """
     Class for the new level metadata system
@@ -1,14 +1,15 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 import os
-import random
 import base64
+import time
 
 import spritelib as SLib
 import globals_
 import common
 from tiles import RenderObject
+from randomtiles import TableFor, Randomise, SPECIAL_DOUBLE_TOP
 from ui import GetIcon, clipStr
-from dirty import SetDirty
+from dirty import SetDirty, JournalMove, Journaled, JournalEdit, JournalEditsOf
 from undo import MoveItemUndoAction, SimultaneousUndoAction
 
 class InstanceDefinition:
@@ -104,6 +105,21 @@ class InstanceDefinition:
         # This will need to be implemented separately in each subclass
         return LevelEditorItem()
 
+    def addNew(self):
+        """
+        Creates a new instance of the target class with the data specified
+        here, and adds it to the level. Returns None if it couldn't be added.
+        """
+        # This will need to be implemented separately in each subclass
+        return None
+
+    def applyDataTo(self, other):
+        """
+        Sets the data of an item to the data specified here
+        """
+        for field in self.fields:
+            setattr(other, field[0], field[1])
+
     def findInstance(self):
         """
         Returns a matching instance of this thing in the level
@@ -142,6 +158,31 @@ class InstanceDefinition_ObjectItem(InstanceDefinition):
             1,
         )
 
+    def addNew(self):
+        return globals_.mainWindow.CreateObject(
+            self.fields[0][1],
+            self.fields[1][1],
+            self.fields[2][1],
+            self.objx,
+            self.objy,
+            self.fields[3][1],
+            self.fields[4][1],
+        )
+
+    def applyDataTo(self, other):
+        tileset, type_, layer, width, height = (field[1] for field in self.fields)
+
+        if layer != other.layer:
+            globals_.Area.RemoveFromLayer(other)
+            other.layer = layer
+            globals_.Area.AppendToLayer(other)
+            other.setParentItem(globals_.mainWindow.scene.layerGroups[layer])
+
+        other.width = width
+        other.height = height
+        other.UpdateRects()
+        other.SetType(tileset, type_)
+
 
 class InstanceDefinition_LocationItem(InstanceDefinition):
     """
@@ -160,6 +201,16 @@ class InstanceDefinition_LocationItem(InstanceDefinition):
     def createNew(self):
         return LocationItem(self.objx, self.objy, *(field[1] for field in self.fields))
 
+    def addNew(self):
+        return globals_.mainWindow.CreateLocation(self.objx, self.objy, *(field[1] for field in self.fields))
+
+    def applyDataTo(self, other):
+        InstanceDefinition.applyDataTo(self, other)
+
+        other.UpdateRects()
+        other.UpdateTitle()
+        other.update()
+
 
 class InstanceDefinition_SpriteItem(InstanceDefinition):
     """
@@ -177,6 +228,22 @@ class InstanceDefinition_SpriteItem(InstanceDefinition):
     def createNew(self):
         return SpriteItem(self.fields[0][1], self.objx, self.objy, self.fields[1][1])
 
+    def addNew(self):
+        spr = globals_.mainWindow.CreateSprite(self.objx, self.objy, self.fields[0][1], self.fields[1][1])
+        spr.UpdateDynamicSizing()
+        return spr
+
+    def applyDataTo(self, other):
+        type_, data = (field[1] for field in self.fields)
+        other.spritedata = data
+
+        if type_ != other.type:
+            other.SetType(type_)
+        else:
+            other.UpdateDynamicSizing()
+
+        globals_.mainWindow.spriteList.updateSprite(other)
+
 
 class InstanceDefinition_EntranceItem(InstanceDefinition):
     """
@@ -201,6 +268,20 @@ class InstanceDefinition_EntranceItem(InstanceDefinition):
     def createNew(self):
         return EntranceItem(self.objx, self.objy, *(field[1] for field in self.fields))
 
+    def addNew(self):
+        ent = globals_.mainWindow.CreateEntrance(self.objx, self.objy, self.fields[0][1])
+        if ent is not None:
+            self.applyDataTo(ent)
+
+        return ent
+
+    def applyDataTo(self, other):
+        InstanceDefinition.applyDataTo(self, other)
+
+        other.TypeChange()
+        other.update()
+        other.UpdateTooltip()
+
 
 class InstanceDefinition_PathItem(InstanceDefinition):
     """
@@ -235,6 +316,15 @@ class InstanceDefinition_CommentItem(InstanceDefinition):
     def createNew(self):
         return CommentItem(self.objx, self.objy, self.fields[0][1])
 
+    def addNew(self):
+        return globals_.mainWindow.CreateComment(self.objx, self.objy, self.fields[0][1])
+
+    def applyDataTo(self, other):
+        other.text = self.fields[0][1]
+        other.TextEdit.setPlainText(other.text)
+        other.UpdateTooltip()
+        globals_.mainWindow.SaveComments()
+
 
 class ListWidgetItem_SortsByOther(QtWidgets.QListWidgetItem):
     """
@@ -260,6 +350,11 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
     dragoffsety = 0
     objx, objy = 0, 0
 
+    # Items that describe themselves through ToolTip() only create their
+    # tooltip when it's about to be shown (see LevelScene.helpEvent), since
+    # most are never hovered
+    tooltipOutdated = False
+
     def __init__(self):
         """
         Generic constructor for level editor items
@@ -267,6 +362,27 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
         QtWidgets.QGraphicsItem.__init__(self)
         self.setFlag(self.ItemSendsGeometryChanges, True)
 
+    def ToolTip(self):
+        """
+        Returns the tooltip of the item, if it creates it on demand
+        """
+        return None
+
+    def UpdateTooltip(self):
+        """
+        Marks the tooltip as outdated, so it's created again before it's shown
+        """
+        self.tooltipOutdated = True
+
+    def RefreshTooltip(self):
+        """
+        Creates the tooltip if it's outdated
+        """
+        if not self.tooltipOutdated: return
+
+        self.tooltipOutdated = False
+        self.setToolTip(self.ToolTip())
+
     def __lt__(self, other):
         if self.objx != other.objx:
             return self.objx < other.objx
@@ -280,10 +396,17 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
         if change == QtWidgets.QGraphicsItem.ItemPositionChange:
             # snap to 24x24
             newpos = value
+            drag = globals_.SelectionDrag
+            if drag is not None and not drag.Has(self):
+                drag = None
+
+            if drag is not None:
+                # The whole selection is being dragged, and snaps as one
+                newpos = drag.Position(self, value)
 
             # snap even further if Alt isn't held
             # but -only- if OverrideSnapping is off
-            if (not globals_.OverrideSnapping) and (not self.autoPosChange):
+            elif (not globals_.OverrideSnapping) and (not self.autoPosChange):
                 if self.scene() is None:
                     objectsSelected = False
                 else:
@@ -336,34 +459,43 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
                     self.BoundingRect.width(),
                     self.BoundingRect.height(),
                 )
-                if self.scene() is not None:
+                if drag is not None:
+                    drag.Update(updRect)
+                elif self.scene() is not None:
                     self.scene().update(updRect)
 
                 oldx = self.objx
                 oldy = self.objy
                 self.objx = x
                 self.objy = y
-                if self.positionChanged is not None:
-                    self.positionChanged(self, oldx, oldy, x, y)
 
-                if not isinstance(self, PathEditorLineItem):
-                    if len(globals_.mainWindow.CurrentSelection) == 1:
-                        act = MoveItemUndoAction(self, oldx, oldy, x, y)
-                        globals_.mainWindow.undoStack.addOrExtendAction(act)
-                    elif len(globals_.mainWindow.CurrentSelection) > 1:
-                        # This is certainly not the most efficient way to do this
-                        # (the number of UndoActions > (selection size ^ 2)), but
-                        # it works and I can't think of a better way to do it. :P
-                        acts = set()
-                        acts.add(MoveItemUndoAction(self, oldx, oldy, x, y))
-                        for item in globals_.mainWindow.CurrentSelection:
-                            if item is self: continue
-                            act = MoveItemUndoAction(item, item.objx, item.objy, item.objx, item.objy)
-                            acts.add(act)
-                        act = SimultaneousUndoAction(acts)
-                        globals_.mainWindow.undoStack.addOrExtendAction(act)
+                # The move is recorded in the edit journal here, so the
+                # SetDirty calls below shouldn't invalidate it
+                JournalMove(self, oldx, oldy, x, y)
+                with Journaled():
+                    if self.positionChanged is not None:
+                        self.positionChanged(self, oldx, oldy, x, y)
+
+                    # A dragged selection is added to the undo stack as a whole
+                    # when it's dropped
+                    if drag is None and not isinstance(self, PathEditorLineItem):
+                        if len(globals_.mainWindow.CurrentSelection) == 1:
+                            act = MoveItemUndoAction(self, oldx, oldy, x, y)
+                            globals_.mainWindow.undoStack.addOrExtendAction(act)
+                        elif len(globals_.mainWindow.CurrentSelection) > 1:
+                            # This is certainly not the most efficient way to do this
+                            # (the number of UndoActions > (selection size ^ 2)), but
+                            # it works and I can't think of a better way to do it. :P
+                            acts = set()
+                            acts.add(MoveItemUndoAction(self, oldx, oldy, x, y))
+                            for item in globals_.mainWindow.CurrentSelection:
+                                if item is self: continue
+                                act = MoveItemUndoAction(item, item.objx, item.objy, item.objx, item.objy)
+                                acts.add(act)
+                            act = SimultaneousUndoAction(acts)
+                            globals_.mainWindow.undoStack.addOrExtendAction(act)
 
-                SetDirty()
+                    SetDirty()
 
             return newpos
 
@@ -450,12 +582,76 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
         return self.BoundingRect
 
 
+class LevelItemGroup(QtWidgets.QGraphicsItem):
+    """
+    Invisible parent item for all level items of one kind, like the objects in
+    a layer or all sprites. Hiding the group hides all of its items.
+    """
+    BoundingRect = QtCore.QRectF()
+
+    def __init__(self, z):
+        """
+        Creates an empty group. The items in the group are drawn in front of
+        the items of groups with a lower Z value.
+        """
+        QtWidgets.QGraphicsItem.__init__(self)
+        self.setFlag(self.ItemHasNoContents, True)
+        self.setZValue(z)
+
+    def setFrozen(self, frozen):
+        """
+        (Un)freezes the items in the group. Qt doesn't pass these flags on to
+        child items, so they are set on every item.
+        """
+        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
+        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
+
+        for item in self.childItems():
+            if not isinstance(item, LevelEditorItem): continue
+
+            item.setFlag(flag1, not frozen)
+            item.setFlag(flag2, not frozen)
+
+    def boundingRect(self):
+        """
+        Required for Qt
+        """
+        return self.BoundingRect
+
+    def paint(self, painter, option, widget=None):
+        """
+        Groups have nothing to draw
+        """
+        pass
+
+
 class ObjectItem(LevelEditorItem):
     """
-    Level editor item that represents an ingame object
+    Level editor item that represents an ingame object. Levels can have tens
+    of thousands of objects, so an object only stores its data and bounding
+    rect. Everything that's only needed while an object is selected or being
+    resized is a class attribute until then, and the grabber rects are only
+    created when they're first needed.
     """
     instanceDef = InstanceDefinition_ObjectItem
 
+    # The grabbers, in the order they're checked in: (name, index of the
+    # rect they're drawn with, index of the rect that can be clicked)
+    GRABBERS = (
+        ('TL', 0, 0), ('TR', 1, 1), ('BL', 2, 2), ('BR', 3, 3),
+        ('MT', 4, 8), ('ML', 5, 9), ('MB', 6, 10), ('MR', 7, 11),
+    )
+
+    grabbers = None  # The grabber rects, see GrabberRects
+    grabbed = None  # The name of the grabber being dragged, if any
+    dragging = False
+    dragstartx = -1
+    dragstarty = -1
+    objsDragging = None
+    wasExtended = False
+    tooltipOutdated = True
+    randomSeed = None  # Seed of the random tiles, see RandomSeed
+
     def __init__(self, tileset, type, layer, x, y, width, height, z):
         """
         Creates an object with specific data
@@ -471,36 +667,18 @@ class ObjectItem(LevelEditorItem):
         self.height = height
         self.objdata = None
 
-        self.wasExtended = False
-
-        self.TLGrabbed = self.TRGrabbed = self.BLGrabbed = self.BRGrabbed = False
-        self.MTGrabbed = self.MLGrabbed = self.MBGrabbed = self.MRGrabbed = False
-
         self.setFlag(self.ItemIsMovable, not globals_.ObjectsFrozen)
         self.setFlag(self.ItemIsSelectable, not globals_.ObjectsFrozen)
 
         self.UpdateRects()
 
-        self.dragging = False
-        self.dragstartx = -1
-        self.dragstarty = -1
-        self.objsDragging = {}
-
         globals_.DirtyOverride += 1
         self.setPos(x * 24, y * 24)
         globals_.DirtyOverride -= 1
 
         self.setZValue(z)
 
-        if layer == 0:
-            self.setVisible(globals_.Layer0Shown)
-        elif layer == 1:
-            self.setVisible(globals_.Layer1Shown)
-        elif layer == 2:
-            self.setVisible(globals_.Layer2Shown)
-
         self.updateObjCache()
-        self.UpdateTooltip()
 
     def SetType(self, tileset, type):
         """
@@ -513,13 +691,12 @@ class ObjectItem(LevelEditorItem):
 
         self.UpdateTooltip()
 
-    def UpdateTooltip(self):
+    def ToolTip(self):
         """
-        Updates the tooltip
+        Returns the tooltip
         """
-        self.setToolTip(
-            globals_.trans.string('Objects', 0, '[tileset]', self.tileset + 1, '[obj]', self.type, '[width]', self.width,
-                         '[height]', self.height, '[layer]', self.layer))
+        return globals_.trans.string('Objects', 0, '[tileset]', self.tileset + 1, '[obj]', self.type, '[width]', self.width,
+                                     '[height]', self.height, '[layer]', self.layer)
 
     def updateObjCache(self):
         """
@@ -527,39 +704,39 @@ class ObjectItem(LevelEditorItem):
         """
         self.objdata = RenderObject(self.tileset, self.type, self.width, self.height)
         self.randomise()
+        self.UpdateIndex()
 
     def isBottomRowSpecial(self):
         """
         Returns whether the bottom row of self.objdata contains the special
         vdouble top tile.
         """
-        if globals_.TilesetFilesLoaded[self.tileset] is None or globals_.TilesetInfo is None:
-            # no randomisation info -> false
-            return False
+        table = TableFor(self.tileset)
 
-        name = self.get_tileset_base_name()
-
-        if name not in globals_.TilesetInfo:
-            # tileset not randomised -> false
+        if table is None:
+            # no randomisation info, or tileset not randomised -> false
             return False
 
-        tileset_info = globals_.TilesetInfo[name]
-
         for x in range(self.width):
             # get the special data for this tile
-            tile = self.objdata[-1][x] & 0xFF
-
-            try:
-                *_, special = tileset_info[tile]
-            except KeyError:
-                # tile not randomised -> continue with next position
-                continue
+            tile = table.get(self.objdata[-1][x] & 0xFF)
 
-            if special & 0b01:
+            if tile is not None and tile.special & SPECIAL_DOUBLE_TOP:
                 return True
 
         return False
 
+    def RandomSeed(self):
+        """
+        Returns the seed of the random tiles of the object. Unless the object
+        has been given a seed, it comes from the object's data, so the object
+        looks the same every time the level is opened.
+        """
+        if self.randomSeed is not None:
+            return self.randomSeed
+
+        return hash((self.tileset, self.type, self.layer, self.objx, self.objy))
+
     def randomise(self, startx=0, starty=0, width=None, height=None):
         """
         Randomises (a part of) the self.objdata according to the loaded tileset
@@ -570,8 +747,10 @@ class ObjectItem(LevelEditorItem):
         # that returns the tile on the block next to the current tile on a
         # specified layer. Maybe something for the Area class?
 
-        if globals_.TilesetInfo is None or globals_.TilesetFilesLoaded[self.tileset] is None:
-            # no randomisation info -> exit
+        table = TableFor(self.tileset)
+
+        if table is None:
+            # no randomisation info, or tileset not randomised -> exit
             return
 
         if globals_.ObjectDefinitions[self.tileset][self.type] is None or \
@@ -579,100 +758,13 @@ class ObjectItem(LevelEditorItem):
             # slope -> exit
             return
 
-        name = self.get_tileset_base_name()
-
-        if name not in globals_.TilesetInfo:
-            # tileset not randomised -> exit
-            return
-
-        tileset_info = globals_.TilesetInfo[name]
-
         if width is None:
             width = self.width
 
         if height is None:
             height = self.height
 
-        # randomise every tile in this region
-        for y in range(starty, starty + height):
-            for x in range(startx, startx + width):
-                # should we randomise this tile?
-                tile = self.objdata[y][x] & 0xFF
-
-                try:
-                    tiles, direction, special = tileset_info[tile]
-                except KeyError:
-                    # tile not randomised -> continue with next position
-                    continue
-
-                # If the special indicates the top, don't randomise it now, but
-                # randomise it when we come across the bottom.
-                if special & 0b01:
-                    continue
-
-                tiles_ = tiles[:]
-
-                # Take direction into account - chosen tile must be different from
-                # the tile to the left/top. Using try/except here so the value has
-                # to be looked up only once.
-
-                # direction is 2 bits:
-                # highest := vertical direction; lowest := horizontal direction
-                if direction & 0b01 and x > 0:
-                    # only look at the left neighbour, since we will generate the
-                    # right neighbour later
-                    try:
-                        tiles_.remove(self.objdata[y][x-1] & 0xFF)
-                    except ValueError:
-                        pass
-
-                if direction & 0b10 and y > 0:
-                    # only look at the above neighbour, since we will generate the
-                    # neighbour below later
-                    try:
-                        tiles_.remove(self.objdata[y-1][x] & 0xFF)
-                    except ValueError:
-                        pass
-
-                # if we removed all options, just use the original tiles
-                if not tiles_:
-                    tiles_ = tiles
-
-                choice = (self.tileset << 8) | random.choice(tiles_)
-                self.objdata[y][x] = choice
-
-                # Bottom of special, so change the tile above to the tile in the
-                # previous row of the tileset image (at offset choice - 0x10).
-                if special & 0b10:
-                    if y > 0:
-                        self.objdata[y - 1][x] = choice - 0x10
-                    else:
-                        # y is equal to 0. When this happens in-game, the game
-                        # just changes the tile above (even if it's 'air') to
-                        # (choice - 0x10).
-
-                        # TODO: faking that here would mean decreasing the y position
-                        # and increasing the height of this object and its boundingrect
-                        # by 1, then adding a new row to self.objdata at the top,
-                        # then placing the choice there, and finally updating the
-                        # z position to be greater than that of the object(s) above.
-
-                        # tl;dr: A lot of work to properly implement this.
-                        pass
-
-    def get_tileset_base_name(self):
-        """
-        Returns the bare file name of the tileset file this object uses. This
-        file name has all extensions ('.arc' or '.arc.LH') removed.
-        """
-        tileset_path = globals_.TilesetFilesLoaded[self.tileset]
-        filename = os.path.splitext(os.path.basename(tileset_path))[0]
-
-        if "." in filename:
-            # The tileset file is probably LH-compressed.
-            filename = os.path.splitext(filename)[0]
-
-        return filename
+        Randomise(self.objdata, self.tileset, table, self.RandomSeed(), startx, starty, width, height)
 
     def updateObjCacheWH(self, width, height):
         """
@@ -695,10 +787,10 @@ class ObjectItem(LevelEditorItem):
             self.width, self.height = save
             return
 
-        name = self.get_tileset_base_name()
+        table = TableFor(self.tileset)
         tile = globals_.ObjectDefinitions[self.tileset][self.type].rows[0][0][1] & 0xFF
 
-        if name not in globals_.TilesetInfo or tile not in globals_.TilesetInfo[name]:
+        if table is None or tile not in table:
             # no randomisation needed -> exit
             save = (self.width, self.height)
             self.width, self.height = width, height
@@ -733,11 +825,32 @@ class ObjectItem(LevelEditorItem):
 
     def UpdateRects(self):
         """
-        Recreates the bounding and selection rects
+        Recreates the bounding rect, and drops the grabber rects
         """
         self.prepareGeometryChange()
         self.BoundingRect = QtCore.QRectF(0, 0, 24 * self.width, 24 * self.height)
-        self.SelectionRect = self.BoundingRect - QtCore.QMarginsF(0.5, 0.5, 0.5, 0.5)
+
+        if self.grabbers is not None:
+            self.grabbers = None
+
+        self.UpdateIndex()
+
+    @property
+    def LevelRect(self):
+        """
+        The rect of the object, in tiles
+        """
+        return QtCore.QRectF(self.objx, self.objy, self.width, self.height)
+
+    def GrabberRects(self):
+        """
+        Returns the grabber rects: the four corners, the four edge centers
+        (which are drawn) and the four edges between the corners (which can be
+        clicked). They're created when they're first needed, and kept until
+        the object is resized or deselected.
+        """
+        if self.grabbers is not None:
+            return self.grabbers
 
         # make sure the grabbers don't overlap
         size = min(4.8 + self.width * self.height * 0.01, min(self.width, self.height) * 24 / 3 - 1)
@@ -745,26 +858,36 @@ class ObjectItem(LevelEditorItem):
         corner_offset_width = 24 * self.width - size
         corner_offset_height = 24 * self.height - size
 
-        self.GrabberRectTL = QtCore.QRectF(0, 0, size, size)
-        self.GrabberRectTR = QtCore.QRectF(corner_offset_width, 0, size, size)
-
-        self.GrabberRectBL = QtCore.QRectF(0, corner_offset_height, size, size)
-        self.GrabberRectBR = QtCore.QRectF(corner_offset_width, corner_offset_height, size, size)
-
-        self.GrabberRectMT = QtCore.QRectF(corner_offset_width / 2, 0, size, size)
-        self.GrabberRectML = QtCore.QRectF(0, corner_offset_height / 2, size, size)
-        self.GrabberRectMB = QtCore.QRectF(corner_offset_width / 2, corner_offset_height, size, size)
-        self.GrabberRectMR = QtCore.QRectF(corner_offset_width, corner_offset_height / 2, size, size)
-
         # Create rects for the edges
         longwidth = 24 * self.width - 2 * size
         longheight = 24 * self.height - 2 * size
-        self.GrabberRectMT_ = QtCore.QRectF(size, 0, longwidth, size)
-        self.GrabberRectML_ = QtCore.QRectF(0, size, size, longheight)
-        self.GrabberRectMB_ = QtCore.QRectF(size, longheight + size, longwidth, size)
-        self.GrabberRectMR_ = QtCore.QRectF(longwidth + size, size, size, longheight)
 
-        self.LevelRect = QtCore.QRectF(self.objx, self.objy, self.width, self.height)
+        self.grabbers = (
+            QtCore.QRectF(0, 0, size, size),
+            QtCore.QRectF(corner_offset_width, 0, size, size),
+            QtCore.QRectF(0, corner_offset_height, size, size),
+            QtCore.QRectF(corner_offset_width, corner_offset_height, size, size),
+
+            QtCore.QRectF(corner_offset_width / 2, 0, size, size),
+            QtCore.QRectF(0, corner_offset_height / 2, size, size),
+            QtCore.QRectF(corner_offset_width / 2, corner_offset_height, size, size),
+            QtCore.QRectF(corner_offset_width, corner_offset_height / 2, size, size),
+
+            QtCore.QRectF(size, 0, longwidth, size),
+            QtCore.QRectF(0, size, size, longheight),
+            QtCore.QRectF(size, longheight + size, longwidth, size),
+            QtCore.QRectF(longwidth + size, size, size, longheight),
+        )
+
+        return self.grabbers
+
+    def UpdateIndex(self):
+        """
+        Refiles the object in the spatial index of its layer, so its tiles are
+        composited into the layer grid again
+        """
+        if globals_.Area is not None:
+            globals_.Area.layerIndexes[self.layer].Update(self)
 
     def itemChange(self, change, value):
         """
@@ -775,8 +898,12 @@ class ObjectItem(LevelEditorItem):
             scene = self.scene()
             if scene is None: return value
 
+            drag = globals_.SelectionDrag
+            if drag is not None and not drag.Has(self):
+                drag = None
+
             # snap to 24x24
-            newpos = value
+            newpos = value if drag is None else drag.Position(self, value)
             newpos.setX(int((newpos.x() + 12) / 24) * 24)
             newpos.setY(int((newpos.y() + 12) / 24) * 24)
             x = newpos.x()
@@ -792,84 +919,63 @@ class ObjectItem(LevelEditorItem):
             x = int(newpos.x() / 24)
             y = int(newpos.y() / 24)
             if x != self.objx or y != self.objy:
-                self.LevelRect.moveTo(x, y)
-
                 oldx = self.objx
                 oldy = self.objy
                 self.objx = x
                 self.objy = y
-                if self.positionChanged is not None:
-                    self.positionChanged(self, oldx, oldy, x, y)
+                self.UpdateIndex()
+
+                JournalMove(self, oldx, oldy, x, y)
+                with Journaled():
+                    if self.positionChanged is not None:
+                        self.positionChanged(self, oldx, oldy, x, y)
 
-                if len(globals_.mainWindow.CurrentSelection) == 1:
-                    act = MoveItemUndoAction(self, oldx, oldy, x, y)
-                    globals_.mainWindow.undoStack.addOrExtendAction(act)
-                elif len(globals_.mainWindow.CurrentSelection) > 1:
-                    pass
+                    if drag is None and len(globals_.mainWindow.CurrentSelection) == 1:
+                        act = MoveItemUndoAction(self, oldx, oldy, x, y)
+                        globals_.mainWindow.undoStack.addOrExtendAction(act)
 
-                SetDirty()
+                    SetDirty()
 
                 # updRect = QtCore.QRectF(self.x(), self.y(), self.BoundingRect.width(), self.BoundingRect.height())
                 # scene.invalidate(updRect)
 
-                scene.invalidate(self.x(), self.y(), self.width * 24, self.height * 24,
-                                 QtWidgets.QGraphicsScene.BackgroundLayer)
+                oldRect = QtCore.QRectF(self.x(), self.y(), self.width * 24, self.height * 24)
+                if drag is not None:
+                    drag.InvalidateBackground(oldRect)
+                else:
+                    scene.invalidate(oldRect, QtWidgets.QGraphicsScene.BackgroundLayer)
                 # scene.invalidate(newpos.x(), newpos.y(), self.width*24, self.height*24, QtWidgets.QGraphicsScene.BackgroundLayer)
 
             return newpos
 
+        elif change == QtWidgets.QGraphicsItem.ItemSelectedHasChanged and not value:
+            # Only selected objects show their grabbers
+            if self.grabbers is not None:
+                self.grabbers = None
+
         return QtWidgets.QGraphicsItem.itemChange(self, change, value)
 
     def paint(self, painter, option, widget):
         """
         Paints the object
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         if not self.isSelected():
             return
 
-        painter.setPen(QtGui.QPen(globals_.theme.color('object_lines_s'), 1, QtCore.Qt.DashLine))
-        painter.drawRect(self.SelectionRect)
-        painter.fillRect(self.SelectionRect, globals_.theme.color('object_fill_s'))
-
-        if self.TLGrabbed:
-            painter.fillRect(self.GrabberRectTL, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectTL, globals_.theme.color('object_lines_s'))
-
-        if self.TRGrabbed:
-            painter.fillRect(self.GrabberRectTR, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectTR, globals_.theme.color('object_lines_s'))
-
-        if self.BLGrabbed:
-            painter.fillRect(self.GrabberRectBL, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectBL, globals_.theme.color('object_lines_s'))
-
-        if self.BRGrabbed:
-            painter.fillRect(self.GrabberRectBR, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectBR, globals_.theme.color('object_lines_s'))
-
-        if self.MTGrabbed:
-            painter.fillRect(self.GrabberRectMT, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectMT, globals_.theme.color('object_lines_s'))
+        selectionRect = self.BoundingRect - QtCore.QMarginsF(0.5, 0.5, 0.5, 0.5)
 
-        if self.MLGrabbed:
-            painter.fillRect(self.GrabberRectML, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectML, globals_.theme.color('object_lines_s'))
+        painter.setPen(QtGui.QPen(globals_.theme.color('object_lines_s'), 1, QtCore.Qt.DashLine))
+        painter.drawRect(selectionRect)
+        painter.fillRect(selectionRect, globals_.theme.color('object_fill_s'))
 
-        if self.MBGrabbed:
-            painter.fillRect(self.GrabberRectMB, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectMB, globals_.theme.color('object_lines_s'))
+        rects = self.GrabberRects()
+        color = globals_.theme.color('object_lines_s')
+        grabbedColor = globals_.theme.color('object_lines_r')
 
-        if self.MRGrabbed:
-            painter.fillRect(self.GrabberRectMR, globals_.theme.color('object_lines_r'))
-        else:
-            painter.fillRect(self.GrabberRectMR, globals_.theme.color('object_lines_s'))
+        for name, drawn, clickable in self.GRABBERS:
+            painter.fillRect(rects[drawn], grabbedColor if name == self.grabbed else color)
 
     def mousePressEvent(self, event):
         """
@@ -882,34 +988,24 @@ class ObjectItem(LevelEditorItem):
                     self.objy, self.width, self.height
                 )
 
-                # swap the Z values so it doesn't look like the
-                # cloned item is the old one
-                newZ = new_item.zValue()
-                new_item.setZValue(self.zValue())
-                self.setZValue(newZ)
+                # put the clone below this object so it doesn't look like
+                # the cloned item is the old one
+                layer = globals_.Area.layers[self.layer]
+                globals_.Area.RemoveFromLayer(new_item)
+                globals_.Area.InsertIntoLayer(new_item, layer.index(self))
 
                 globals_.mainWindow.scene.clearSelection()
                 self.setSelected(True)
 
-        self.TLGrabbed = self.GrabberRectTL.contains(event.pos())
-        self.TRGrabbed = self.GrabberRectTR.contains(event.pos())
-        self.BLGrabbed = self.GrabberRectBL.contains(event.pos())
-        self.BRGrabbed = self.GrabberRectBR.contains(event.pos())
-        self.MTGrabbed = self.GrabberRectMT_.contains(event.pos())
-        self.MLGrabbed = self.GrabberRectML_.contains(event.pos())
-        self.MBGrabbed = self.GrabberRectMB_.contains(event.pos())
-        self.MRGrabbed = self.GrabberRectMR_.contains(event.pos())
-
-        if self.isSelected() and (
-            self.TLGrabbed
-            or self.TRGrabbed
-            or self.BLGrabbed
-            or self.BRGrabbed
-            or self.MTGrabbed
-            or self.MLGrabbed
-            or self.MBGrabbed
-            or self.MRGrabbed
-        ):
+        rects = self.GrabberRects()
+        self.grabbed = None
+
+        for name, drawn, clickable in self.GRABBERS:
+            if rects[clickable].contains(event.pos()):
+                self.grabbed = name
+                break
+
+        if self.isSelected() and self.grabbed is not None:
             # start dragging
             self.dragging = True
             self.dragstartx = int((event.pos().x() - 10) / 24)
@@ -927,7 +1023,7 @@ class ObjectItem(LevelEditorItem):
         else:
             LevelEditorItem.mousePressEvent(self, event)
             self.dragging = False
-            self.objsDragging = {}
+            self.objsDragging = None
 
         self.UpdateTooltip()
         self.update()
@@ -940,6 +1036,7 @@ class ObjectItem(LevelEditorItem):
 
         oldrect = self.BoundingRect
         oldrect.translate(oldX * 24, oldY * 24)
+        oldLevelRect = QtCore.QRectF(oldX, oldY, self.width, self.height)
 
         self.width, self.height = newSize
         self.UpdateRects()
@@ -947,7 +1044,21 @@ class ObjectItem(LevelEditorItem):
         updaterect = oldrect.united(self.BoundingRect.translated(self.objx * 24, self.objy * 24))
         self.scene().update(updaterect)
 
+        globals_.mainWindow.levelOverview.InvalidateRect(oldLevelRect | self.LevelRect)
+
     def mouseMoveEvent(self, event):
+        """
+        Overrides mouse movement events if needed for resizing, and records
+        the resizing in the edit journal
+        """
+        if event.buttons() != QtCore.Qt.NoButton and self.dragging:
+            with JournalEdit(*self.objsDragging):
+                self.dragResize(event)
+
+        else:
+            self.dragResize(event)
+
+    def dragResize(self, event):
         """
         Overrides mouse movement events if needed for resizing
         """
@@ -959,12 +1070,11 @@ class ObjectItem(LevelEditorItem):
             clickedx = int((event.pos().x() - 12) / 24)
             clickedy = int((event.pos().y() - 12) / 24)
 
-            cx = self.objx
-            cy = self.objy
-
-            if self.TLGrabbed:
+            grabbed = self.grabbed
+            if grabbed == 'TL':
                 if clickedx != dsx or clickedy != dsy:
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         oldWidth = self.objsDragging[obj][0] + 0
                         oldHeight = self.objsDragging[obj][1] + 0
 
@@ -1002,11 +1112,11 @@ class ObjectItem(LevelEditorItem):
 
                             obj.setPos(obj.objx * 24, obj.objy * 24)
                             obj.UpdateRects()
-                            obj.UpdateObj(cx, cy, newSize)
+                            obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.TRGrabbed:
+            elif grabbed == 'TR':
                 if clickedx < 0:
                     clickedx = 0
 
@@ -1014,6 +1124,7 @@ class ObjectItem(LevelEditorItem):
                     self.dragstartx = clickedx
 
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         oldHeight = self.objsDragging[obj][1] + 0
 
                         self.objsDragging[obj][0] += clickedx - dsx
@@ -1043,11 +1154,11 @@ class ObjectItem(LevelEditorItem):
                             newSize[0] = newWidth
 
                             obj.UpdateRects()
-                            obj.UpdateObj(cx, cy, newSize)
+                            obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.BLGrabbed:
+            elif grabbed == 'BL':
                 if clickedy < 0:
                     clickedy = 0
 
@@ -1055,6 +1166,7 @@ class ObjectItem(LevelEditorItem):
                     self.dragstarty = clickedy
 
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         oldWidth = self.objsDragging[obj][0] + 0
 
                         self.objsDragging[obj][0] -= clickedx - dsx
@@ -1081,11 +1193,11 @@ class ObjectItem(LevelEditorItem):
                                 self.objsDragging[obj][0] = oldWidth
 
                             newSize[1] = newHeight
-                            obj.UpdateObj(cx, cy, newSize)
+                            obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.BRGrabbed:
+            elif grabbed == 'BR':
                 if clickedx < 0: clickedx = 0
                 if clickedy < 0: clickedy = 0
 
@@ -1094,6 +1206,7 @@ class ObjectItem(LevelEditorItem):
                     self.dragstarty = clickedy
 
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         self.objsDragging[obj][0] += clickedx - dsx
                         self.objsDragging[obj][1] += clickedy - dsy
 
@@ -1108,13 +1221,14 @@ class ObjectItem(LevelEditorItem):
 
                         newSize = [newWidth, newHeight]
 
-                        obj.UpdateObj(cx, cy, newSize)
+                        obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.MTGrabbed:
+            elif grabbed == 'MT':
                 if clickedy != dsy:
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         oldHeight = self.objsDragging[obj][1]
 
                         self.objsDragging[obj][1] -= clickedy - dsy
@@ -1135,13 +1249,14 @@ class ObjectItem(LevelEditorItem):
                             else:
                                 self.objsDragging[obj][1] = oldHeight
 
-                            obj.UpdateObj(cx, cy, newSize)
+                            obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.MLGrabbed:
+            elif grabbed == 'ML':
                 if clickedx != dsx:
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         oldWidth = self.objsDragging[obj][0]
 
                         self.objsDragging[obj][0] -= clickedx - dsx
@@ -1163,11 +1278,11 @@ class ObjectItem(LevelEditorItem):
                             else:
                                 self.objsDragging[obj][0] = oldWidth
 
-                            obj.UpdateObj(cx, cy, newSize)
+                            obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.MBGrabbed:
+            elif grabbed == 'MB':
                 if clickedy < 0:
                     clickedy = 0
 
@@ -1175,6 +1290,7 @@ class ObjectItem(LevelEditorItem):
                     self.dragstarty = clickedy
 
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         self.objsDragging[obj][1] += clickedy - dsy
 
                         newHeight = self.objsDragging[obj][1]
@@ -1182,11 +1298,11 @@ class ObjectItem(LevelEditorItem):
                             newHeight = 1
 
                         newSize = [obj.width, newHeight]
-                        obj.UpdateObj(cx, cy, newSize)
+                        obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
-            elif self.MRGrabbed:
+            elif grabbed == 'MR':
                 if clickedx < 0:
                     clickedx = 0
 
@@ -1194,6 +1310,7 @@ class ObjectItem(LevelEditorItem):
                     self.dragstartx = clickedx
 
                     for obj in self.objsDragging:
+                        oldX, oldY = obj.objx, obj.objy
                         self.objsDragging[obj][0] += clickedx - dsx
 
                         newWidth = self.objsDragging[obj][0]
@@ -1201,7 +1318,7 @@ class ObjectItem(LevelEditorItem):
                             newWidth = 1
 
                         newSize = (newWidth, obj.height)
-                        obj.UpdateObj(cx, cy, newSize)
+                        obj.UpdateObj(oldX, oldY, newSize)
 
                     SetDirty()
 
@@ -1219,14 +1336,16 @@ class ObjectItem(LevelEditorItem):
         globals_.Area.RemoveFromLayer(self)
         self.scene().update(self.x(), self.y(), self.BoundingRect.width(), self.BoundingRect.height())
 
+        overview = globals_.mainWindow.levelOverview
+        overview.InvalidateRect(overview.ItemRect(self))
+
     def mouseReleaseEvent(self, event):
         """
         Overrides releasing the mouse after a move
         """
         LevelEditorItem.mouseReleaseEvent(self, event)
 
-        self.TLGrabbed = self.TRGrabbed = self.BLGrabbed = self.BRGrabbed = False
-        self.MTGrabbed = self.MLGrabbed = self.MBGrabbed = self.MRGrabbed = False
+        self.grabbed = None
         self.update()
 
 
@@ -1425,6 +1544,8 @@ class ZoneItem(LevelEditorItem):
         """
         Paints the zone on screen
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         painter.setClipRect(option.exposedRect)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
@@ -1602,7 +1723,7 @@ class ZoneItem(LevelEditorItem):
 
             self.scene().update(updaterect)
 
-            globals_.mainWindow.levelOverview.update()
+            globals_.mainWindow.levelOverview.Invalidate()
 
             for spr in globals_.Area.sprites:
                 spr.ImageObj.positionChanged()
@@ -1711,6 +1832,8 @@ class LocationItem(LevelEditorItem):
         """
         Paints the location on screen
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
         # Paint liquids/fog
@@ -1760,11 +1883,14 @@ class LocationItem(LevelEditorItem):
         """
         if event.buttons() != QtCore.Qt.NoButton and self.dragging:
             # Resize the location.
-            change = self.dragResize(event.scenePos(), self.dragstartx, self.dragstarty)
+            with JournalEdit(self):
+                change = self.dragResize(event.scenePos(), self.dragstartx, self.dragstarty)
+
+                if change:
+                    SetDirty()
 
             if change:
-                SetDirty()
-                globals_.mainWindow.levelOverview.update()
+                globals_.mainWindow.levelOverview.Invalidate()
 
                 if self.sizeChanged is not None:
                     self.sizeChanged(self, self.width, self.height)
@@ -1842,6 +1968,9 @@ class LocationItem(LevelEditorItem):
         globals_.Area.locations.remove(self)
         self.scene().update(self.x(), self.y(), self.BoundingRect.width(), self.BoundingRect.height())
 
+        overview = globals_.mainWindow.levelOverview
+        overview.InvalidateRect(overview.ItemRect(self))
+
 
 class SpriteItem(LevelEditorItem):
     """
@@ -2199,9 +2328,18 @@ class SpriteItem(LevelEditorItem):
             else:
                 offset_point = QtCore.QPointF()
 
+            drag = globals_.SelectionDrag
+            if drag is not None and not drag.Has(self):
+                drag = None
+
             # Convert the new position from 24 units per block into 16 units per
             # block
-            new_pos = value / 1.5
+            if drag is not None:
+                # The whole selection is being dragged, and has been snapped
+                # as one already
+                new_pos = drag.Position(self, value) / 1.5
+            else:
+                new_pos = value / 1.5
 
             # Move the position to sprite origin space by subtracting the image
             # offset
@@ -2209,7 +2347,9 @@ class SpriteItem(LevelEditorItem):
 
             # Snap this position to the grid
             drag_offset = None
-            if globals_.OverrideSnapping or QtWidgets.QApplication.keyboardModifiers() == QtCore.Qt.AltModifier:
+            if drag is not None:
+                snap_level = 1
+            elif globals_.OverrideSnapping or QtWidgets.QApplication.keyboardModifiers() == QtCore.Qt.AltModifier:
                 # Snap the smallest amount possible -> 1/16th of a block
                 snap_level = 1
             elif self.isSelected() and len(globals_.mainWindow.CurrentSelection) > 1:
@@ -2252,8 +2392,10 @@ class SpriteItem(LevelEditorItem):
             y = origin_pos.y()
 
             if x != self.objx or y != self.objy:
+                update = self.scene().update if drag is None else drag.Update
+
                 updRect = QtCore.QRectF(self.x(), self.y(), self.BoundingRect.width(), self.BoundingRect.height())
-                self.scene().update(updRect)
+                update(updRect)
 
                 self.LevelRect.moveTo(new_pos / 24)
 
@@ -2262,29 +2404,29 @@ class SpriteItem(LevelEditorItem):
                         self.pos() + auxObj.pos(),
                         auxObj.boundingRect().size(),
                     )
-                    self.scene().update(auxUpdRect)
+                    update(auxUpdRect)
 
-                self.scene().update(
-                    self.ImageObj.spritebox.BoundingRect.translated(self.pos())
-                )
+                update(self.ImageObj.spritebox.BoundingRect.translated(self.pos()))
 
                 oldx = self.objx
                 oldy = self.objy
                 self.objx = x
                 self.objy = y
-                if self.positionChanged is not None:
-                    self.positionChanged(self, oldx, oldy, x, y)
 
-                # Add moving this sprite to the undo stack.
-                if len(globals_.mainWindow.CurrentSelection) == 1:
-                    act = MoveItemUndoAction(self, oldx, oldy, x, y)
-                    globals_.mainWindow.undoStack.addOrExtendAction(act)
-                elif len(globals_.mainWindow.CurrentSelection) > 1:
-                    pass
+                JournalMove(self, oldx, oldy, x, y)
+                with Journaled():
+                    if self.positionChanged is not None:
+                        self.positionChanged(self, oldx, oldy, x, y)
 
-                self.ImageObj.positionChanged()
+                    # Add moving this sprite to the undo stack. A dragged selection
+                    # is added as a whole when it's dropped.
+                    if drag is None and len(globals_.mainWindow.CurrentSelection) == 1:
+                        act = MoveItemUndoAction(self, oldx, oldy, x, y)
+                        globals_.mainWindow.undoStack.addOrExtendAction(act)
+
+                    self.ImageObj.positionChanged()
 
-                SetDirty()
+                    SetDirty()
 
             return new_pos
 
@@ -2352,6 +2494,7 @@ class SpriteItem(LevelEditorItem):
         """
         Paints the sprite
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
 
         # Setup stuff
         if option is not None:
@@ -2367,7 +2510,13 @@ class SpriteItem(LevelEditorItem):
         spriteboxRect = QtCore.QRectF(1, 1, 22, 22)
 
         if globals_.SpriteImagesShown or overrideGlobals:
-            self.ImageObj.paint(painter)
+            profiler = globals_.PaintProfiler
+            if profiler is None:
+                self.ImageObj.paint(painter)
+            else:
+                start = time.perf_counter()
+                self.ImageObj.paint(painter)
+                profiler.AddSprite(self.type, (time.perf_counter() - start) * 1000)
 
             drawSpritebox = self.ImageObj.spritebox.shown
 
@@ -2416,6 +2565,9 @@ class SpriteItem(LevelEditorItem):
         globals_.Area.RemoveSprite(self)
         self.scene().update()  # The zone painters need for the whole thing to update
 
+        overview = globals_.mainWindow.levelOverview
+        overview.InvalidateRect(overview.ItemRect(self))
+
 
 class EntranceItem(LevelEditorItem):
     """
@@ -2424,6 +2576,7 @@ class EntranceItem(LevelEditorItem):
     instanceDef = InstanceDefinition_EntranceItem
     BoundingRect = QtCore.QRectF(0, 0, 24, 24)
     RoundedRect = QtCore.QRectF(1, 1, 22, 22)
+    tooltipOutdated = True
     EntranceImages = None
 
     class AuxEntranceItem(QtWidgets.QGraphicsItem):
@@ -2550,30 +2703,37 @@ class EntranceItem(LevelEditorItem):
         globals_.DirtyOverride -= 1
 
         self.setZValue(27000)
-        self.UpdateTooltip()
         self.UpdateRects()
 
-    def UpdateTooltip(self):
+    @property
+    def name(self):
         """
-        Updates the entrance object's tooltip
+        The name of the entrance type
         """
         if self.enttype >= len(globals_.EntranceTypeNames):
-            name = globals_.trans.string('Entrances', 1)
-        else:
-            name = globals_.EntranceTypeNames[self.enttype]
+            return globals_.trans.string('Entrances', 1)
+
+        return globals_.EntranceTypeNames[self.enttype]
 
+    @property
+    def destination(self):
+        """
+        Describes where the entrance leads
+        """
         if (self.entsettings & 0x80) != 0:
-            destination = globals_.trans.string('Entrances', 2)
+            return globals_.trans.string('Entrances', 2)
         elif self.leave_level:
-            destination = globals_.trans.string('Entrances', 7)
+            return globals_.trans.string('Entrances', 7)
         elif self.destarea == 0:
-            destination = globals_.trans.string('Entrances', 3, '[id]', self.destentrance)
+            return globals_.trans.string('Entrances', 3, '[id]', self.destentrance)
         else:
-            destination = globals_.trans.string('Entrances', 4, '[id]', self.destentrance, '[area]', self.destarea)
+            return globals_.trans.string('Entrances', 4, '[id]', self.destentrance, '[area]', self.destarea)
 
-        self.name = name
-        self.destination = destination
-        self.setToolTip(globals_.trans.string('Entrances', 0, '[ent]', self.entid, '[type]', name, '[dest]', destination))
+    def ToolTip(self):
+        """
+        Returns the entrance object's tooltip
+        """
+        return globals_.trans.string('Entrances', 0, '[ent]', self.entid, '[type]', self.name, '[dest]', self.destination)
 
     def ListString(self):
         """
@@ -2627,12 +2787,14 @@ class EntranceItem(LevelEditorItem):
 
         # Update the scene and level overview
         globals_.mainWindow.scene.update(old_rect.united(self.getFullRect()))
-        globals_.mainWindow.levelOverview.update()
+        globals_.mainWindow.levelOverview.Invalidate()
 
     def paint(self, painter, option, widget):
         """
         Paints the entrance
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         painter.setClipRect(option.exposedRect)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
@@ -2686,6 +2848,9 @@ class EntranceItem(LevelEditorItem):
         globals_.Area.entrances.remove(self)
         self.scene().update(self.x(), self.y(), self.BoundingRect.width(), self.BoundingRect.height())
 
+        overview = globals_.mainWindow.levelOverview
+        overview.InvalidateRect(overview.ItemRect(self))
+
     def itemChange(self, change, value):
         """
         Handle movement
@@ -2959,6 +3124,7 @@ class PathItem(LevelEditorItem):
     instanceDef = InstanceDefinition_PathItem
     BoundingRect = QtCore.QRectF(0, 0, 24, 24)
     RoundedRect = QtCore.QRectF(1, 1, 22, 22)
+    tooltipOutdated = True
 
     def __init__(self, objx, objy, path_id, node_id, parent):
         """
@@ -2989,7 +3155,6 @@ class PathItem(LevelEditorItem):
         globals_.OverrideSnapping = old_snap
 
         self.setZValue(25003)
-        self.UpdateTooltip()
         self.UpdateListItem()
 
     def set_path_id(self, new_id):
@@ -2999,11 +3164,11 @@ class PathItem(LevelEditorItem):
         self.listitem.setText(self.ListString())
         self.update()
 
-    def UpdateTooltip(self):
+    def ToolTip(self):
         """
-        Updates the path node's tooltip
+        Returns the path node's tooltip
         """
-        self.setToolTip(globals_.trans.string('Paths', 0, '[path]', self.pathid, '[node]', self.nodeid))
+        return globals_.trans.string('Paths', 0, '[path]', self.pathid, '[node]', self.nodeid)
 
     def ListString(self):
         """
@@ -3033,6 +3198,8 @@ class PathItem(LevelEditorItem):
         """
         Paints the path node
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
         painter.setClipRect(option.exposedRect)
 
@@ -3113,6 +3280,7 @@ class CommentItem(LevelEditorItem):
     BoundingRect = QtCore.QRectF(-8, -8, 48, 48)
     SelectionRect = QtCore.QRectF(-4, -4, 4, 4)
     Circle = QtCore.QRectF(0, 0, 32, 32)
+    tooltipOutdated = True
 
     def __init__(self, x, y, text=''):
         """
@@ -3137,7 +3305,6 @@ class CommentItem(LevelEditorItem):
         globals_.DirtyOverride -= 1
 
         self.setZValue(zval + 1)
-        self.UpdateTooltip()
 
         self.TextEdit = QtWidgets.QPlainTextEdit()
         self.TextEditProxy = globals_.mainWindow.scene.addWidget(self.TextEdit)
@@ -3167,11 +3334,11 @@ class CommentItem(LevelEditorItem):
         # selected properly.
         LevelEditorItem.mousePressEvent(self, e)
 
-    def UpdateTooltip(self):
+    def ToolTip(self):
         """
-        For compatibility, just in case
+        Returns the comment's tooltip
         """
-        self.setToolTip(globals_.trans.string('Comments', 1, '[x]', self.objx, '[y]', self.objy))
+        return globals_.trans.string('Comments', 1, '[x]', self.objx, '[y]', self.objy)
 
     def ListString(self):
         """
@@ -3204,6 +3371,8 @@ class CommentItem(LevelEditorItem):
         """
         Paints the comment
         """
+        if globals_.PaintProfiler is not None: globals_.PaintProfiler.AddItem()
+
         painter.setClipRect(option.exposedRect)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
@@ -3246,6 +3415,7 @@ class CommentItem(LevelEditorItem):
             self.reposTextEdit()
             self.TextEdit.setVisible(shouldBeVisible)
 
+    @JournalEditsOf()
     def handleTextChanged(self):
         """
         Handles the text being changed
@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+
+from PyQt5 import QtCore, QtWidgets
+
+import globals_
+from level import ReadLevelFile, LevelLoadError
+from tiles import FindTileset, ReadTileset, TilesetError
+from worker import RunInBackground
+
+# How long (in seconds) level items are created for at a time, before the
+# event loop gets to draw the scene and handle the cancel button
+LOAD_SLICE_TIME = 0.02
+
+
+def ShowLevelLoadError(parent, error):
+    """
+    Tells the user why a level file couldn't be loaded, from a LevelLoadError
+    """
+    section, num, *replacements = error.args
+
+    # The messages that come first in their section have no title
+    title = globals_.trans.string(section, 0) if num != 0 else 'Reggie!'
+
+    QtWidgets.QMessageBox.warning(parent, title, globals_.trans.string(section, num, *replacements))
+
+
+class LevelLoader:
+    """
+    Loads a level file without freezing the editor. The file is read,
+    decompressed and parsed by a worker, and the tilesets are read by workers
+    in parallel. The level items are then created in short time slices on the
+    GUI thread, so the first screen is drawn while the rest of the area is
+    still being loaded.
+    """
+
+    def __init__(self, window, path, areaNum, failed=None):
+        """
+        Prepares loading the given level file. failed is called (without
+        arguments) if the file can't be read.
+        """
+        self.window = window
+        self.path = path
+        self.areaNum = areaNum
+        self.failed = failed
+
+        self.areaData = None
+        self.parsed = None
+        self.tilesets = [None, None, None, None]
+        self.pending = 0
+
+        self.steps = None
+        self.running = False
+        self.cancelled = False
+        self.done = 0
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.RunSlice)
+
+        self.progress = QtWidgets.QProgressDialog(
+            globals_.trans.string('LevelLoadDlg', 0, '[file]', os.path.basename(path)),
+            globals_.trans.string('LevelLoadDlg', 2), 0, 0, window
+        )
+        self.progress.setWindowModality(QtCore.Qt.WindowModal)
+        self.progress.setMinimumDuration(500)
+        self.progress.setAutoReset(False)
+        self.progress.canceled.connect(self.Cancel)
+
+    def IsActive(self):
+        """
+        Returns whether this is the level load that is currently running
+        """
+        return self.window.LevelLoader is self
+
+    def Start(self):
+        """
+        Starts reading the level file in the background
+        """
+        self.progress.setValue(0)
+
+        RunInBackground(
+            ReadLevelFile, self.path, self.areaNum,
+            finished=self.LevelRead,
+            failed=self.Failed,
+        )
+
+    def LevelRead(self, result):
+        """
+        Called when the level file has been parsed. Starts reading the
+        tilesets in parallel.
+        """
+        if not self.IsActive(): return
+
+        self.areaData, self.parsed = result
+
+        for idx, name in enumerate(self.parsed['tilesets']):
+            if not name: continue
+
+            try:
+                arcname, compressed = FindTileset(name)
+            except TilesetError as e:
+                # LoadTileset shows the warning once the items are created
+                self.tilesets[idx] = e
+                continue
+
+            self.pending += 1
+
+            RunInBackground(
+                ReadTileset, idx, name, arcname, compressed,
+                finished=lambda data, idx=idx: self.TilesetRead(idx, data),
+                failed=lambda error, idx=idx: self.TilesetRead(idx, error),
+            )
+
+        if self.pending == 0:
+            self.CreateItems()
+
+    def TilesetRead(self, idx, data):
+        """
+        Called when a tileset has been read (or failed to be read)
+        """
+        if not self.IsActive(): return
+
+        self.tilesets[idx] = data
+        self.pending -= 1
+
+        if self.pending == 0:
+            self.CreateItems()
+
+    def CreateItems(self):
+        """
+        Replaces the current level with the new one, whose items are then
+        created bit by bit
+        """
+        parsed = self.parsed
+
+        # Every object and sprite is created and refreshed, everything else is
+        # only created
+        total = len(parsed['entrances']) + len(parsed['zones'][3]) + len(parsed['locations'])
+        total += len(parsed['paths']) + len(parsed['comments'])
+        total += 2 * (sum(len(records) for records in parsed['layers']) + len(parsed['sprites']))
+
+        self.progress.setLabelText(globals_.trans.string('LevelLoadDlg', 1, '[file]', os.path.basename(self.path)))
+        self.progress.setMaximum(max(total, 1))
+        self.progress.setValue(0)
+
+        self.window.fileSavePath = self.path
+        self.window.fileTitle = os.path.basename(self.path)
+        self.window.BeginLevelLoad()
+
+        self.steps = self.Steps()
+        self.timer.start(0)
+
+    def Steps(self):
+        """
+        Creates the level items, and yields how many were processed every now
+        and then
+        """
+        yield from self.window.LoadLevelSteps(self.areaData, self.areaNum, self.parsed, self.tilesets)
+        yield from self.window.RefreshLevelSteps()
+
+    def RunSlice(self):
+        """
+        Creates level items until the time slice is used up
+        """
+        # Warnings shown while loading (e.g. about missing tilesets) run a
+        # nested event loop, which keeps the timer going
+        if self.running: return
+
+        deadline = time.perf_counter() + LOAD_SLICE_TIME
+        self.running = True
+
+        try:
+            while not self.cancelled and time.perf_counter() < deadline:
+                self.done += next(self.steps)
+
+        except StopIteration:
+            self.timer.stop()
+            self.Close()
+
+            self.window.FinishLevelLoad(False, False, self.areaNum)
+            return
+
+        except Exception:
+            # The steps can't go on, and the area is only partially loaded, so
+            # it's replaced with a new level like when loading is cancelled.
+            # The error is reported rather than raised, since this is a slot.
+            self.timer.stop()
+            self.Close()
+            self.window.AbortLevelLoad()
+
+            sys.excepthook(*sys.exc_info())
+            return
+
+        finally:
+            self.running = False
+
+        if self.cancelled:
+            self.Cancel()
+            return
+
+        self.progress.setValue(min(self.done, self.progress.maximum()))
+
+    def Failed(self, error):
+        """
+        Called when the level file could not be read. The current level is
+        left untouched.
+        """
+        if not self.IsActive(): return
+
+        self.Close()
+
+        if self.failed is not None:
+            self.failed()
+
+        if not isinstance(error, LevelLoadError):
+            raise error
+
+        ShowLevelLoadError(self.window, error)
+
+    def Cancel(self):
+        """
+        Cancels loading. If the level items are already being created, a new
+        level is loaded instead, since the old level has been cleared by then.
+        """
+        if not self.IsActive(): return
+
+        # Can't stop in the middle of creating an item
+        if self.running:
+            self.cancelled = True
+            return
+
+        self.Close()
+
+        if self.steps is not None:
+            self.timer.stop()
+            self.steps.close()
+            self.window.AbortLevelLoad()
+
+    def Close(self):
+        """
+        Hides the progress dialog and marks the level load as finished
+        """
+        self.window.LevelLoader = None
+        self.progress.close()
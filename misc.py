@@ -17,6 +17,7 @@ from translation import ReggieTranslation
 from libs import lh
 from misc2 import LevelViewWidget
 from levelitems import Path, CommentItem
+from randomtiles import RandomTable
 
 ################################################################################
 ################################################################################
@@ -916,11 +917,11 @@ def LoadTilesetInfo(reload_=False):
 
         for node in root:
             if node.tag.lower() == "group":
-                randoms = parseRandom(node, types)
+                table = RandomTable(parseRandom(node, types))
 
                 for name in node.attrib['names'].split(","):
                     name = name.strip()
-                    info[name] = randoms
+                    info[name] = table
 
         del tree
         del root
@@ -1150,7 +1151,14 @@ class RecentFilesMenu(QtWidgets.QMenu):
         """
         if globals_.mainWindow.CheckDirty(): return
 
-        if not globals_.mainWindow.LoadLevel(self.FileList[number], True, 1): self.RemoveFromList(number)
+        path = self.FileList[number]
+
+        def failed():
+            # The list may have changed while the level was being read
+            if path in self.FileList:
+                self.RemoveFromList(self.FileList.index(path))
+
+        if not globals_.mainWindow.LoadLevel(path, True, 1, wait=False, failed=failed): failed()
 
 
 class DiagnosticWidget(QtWidgets.QWidget):
@@ -1518,6 +1526,9 @@ class PreferencesDialog(QtWidgets.QDialog):
                 # Insert new path node
                 self.insertPathNode = QtWidgets.QCheckBox(globals_.trans.string('PrefsDlg', 39))
 
+                # Draw the level view with OpenGL
+                self.useOpenGL = QtWidgets.QCheckBox(globals_.trans.string('PrefsDlg', 42))
+
                 # Create the main layout
                 L = QtWidgets.QFormLayout()
                 L.addRow(globals_.trans.string('PrefsDlg', 14), self.Trans)
@@ -1530,6 +1541,7 @@ class PreferencesDialog(QtWidgets.QDialog):
                 L.addWidget(self.erbIndicator)
                 L.addWidget(self.fullObjSize)
                 L.addWidget(self.insertPathNode)
+                L.addWidget(self.useOpenGL)
                 self.setLayout(L)
 
                 # Set the buttons
@@ -1568,6 +1580,7 @@ class PreferencesDialog(QtWidgets.QDialog):
 
                 self.fullObjSize.setChecked(globals_.PlaceObjectsAtFullSize)
                 self.insertPathNode.setChecked(globals_.InsertPathNode)
+                self.useOpenGL.setChecked(globals_.UseOpenGL)
 
             def ClearRecent(self):
                 """
@@ -1,10 +1,16 @@
 import pickletools
+import time
+from itertools import product
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 import globals_
-from levelitems import ListWidgetItem_SortsByOther, PathItem, CommentItem, SpriteItem, EntranceItem, LocationItem, ObjectItem, PathEditorLineItem
-from dirty import SetDirty
+from levelitems import ListWidgetItem_SortsByOther, LevelEditorItem, PathItem, CommentItem, SpriteItem, EntranceItem, LocationItem, ObjectItem, PathEditorLineItem, LevelItemGroup
+from dirty import SetDirty, JournalEdit
+from layerindex import INDEX_CELL_SIZE, LAYER_WIDTH, LAYER_HEIGHT
+from selectiondrag import SelectionDrag
+from tilecache import ChunkCache, CountTiles, DrawTiles, LevelOfDetail
+from tiles import RenderObjectCache
 
 class LevelScene(QtWidgets.QGraphicsScene):
     """
@@ -15,6 +21,114 @@ class LevelScene(QtWidgets.QGraphicsScene):
         QtWidgets.QGraphicsScene.__init__(self, *args)
         self.setBackgroundBrush(QtGui.QBrush(globals_.theme.color('bg')))
 
+        self.bulkDepth = 0
+        self.bulkItems = []
+
+        self.chunkCache = ChunkCache()
+
+        self.createGroups()
+
+    def createGroups(self):
+        """
+        Creates the groups that level items are put in. Items are only stacked
+        against items in the same group, so each group gets the Z value its
+        items used to have, and layer 0 is drawn on top of layer 1 and 2.
+        """
+        self.layerGroups = [LevelItemGroup(2 - idx) for idx in range(3)]
+        self.locationGroup = LevelItemGroup(24000)
+        self.pathGroup = LevelItemGroup(25002)
+        self.spriteGroup = LevelItemGroup(26000)
+        self.entranceGroup = LevelItemGroup(27000)
+        self.commentGroup = LevelItemGroup(50001)
+
+        add = QtWidgets.QGraphicsScene.addItem
+        for group in self.layerGroups:
+            add(self, group)
+
+        for group in (self.locationGroup, self.pathGroup, self.spriteGroup, self.entranceGroup, self.commentGroup):
+            add(self, group)
+
+    def groupFor(self, item):
+        """
+        Returns the group a level item belongs in, or None if it isn't put in
+        a group
+        """
+        if isinstance(item, ObjectItem):
+            return self.layerGroups[item.layer]
+        elif isinstance(item, SpriteItem):
+            return self.spriteGroup
+        elif isinstance(item, EntranceItem):
+            return self.entranceGroup
+        elif isinstance(item, LocationItem):
+            return self.locationGroup
+        elif isinstance(item, (PathItem, PathEditorLineItem)):
+            return self.pathGroup
+        elif isinstance(item, CommentItem):
+            return self.commentGroup
+
+        return None
+
+    def clear(self):
+        """
+        Removes and deletes all items, and creates new, empty groups
+        """
+        QtWidgets.QGraphicsScene.clear(self)
+        self.chunkCache.Clear()
+        self.createGroups()
+
+    def addItem(self, item):
+        """
+        Adds an item to the scene, or remembers it for later during a bulk
+        insertion
+        """
+        if self.bulkDepth > 0:
+            self.bulkItems.append(item)
+        else:
+            self.placeItem(item)
+
+    def placeItem(self, item):
+        """
+        Adds an item to the scene, as part of its group if it has one
+        """
+        group = self.groupFor(item)
+
+        if group is None:
+            QtWidgets.QGraphicsScene.addItem(self, item)
+        else:
+            item.setParentItem(group)
+
+    def beginBulkInsert(self):
+        """
+        Starts adding many items at once. Items passed to addItem() are only
+        added to the scene when the matching endBulkInsert() is called. Calls
+        can be nested.
+        """
+        self.bulkDepth += 1
+
+    def endBulkInsert(self):
+        """
+        Adds all items collected since beginBulkInsert() to the scene. The
+        views don't update while the items are added.
+        """
+        self.bulkDepth -= 1
+        if self.bulkDepth > 0 or not self.bulkItems: return
+
+        items = self.bulkItems
+        self.bulkItems = []
+
+        views = self.views()
+        for view in views:
+            view.setUpdatesEnabled(False)
+
+        place = self.placeItem
+        try:
+            for item in items:
+                place(item)
+        finally:
+            for view in views:
+                view.setUpdatesEnabled(True)
+                view.viewport().update()
+
     def drawBackground(self, painter, rect):
         """
         Draws all visible tiles
@@ -22,89 +136,69 @@ class LevelScene(QtWidgets.QGraphicsScene):
         QtWidgets.QGraphicsScene.drawBackground(self, painter, rect)
         if not hasattr(globals_.Area, 'layers'): return
 
-        drawrect = QtCore.QRectF(rect.x() / 24, rect.y() / 24, rect.width() / 24 + 1, rect.height() / 24 + 1)
-        isect = drawrect.intersects
-
-        layer0 = []
-        layer1 = []
-        layer2 = []
+        # the visible window of the layer grids, in tiles
+        x1 = max(int(rect.x() / 24), 0)
+        y1 = max(int(rect.y() / 24), 0)
+        x2 = min(int(rect.right() / 24) + 1, LAYER_WIDTH)
+        y2 = min(int(rect.bottom() / 24) + 1, LAYER_HEIGHT)
+        if x1 >= x2 or y1 >= y2: return
+
+        # the chunks that cover the window
+        chunks = list(product(
+            range(x1 // INDEX_CELL_SIZE, (x2 - 1) // INDEX_CELL_SIZE + 1),
+            range(y1 // INDEX_CELL_SIZE, (y2 - 1) // INDEX_CELL_SIZE + 1),
+        ))
+
+        layers = [idx for idx in (2, 1, 0) if self.layerGroups[idx].isVisible()]
+        lod = LevelOfDetail(painter.worldTransform().m11())
+        cache = self.chunkCache
+        cached = cache.CanHold(len(chunks) * len(layers), lod)
+
+        profiler = globals_.PaintProfiler
+        if profiler is not None:
+            start = time.perf_counter()
+            tiles = 0
+
+        # draw the layers back to front
+        grids = globals_.Area.layerGrids
+        for layer_idx in layers:
+            grid = grids[layer_idx]
+            grid.Refresh(x1, y1, x2, y2)
+
+            if not cached:
+                # Only show collisions on layer 1
+                DrawTiles(painter, grid, layer_idx == 1, x1, y1, x2, y2)
+
+                if profiler is not None:
+                    tiles += CountTiles(grid, x1, y1, x2, y2)
 
-        x1 = 1024
-        y1 = 512
-        x2 = 0
-        y2 = 0
-
-        # iterate through each object
-        funcs = [layer0.append, layer1.append, layer2.append]
-        show = [globals_.Layer0Shown, globals_.Layer1Shown, globals_.Layer2Shown]
-        for layer, add, process in zip(globals_.Area.layers, funcs, show):
-            if not process:
                 continue
 
-            for item in layer:
-                if not isect(item.LevelRect):
-                    continue
+            for key in chunks:
+                count = cache.Draw(painter, layer_idx, grid, key, lod)
+
+                if profiler is not None:
+                    tiles += count
 
-                add(item)
-                x1 = min(x1, item.objx)
-                x2 = max(x2, item.objx + item.width)
-                y1 = min(y1, item.objy)
-                y2 = max(y2, item.objy + item.height)
+        if profiler is not None:
+            profiler.AddBackground((time.perf_counter() - start) * 1000, tiles)
 
-        width = x2 - x1
-        height = y2 - y1
+    def helpEvent(self, event):
+        """
+        Creates the tooltip of the item under the mouse, before Qt shows the
+        tooltip of the topmost item that has one
+        """
+        widget = event.widget()
+        transform = widget.parentWidget().transform() if widget is not None else QtGui.QTransform()
 
-        # Assigning global variables to local variables for performance
-        tiles = globals_.Tiles
-        odefs = globals_.ObjectDefinitions
-        unkn_tile = globals_.Overrides[globals_.OVERRIDE_UNKNOWN].getCurrentTile()
+        for item in self.items(event.scenePos(), QtCore.Qt.IntersectsItemShape, QtCore.Qt.DescendingOrder, transform):
+            if isinstance(item, LevelEditorItem):
+                item.RefreshTooltip()
 
-        # create and draw the tilemaps
-        for layer_idx, layer in enumerate([layer2, layer1, layer0]):
-            if not layer:
-                continue
+            if item.toolTip():
+                break
 
-            tmap = [[None] * width for _ in range(height)]
-
-            for item in layer:
-                startx = item.objx - x1
-                desty = item.objy - y1
-
-                if odefs[item.tileset] is None or \
-                        odefs[item.tileset][item.type] is None:
-                    # This is an unknown object, so place -1 in the tile map.
-                    for i, row in enumerate(item.objdata, desty):
-                        destrow = tmap[i]
-                        for j in range(startx, startx + len(row)):
-                            destrow[j] = -1
-
-                    continue
-
-                # This is not an unkown object, so update the tile map normally.
-                for i, row in enumerate(item.objdata, desty):
-                    destrow = tmap[i]
-                    for j, tile in enumerate(row, startx):
-                        if tile > 0:
-                            destrow[j] = tile
-
-            painter.save()
-            painter.translate(x1 * 24, y1 * 24)
-
-            desty = -24
-            for row in tmap:
-                desty += 24
-                destx = -24
-                for tile in row:
-                    destx += 24
-                    if tile == -1:
-                        # Draw unknown tiles
-                        painter.drawPixmap(destx, desty, unkn_tile)
-                    elif tile is not None:
-                        # Only show collisions on layer 1 (i.e. layer_idx == 1)
-                        pixmap = tiles[tile].getCurrentTile(layer_idx == 1)
-                        painter.drawPixmap(destx, desty, pixmap)
-
-            painter.restore()
+        QtWidgets.QGraphicsScene.helpEvent(self, event)
 
     def getMainWindow(self):
         return globals_.mainWindow
@@ -144,10 +238,59 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
         self.lastCursorPosForMidButtonScroll = None
         self.cursorEdgeScrollTimer = None
 
+        self.gridPenCache = None
+        self.checkerboardCache = None
+
+        if globals_.UseOpenGL:
+            self.setOpenGL(True)
+        else:
+            self.updateViewportMode()
+
+    def setOpenGL(self, enabled):
+        """
+        Switches between drawing the view with OpenGL and with the raster
+        engine. Falls back to the raster engine if OpenGL isn't available.
+        Returns whether OpenGL is used.
+        """
+        if enabled and not OpenGLAvailable():
+            print('OpenGL is not available, drawing the level view without it')
+            enabled = False
+
+        if enabled == isinstance(self.viewport(), QtWidgets.QOpenGLWidget):
+            return enabled
+
+        if enabled:
+            viewport = QtWidgets.QOpenGLWidget()
+        else:
+            viewport = QtWidgets.QWidget()
+
+        self.setViewport(viewport)
+        viewport.setMouseTracking(True)
+        self.updateViewportMode()
+
+        return enabled
+
+    def updateViewportMode(self):
+        """
+        Picks how much of the view is repainted when something changes
+        """
+        # OpenGL viewports redraw everything anyway, and computing the minimal
+        # update region would only cost time. The overlays are drawn at fixed
+        # positions in the view, so they'd smear if only the changed parts of
+        # the view were repainted.
+        if (isinstance(self.viewport(), QtWidgets.QOpenGLWidget)
+                or globals_.TileCacheStatsShown
+                or (globals_.PaintProfilerShown and globals_.PaintProfiler is not None)):
+            self.setViewportUpdateMode(self.FullViewportUpdate)
+        else:
+            self.setViewportUpdateMode(self.MinimalViewportUpdate)
+
     def mousePressEvent(self, event):
         """
         Overrides mouse pressing events if needed
         """
+        # In case the release of the last drag never arrived
+        self.finishSelectionDrag()
 
         if event.button() == QtCore.Qt.BackButton:
             self.xButtonScrollTimer = QtCore.QTimer()
@@ -301,37 +444,18 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
                     self.dragstarty = clickedy
                     self.currentobj = objs
 
-                    SetDirty()
-
             elif globals_.CurrentPaintType == 9 and globals_.CommentsShown:
                 # paint a comment
                 clickedx = int((clicked.x() - 12) / 1.5)
                 clickedy = int((clicked.y() - 12) / 1.5)
 
-                com = CommentItem(clickedx, clickedy, '')
-                mw = globals_.mainWindow
-                com.positionChanged = mw.HandleComPosChange
-                com.textChanged = mw.HandleComTxtChange
-                mw.scene.addItem(com)
-                com.setVisible(globals_.CommentsShown)
-
-                clist = mw.commentList
-                com.listitem = QtWidgets.QListWidgetItem()
-                clist.addItem(com.listitem)
-
-                globals_.Area.comments.append(com)
+                com = globals_.mainWindow.CreateComment(clickedx, clickedy)
 
                 self.dragstamp = False
                 self.currentobj = com
                 self.dragstartx = clickedx
                 self.dragstarty = clickedy
 
-                globals_.mainWindow.SaveComments()
-
-                com.UpdateListItem()
-
-                SetDirty()
-
             event.accept()
 
         elif event.button() == QtCore.Qt.MidButton:
@@ -392,8 +516,40 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
             self.lastCursorPosForMidButtonScroll = event.pos()
 
         else:
+            self.beginSelectionDrag(event)
             QtWidgets.QGraphicsView.mouseMoveEvent(self, event)
 
+            if globals_.SelectionDrag is not None:
+                globals_.SelectionDrag.Flush()
+
+    def beginSelectionDrag(self, event):
+        """
+        Starts moving the selection as a group, if several items are about to
+        be dragged
+        """
+        if globals_.SelectionDrag is not None: return
+        if event.buttons() != QtCore.Qt.MouseButton.LeftButton: return
+        if len(globals_.mainWindow.CurrentSelection) < 2: return
+
+        grabber = self.scene().mouseGrabberItem()
+        if not isinstance(grabber, LevelEditorItem) or not grabber.isSelected(): return
+
+        # The item is being resized with its grabbers, which may move items
+        # too, but that's not a drag of the selection
+        if getattr(grabber, 'dragging', False): return
+
+        globals_.SelectionDrag = SelectionDrag(globals_.mainWindow.CurrentSelection)
+
+    def finishSelectionDrag(self):
+        """
+        Drops the selection that is being dragged as a group, if there is one
+        """
+        drag = globals_.SelectionDrag
+        if drag is None: return
+
+        globals_.SelectionDrag = None
+        drag.Finish()
+
     def mouseReleaseEvent(self, event):
         """
         Overrides mouse release events if needed
@@ -412,8 +568,24 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
             self.cursorEdgeScrollTimer = None
 
         QtWidgets.QGraphicsView.mouseReleaseEvent(self, event)
+        self.finishSelectionDrag()
 
     def updatePaintDraggedItems(self):
+        """Update items that are being paint-dragged (painted with
+        right-click, and dragged while it's still held down), and record
+        the changes in the edit journal. Returns True if any items are
+        being paint-dragged, False otherwise"""
+        if isinstance(self.currentobj, (list, tuple)):
+            objlist = self.currentobj
+        elif self.currentobj is not None:
+            objlist = (self.currentobj,)
+        else:
+            objlist = ()
+
+        with JournalEdit(*objlist):
+            return self.movePaintDraggedItems()
+
+    def movePaintDraggedItems(self):
         """Update items that are being paint-dragged (painted with
         right-click, and dragged while it's still held down). Returns
         True if any items are being paint-dragged, False otherwise"""
@@ -466,13 +638,20 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
 
                     # if the position changed, set the new one
                     if obj.objx != x or obj.objy != y:
+                        oldrect = QtCore.QRectF(obj.objx, obj.objy, obj.width, obj.height)
+                        globals_.mainWindow.levelOverview.InvalidateMove(oldrect, x - obj.objx, y - obj.objy)
+
                         obj.objx = x
                         obj.objy = y
                         obj.setPos(x * 24, y * 24)
-                        globals_.mainWindow.levelOverview.update()
+                        obj.UpdateIndex()
 
                     # if the size changed, recache it and update the area
                     if obj.width != width or obj.height != height:
+                        globals_.mainWindow.levelOverview.InvalidateRect(QtCore.QRectF(
+                            obj.objx, obj.objy, max(obj.width, width), max(obj.height, height),
+                        ))
+
                         obj.updateObjCacheWH(width, height)
                         obj.width = width
                         obj.height = height
@@ -484,15 +663,16 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
 
                         obj.UpdateRects()
                         obj.scene().update(updaterect)
-                        globals_.mainWindow.levelOverview.update()
 
                 elif isinstance(obj, type_loc):
                     # resize/move the current location
+                    overview = globals_.mainWindow.levelOverview
+                    oldrect = overview.ItemRect(obj)
                     change = obj.dragResize(pos, self.dragstartx, self.dragstarty)
 
                     if change:  # Update the location editor
                         globals_.mainWindow.locationEditor.setLocation(obj)
-                        globals_.mainWindow.levelOverview.update()
+                        overview.InvalidateRect(oldrect | overview.ItemRect(obj))
 
                 elif isinstance(obj, type_spr):
                     # move the created sprite
@@ -500,10 +680,13 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
                     clickedy = int((pos.y() - 12) / 1.5)
 
                     if obj.objx != clickedx or obj.objy != clickedy:
+                        overview = globals_.mainWindow.levelOverview
+                        overview.InvalidateRect(overview.ItemRect(obj))
+
                         obj.setNewObjPos(clickedx, clickedy)
                         obj.ImageObj.positionChanged()
                         obj.UpdateListItem()
-                        globals_.mainWindow.levelOverview.update()
+                        overview.InvalidateRect(overview.ItemRect(obj))
 
                 elif isinstance(obj, (type_ent, type_path, type_com)):
                     # move the created entrance/path/comment
@@ -511,6 +694,9 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
                     clickedy = int((pos.y() - 12) / 1.5)
 
                     if obj.objx != clickedx or obj.objy != clickedy:
+                        overview = globals_.mainWindow.levelOverview
+                        overview.InvalidateMove(overview.ItemRect(obj), (clickedx - obj.objx) / 16, (clickedy - obj.objy) / 16)
+
                         obj.objx = clickedx
                         obj.objy = clickedy
                         obj.setPos(int(clickedx * 1.5), int(clickedy * 1.5))
@@ -519,7 +705,6 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
                             obj.path.node_moved(obj)
 
                         obj.UpdateListItem()
-                        globals_.mainWindow.levelOverview.update()
 
         else:
             # The user is dragging a stamp - many objects.
@@ -564,7 +749,7 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
                         obj.ImageObj.positionChanged()
 
             self.scene().update()
-            globals_.mainWindow.levelOverview.update()
+            globals_.mainWindow.levelOverview.Invalidate()
 
     def scrollIfCursorNearEdge(self):
         """Scroll the view if the cursor is dragging and near the edge"""
@@ -614,17 +799,104 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
         Handles paint events and fires a signal
         """
         self.repaint.emit()
+
+        profiler = globals_.PaintProfiler
+        if profiler is None:
+            QtWidgets.QGraphicsView.paintEvent(self, e)
+            return
+
+        profiler.BeginFrame()
         QtWidgets.QGraphicsView.paintEvent(self, e)
+        profiler.EndFrame()
 
     def drawForeground(self, painter, rect):
         """
         Draws a foreground grid and other stuff
         """
-        # Draws a foreground grid
-        if globals_.GridType is None: return
+        if globals_.GridType is not None:
+            self.drawGrid(painter, rect)
 
+        if globals_.TileCacheStatsShown:
+            self.drawTileCacheStats(painter)
+
+        if globals_.PaintProfilerShown and globals_.PaintProfiler is not None:
+            self.drawPaintProfile(painter)
+
+    def drawTileCacheStats(self, painter):
+        """
+        Draws how well the tile chunk cache and the render cache of objects
+        are doing in the top left corner of the view
+        """
+        cache = self.scene().chunkCache
+        objects = RenderObjectCache
+        lines = [
+            'Tile chunks: %d cached (%.1f of %d MB), %.1f%% hits (%d of %d)' % (
+                len(cache.chunks), cache.used / 1048576, cache.budget // 1048576,
+                cache.HitRate() * 100, cache.hits, cache.hits + cache.misses,
+            ),
+            'Rendered objects: %d cached (%d of %d tiles), %.1f%% hits (%d of %d)' % (
+                len(objects.objects), objects.used, objects.limit,
+                objects.HitRate() * 100, objects.hits, objects.hits + objects.misses,
+            ),
+        ]
+        text = '\n'.join(lines)
+
+        painter.save()
+        painter.resetTransform()
+
+        metrics = painter.fontMetrics()
+        box = QtCore.QRectF(4, 4, max(metrics.width(line) for line in lines) + 8, metrics.height() * len(lines) + 4)
+
+        painter.fillRect(box, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtCore.Qt.white)
+        painter.drawText(box, QtCore.Qt.AlignCenter, text)
+
+        painter.restore()
+
+    def drawPaintProfile(self, painter):
+        """
+        Draws the stats of the last frame the paint profiler measured, and the
+        sprite types whose images took the most time to paint, in the top
+        right corner of the view
+        """
+        profiler = globals_.PaintProfiler
+        stats = profiler.last
+
+        lines = [
+            'Frame: %.2f ms (%.0f fps)' % (stats.frame_ms, 1000 / stats.frame_ms if stats.frame_ms else 0),
+            'Tiles: %.2f ms, %d drawn' % (stats.background_ms, stats.tiles),
+            'Items painted: %d' % stats.items,
+        ]
+
+        if profiler.writer is not None:
+            lines.append('Recording: %d frames' % profiler.recordFrames)
+
+        top = profiler.TopSprites()
+        if top:
+            lines.append('Slowest sprite images:')
+
+            for type, paints, spent in top:
+                lines.append('  %d: %.2f ms in %d paints (%.3f ms each)' % (type, spent, paints, spent / paints))
+
+        painter.save()
+        painter.resetTransform()
+
+        metrics = painter.fontMetrics()
+        width = max(metrics.width(line) for line in lines) + 8
+        height = metrics.height() * len(lines) + 4
+        box = QtCore.QRectF(self.viewport().width() - width - 4, 4, width, height)
+
+        painter.fillRect(box, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtCore.Qt.white)
+        painter.drawText(box.adjusted(4, 2, -4, -2), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, '\n'.join(lines))
+
+        painter.restore()
+
+    def drawGrid(self, painter, rect):
+        """
+        Draws a foreground grid
+        """
         Zoom = globals_.mainWindow.ZoomLevel
-        drawLine = painter.drawLine
         GridColor = globals_.theme.color('grid')
 
         if globals_.GridType == 'grid':  # draw a classic grid
@@ -636,83 +908,39 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
             starty -= (starty % 24)
             endy = starty + rect.height() + 24
 
+            # Sort the lines by the pen they're drawn with, so each kind of
+            # line can be drawn at once
+            wide, dashed, dotted = [], [], []
+
             x = startx
             while x <= endx:
+                line = QtCore.QLineF(x, starty, x, endy)
                 if x % 192 == 0:
-                    painter.setPen(QtGui.QPen(GridColor, 2, QtCore.Qt.DashLine))
-                    drawLine(QtCore.QPointF(x, starty), QtCore.QPointF(x, endy))
+                    wide.append(line)
                 elif x % 96 == 0 and Zoom >= 25:
-                    painter.setPen(QtGui.QPen(GridColor, 1, QtCore.Qt.DashLine))
-                    drawLine(QtCore.QPointF(x, starty), QtCore.QPointF(x, endy))
+                    dashed.append(line)
                 elif Zoom >= 50:
-                    painter.setPen(QtGui.QPen(GridColor, 1, QtCore.Qt.DotLine))
-                    drawLine(QtCore.QPointF(x, starty), QtCore.QPointF(x, endy))
+                    dotted.append(line)
                 x += 24
 
             y = starty
             while y <= endy:
+                line = QtCore.QLineF(startx, y, endx, y)
                 if y % 192 == 0:
-                    painter.setPen(QtGui.QPen(GridColor, 2, QtCore.Qt.DashLine))
-                    drawLine(QtCore.QPointF(startx, y), QtCore.QPointF(endx, y))
+                    wide.append(line)
                 elif y % 96 == 0 and Zoom >= 25:
-                    painter.setPen(QtGui.QPen(GridColor, 1, QtCore.Qt.DashLine))
-                    drawLine(QtCore.QPointF(startx, y), QtCore.QPointF(endx, y))
+                    dashed.append(line)
                 elif Zoom >= 50:
-                    painter.setPen(QtGui.QPen(GridColor, 1, QtCore.Qt.DotLine))
-                    drawLine(QtCore.QPointF(startx, y), QtCore.QPointF(endx, y))
+                    dotted.append(line)
                 y += 24
 
+            for pen, lines in zip(self.gridPens(GridColor), (wide, dashed, dotted)):
+                if lines:
+                    painter.setPen(pen)
+                    painter.drawLines(lines)
+
         else:  # draw a checkerboard
-            L = 0.2
-            D = 0.1  # Change these values to change the checkerboard opacity
-
-            Light = QtGui.QColor(GridColor)
-            Dark = QtGui.QColor(GridColor)
-            Light.setAlpha(int(Light.alpha() * L))
-            Dark.setAlpha(int(Dark.alpha() * D))
-
-            size = 24 if Zoom >= 50 else 96
-
-            board = QtGui.QPixmap(8 * size, 8 * size)
-            board.fill(QtGui.QColor(0, 0, 0, 0))
-            p = QtGui.QPainter(board)
-            p.setPen(QtCore.Qt.NoPen)
-
-            p.setBrush(QtGui.QBrush(Light))
-            for x, y in ((0, size), (size, 0)):
-                p.drawRect(x + (4 * size), y, size, size)
-                p.drawRect(x + (4 * size), y + (2 * size), size, size)
-                p.drawRect(x + (6 * size), y, size, size)
-                p.drawRect(x + (6 * size), y + (2 * size), size, size)
-
-                p.drawRect(x, y + (4 * size), size, size)
-                p.drawRect(x, y + (6 * size), size, size)
-                p.drawRect(x + (2 * size), y + (4 * size), size, size)
-                p.drawRect(x + (2 * size), y + (6 * size), size, size)
-
-            p.setBrush(QtGui.QBrush(Dark))
-            for x, y in ((0, 0), (size, size)):
-                p.drawRect(x, y, size, size)
-                p.drawRect(x, y + (2 * size), size, size)
-                p.drawRect(x + (2 * size), y, size, size)
-                p.drawRect(x + (2 * size), y + (2 * size), size, size)
-
-                p.drawRect(x, y + (4 * size), size, size)
-                p.drawRect(x, y + (6 * size), size, size)
-                p.drawRect(x + (2 * size), y + (4 * size), size, size)
-                p.drawRect(x + (2 * size), y + (6 * size), size, size)
-
-                p.drawRect(x + (4 * size), y, size, size)
-                p.drawRect(x + (4 * size), y + (2 * size), size, size)
-                p.drawRect(x + (6 * size), y, size, size)
-                p.drawRect(x + (6 * size), y + (2 * size), size, size)
-
-                p.drawRect(x + (4 * size), y + (4 * size), size, size)
-                p.drawRect(x + (4 * size), y + (6 * size), size, size)
-                p.drawRect(x + (6 * size), y + (4 * size), size, size)
-                p.drawRect(x + (6 * size), y + (6 * size), size, size)
-
-            del p
+            board = self.checkerboard(GridColor, 24 if Zoom >= 50 else 96)
 
             # Adjust the rectangle to align with the grid, so we don't have to
             # paint pixmaps on non-integer coordinates
@@ -722,6 +950,92 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
 
             painter.drawTiledPixmap(rect, board)
 
+    def gridPens(self, GridColor):
+        """
+        Returns the pens for the wide, dashed and dotted grid lines. They are
+        only created again when the grid colour changes.
+        """
+        key = GridColor.rgba()
+        if self.gridPenCache is None or self.gridPenCache[0] != key:
+            pens = (
+                QtGui.QPen(GridColor, 2, QtCore.Qt.DashLine),
+                QtGui.QPen(GridColor, 1, QtCore.Qt.DashLine),
+                QtGui.QPen(GridColor, 1, QtCore.Qt.DotLine),
+            )
+            self.gridPenCache = (key, pens)
+
+        return self.gridPenCache[1]
+
+    def checkerboard(self, GridColor, size):
+        """
+        Returns a pixmap of 8x8 checkerboard squares of the given size. It's
+        only drawn again when the grid colour or the size changes.
+        """
+        key = (GridColor.rgba(), size)
+        if self.checkerboardCache is not None and self.checkerboardCache[0] == key:
+            return self.checkerboardCache[1]
+
+        L = 0.2
+        D = 0.1  # Change these values to change the checkerboard opacity
+
+        Light = QtGui.QColor(GridColor)
+        Dark = QtGui.QColor(GridColor)
+        Light.setAlpha(int(Light.alpha() * L))
+        Dark.setAlpha(int(Dark.alpha() * D))
+
+        board = QtGui.QPixmap(8 * size, 8 * size)
+        board.fill(QtGui.QColor(0, 0, 0, 0))
+        p = QtGui.QPainter(board)
+        p.setPen(QtCore.Qt.NoPen)
+
+        p.setBrush(QtGui.QBrush(Light))
+        for x, y in ((0, size), (size, 0)):
+            p.drawRect(x + (4 * size), y, size, size)
+            p.drawRect(x + (4 * size), y + (2 * size), size, size)
+            p.drawRect(x + (6 * size), y, size, size)
+            p.drawRect(x + (6 * size), y + (2 * size), size, size)
+
+            p.drawRect(x, y + (4 * size), size, size)
+            p.drawRect(x, y + (6 * size), size, size)
+            p.drawRect(x + (2 * size), y + (4 * size), size, size)
+            p.drawRect(x + (2 * size), y + (6 * size), size, size)
+
+        p.setBrush(QtGui.QBrush(Dark))
+        for x, y in ((0, 0), (size, size)):
+            p.drawRect(x, y, size, size)
+            p.drawRect(x, y + (2 * size), size, size)
+            p.drawRect(x + (2 * size), y, size, size)
+            p.drawRect(x + (2 * size), y + (2 * size), size, size)
+
+            p.drawRect(x, y + (4 * size), size, size)
+            p.drawRect(x, y + (6 * size), size, size)
+            p.drawRect(x + (2 * size), y + (4 * size), size, size)
+            p.drawRect(x + (2 * size), y + (6 * size), size, size)
+
+            p.drawRect(x + (4 * size), y, size, size)
+            p.drawRect(x + (4 * size), y + (2 * size), size, size)
+            p.drawRect(x + (6 * size), y, size, size)
+            p.drawRect(x + (6 * size), y + (2 * size), size, size)
+
+            p.drawRect(x + (4 * size), y + (4 * size), size, size)
+            p.drawRect(x + (4 * size), y + (6 * size), size, size)
+            p.drawRect(x + (6 * size), y + (4 * size), size, size)
+            p.drawRect(x + (6 * size), y + (6 * size), size, size)
+
+        del p
+
+        self.checkerboardCache = (key, board)
+        return board
+
+def OpenGLAvailable():
+    """
+    Returns whether an OpenGL context can be created. This is also the case
+    with Mesa's software renderer, so it doesn't need a GPU.
+    """
+    context = QtGui.QOpenGLContext()
+    return context.create() and context.isValid()
+
+
 def DecodeOldReggieInfo(data, validKeys):
     """
     Decode the provided level info data into a dictionary, which will
@@ -0,0 +1,165 @@
+import csv
+import time
+
+# How many sprite types the overlay lists
+PROFILER_TOP_SPRITES = 5
+
+# Columns of a recorded paint profile
+PROFILE_COLUMNS = (
+    'frame', 'time_s', 'frame_ms', 'background_ms', 'tiles', 'items_painted',
+    'sprite_images_ms', 'slowest_sprite', 'slowest_sprite_ms',
+)
+
+
+class FrameStats:
+    """
+    What the profiler measured while one frame was painted
+    """
+
+    def __init__(self):
+        """
+        Creates empty stats
+        """
+        self.frame_ms = 0
+        self.background_ms = 0
+        self.tiles = 0
+        self.items = 0
+
+        # Sprite type -> [paints, time in ms]
+        self.sprites = {}
+
+
+class PaintProfiler:
+    """
+    Measures where the level view spends its time while it's painted: the
+    whole frame, the tiles in LevelScene.drawBackground and the sprite images,
+    by sprite type. The stats of every frame can be recorded to a CSV file.
+    """
+
+    def __init__(self):
+        """
+        Creates a profiler that hasn't seen any frames yet
+        """
+        self.current = FrameStats()
+        self.last = FrameStats()
+        self.frames = 0
+        self.frameStart = 0
+
+        # Sprite type -> [paints, total time in ms], since the profiler started
+        self.sprites = {}
+
+        self.file = None
+        self.writer = None
+        self.recordStart = 0
+        self.recordFrames = 0
+
+    def BeginFrame(self):
+        """
+        Starts measuring a frame
+        """
+        self.current = FrameStats()
+        self.frameStart = time.perf_counter()
+
+    def EndFrame(self):
+        """
+        Finishes measuring a frame, and records it if a recording is running
+        """
+        stats = self.current
+        stats.frame_ms = (time.perf_counter() - self.frameStart) * 1000
+
+        sprites = self.sprites
+        for type, (paints, spent) in stats.sprites.items():
+            total = sprites.get(type)
+
+            if total is None:
+                sprites[type] = [paints, spent]
+            else:
+                total[0] += paints
+                total[1] += spent
+
+        self.last = stats
+        self.frames += 1
+
+        if self.writer is not None:
+            self.WriteFrame(stats)
+
+    def AddBackground(self, spent, tiles):
+        """
+        Adds time spent drawing the tiles of the frame, in ms
+        """
+        self.current.background_ms += spent
+        self.current.tiles += tiles
+
+    def AddItem(self):
+        """
+        Counts a level item that was painted in the frame
+        """
+        self.current.items += 1
+
+    def AddSprite(self, type, spent):
+        """
+        Adds time spent painting the image of a sprite of the given type, in ms
+        """
+        sprites = self.current.sprites
+        total = sprites.get(type)
+
+        if total is None:
+            sprites[type] = [1, spent]
+        else:
+            total[0] += 1
+            total[1] += spent
+
+    def TopSprites(self, count=PROFILER_TOP_SPRITES):
+        """
+        Returns the sprite types whose images took the most time to paint
+        since the profiler started, as a list of (type, paints, total ms)
+        """
+        ranked = sorted(self.sprites.items(), key=lambda entry: entry[1][1], reverse=True)
+        return [(type, paints, spent) for type, (paints, spent) in ranked[:count]]
+
+    def StartRecording(self, path):
+        """
+        Starts recording the stats of every frame to a CSV file
+        """
+        self.StopRecording()
+
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(PROFILE_COLUMNS)
+        self.recordStart = time.perf_counter()
+        self.recordFrames = 0
+
+    def StopRecording(self):
+        """
+        Stops recording, if a recording is running
+        """
+        if self.file is None: return
+
+        self.file.close()
+        self.file = None
+        self.writer = None
+
+    def WriteFrame(self, stats):
+        """
+        Writes the stats of one frame to the recording
+        """
+        self.recordFrames += 1
+        sprites = stats.sprites
+
+        if sprites:
+            slowest = max(sprites, key=lambda type: sprites[type][1])
+            slowest_ms = '%.3f' % sprites[slowest][1]
+        else:
+            slowest = slowest_ms = ''
+
+        self.writer.writerow((
+            self.recordFrames,
+            '%.3f' % (time.perf_counter() - self.recordStart),
+            '%.3f' % stats.frame_ms,
+            '%.3f' % stats.background_ms,
+            stats.tiles,
+            stats.items,
+            '%.3f' % sum(spent for paints, spent in sprites.values()),
+            slowest,
+            slowest_ms,
+        ))
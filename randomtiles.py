@@ -0,0 +1,173 @@
+import os
+import random
+
+import globals_
+
+# Values of the 'special' setting of a randomised tile
+SPECIAL_DOUBLE_TOP = 0b01
+SPECIAL_DOUBLE_BOTTOM = 0b10
+
+# Bits of the 'direction' setting of a randomised tile
+DIRECTION_HORIZONTAL = 0b01
+DIRECTION_VERTICAL = 0b10
+
+# Tileset file -> RandomTable (or None), for the tileset info it was made for
+TableCache = {}
+TableCacheInfo = None
+
+
+class RandomTile:
+    """
+    How one tile of a tileset is randomised. The tiles it may become are
+    worked out for every pair of neighbours up front, so randomising a tile
+    is a lookup and a random choice.
+    """
+
+    def __init__(self, values, direction, special):
+        """
+        Creates the rules of a tile, from its settings in the tileset info
+        """
+        self.values = tuple(values)
+        self.direction = direction
+        self.special = special
+
+        # (tile to the left, tile above) -> tiles to choose from. A
+        # neighbour that can't be chosen anyway is None.
+        self.choices = {}
+
+        neighbours = [None] + sorted(set(values))
+        for left in neighbours:
+            for above in neighbours:
+                options = list(values)
+
+                # Like list.remove, so a value that's listed twice to be
+                # chosen more often only loses one of its chances
+                for neighbour in (left, above):
+                    if neighbour is not None and neighbour in options:
+                        options.remove(neighbour)
+
+                # if we removed all options, just use the original tiles
+                self.choices[left, above] = tuple(options) or self.values
+
+    def Choices(self, left, above):
+        """
+        Returns the tiles this tile may become, next to the given tiles
+        """
+        choices = self.choices.get((left, above))
+
+        if choices is None:
+            choices = self.choices[
+                left if (left, None) in self.choices else None,
+                above if (None, above) in self.choices else None,
+            ]
+
+        return choices
+
+
+class RandomTable:
+    """
+    The randomisation rules of the tiles of a group of tilesets
+    """
+
+    def __init__(self, randoms):
+        """
+        Creates a table from the parsed 'random' tags of a group, which map
+        a tile to [values, direction, special]
+        """
+        self.tiles = {}
+
+        # Tiles of the same 'random' tag share their rules
+        shared = {}
+        for tile, (values, direction, special) in randoms.items():
+            key = (id(values), direction, special)
+            rules = shared.get(key)
+
+            if rules is None:
+                rules = shared[key] = RandomTile(values, direction, special)
+
+            self.tiles[tile] = rules
+
+    def __contains__(self, tile):
+        return tile in self.tiles
+
+    def get(self, tile):
+        """
+        Returns the rules of a tile, or None if it isn't randomised
+        """
+        return self.tiles.get(tile)
+
+
+def TilesetBaseName(path):
+    """
+    Returns the bare file name of a tileset file, without '.arc' or '.arc.LH'
+    """
+    filename = os.path.splitext(os.path.basename(path))[0]
+
+    if "." in filename:
+        # The tileset file is probably LH-compressed.
+        filename = os.path.splitext(filename)[0]
+
+    return filename
+
+
+def TableFor(tileset):
+    """
+    Returns the RandomTable of the tileset loaded in a slot, or None if its
+    tiles aren't randomised
+    """
+    global TableCacheInfo
+
+    info = globals_.TilesetInfo
+    path = globals_.TilesetFilesLoaded[tileset]
+    if info is None or path is None: return None
+
+    if TableCacheInfo is not info:
+        TableCache.clear()
+        TableCacheInfo = info
+
+    try:
+        return TableCache[path]
+    except KeyError:
+        table = TableCache[path] = info.get(TilesetBaseName(path))
+        return table
+
+
+def Randomise(objdata, tileset, table, seed, startx, starty, width, height):
+    """
+    Randomises a region of the rendered tiles of an object. The random
+    numbers come from the given seed and the region, so rendering the same
+    object again gives the same tiles.
+    """
+    rng = random.Random(hash((seed, startx, starty, width, height)))
+    choice = rng.choice
+    rules = table.tiles
+    base = tileset << 8
+
+    for y in range(starty, starty + height):
+        row = objdata[y]
+        above = objdata[y - 1] if y > 0 else None
+
+        for x in range(startx, startx + width):
+            tile = rules.get(row[x] & 0xFF)
+
+            # tile not randomised -> continue with next position
+            if tile is None: continue
+
+            # If the special indicates the top, don't randomise it now, but
+            # randomise it when we come across the bottom.
+            if tile.special & SPECIAL_DOUBLE_TOP: continue
+
+            # The chosen tile must be different from the tile to the left /
+            # above, which have been randomised already
+            left = row[x - 1] & 0xFF if tile.direction & DIRECTION_HORIZONTAL and x > 0 else None
+            up = above[x] & 0xFF if tile.direction & DIRECTION_VERTICAL and above is not None else None
+
+            new = base | choice(tile.Choices(left, up))
+            row[x] = new
+
+            # Bottom of special, so change the tile above to the tile in the
+            # previous row of the tileset image (at offset choice - 0x10).
+            # When this happens in-game at the top of an object, the game
+            # changes the tile above the object instead, which isn't shown.
+            if tile.special & SPECIAL_DOUBLE_BOTTOM and above is not None:
+                above[x] = new - 0x10
@@ -78,6 +78,7 @@ if not hasattr(QtWidgets.QGraphicsItem, 'ItemSendsGeometryChanges'):
 
 # Local imports
 import archive
+import autosave
 import sprites
 import spritelib as SLib
 import common
@@ -88,24 +89,29 @@ import globals_
 ################################################################################
 ################################################################################
 
-from libs import lh, lib_versions, lz77
+from libs import lh, lib_versions
 from ui import GetIcon, SetAppStyle, ListWidgetWithToolTipSignal, LoadNumberFont, LoadTheme, IconsOnlyTabBar
 from misc import LoadActionsLists, LoadSpriteData, LoadTilesetInfo, FilesAreMissing, module_path, IsNSMBLevel, ChooseLevelNameDialog, LoadLevelNames, PreferencesDialog, LoadSpriteCategories, ZoomWidget, ZoomStatusWidget, RecentFilesMenu, SetGamePaths, areValidGamePaths, LoadZoneThemes
 from misc2 import LevelScene, LevelViewWidget
-from dirty import setting, setSetting, SetDirty
+from dirty import setting, setSetting, SetDirty, JournalCreate, JournalDelete, Journaled, JournalEdit
 from gamedef import GameDefMenu, LoadGameDef
 from levelitems import LocationItem, ZoneItem, ObjectItem, SpriteItem, EntranceItem, ListWidgetItem_SortsByOther, PathItem, CommentItem, PathEditorLineItem
-from dialogs import AutoSavedInfoDialog, DiagnosticToolDialog, ScreenCapChoiceDialog, AreaChoiceDialog, ObjectTypeSwapDialog, ObjectTilesetSwapDialog, ObjectShiftDialog, MetaInfoDialog, AboutDialog, CameraProfilesDialog
+from dialogs import AutoSavedInfoDialog, DiagnosticToolDialog, ScreenCapChoiceDialog, AreaChoiceDialog, ObjectTypeSwapDialog, ObjectTilesetSwapDialog, ObjectShiftDialog, MetaInfoDialog, AboutDialog, CameraProfilesDialog, StageSearchDialog
 from background import BGDialog
 from zones import ZonesDialog
 from tiles import UnloadTileset, LoadTileset, LoadOverrides
 from area import AreaOptionsDialog
-from level import Level_NSMBW
+from level import Level_NSMBW, LevelSaveError, LevelLoadError, ReadLevelFile, WriteSnapshot, SplitLevelArchive, LOAD_BATCH_SIZE
+from levelloader import LevelLoader, ShowLevelLoadError
 from sidelists import Stamp, StampChooserWidget, SpriteList, SpritePickerWidget, ObjectPickerWidget, LevelOverviewWidget
 from spriteeditor import SpriteEditorWidget
 from editors import LocationEditorWidget, PathNodeEditorWidget, EntranceEditorWidget
 from undo import UndoStack
+from worker import RunInBackground
 from translation import LoadTranslation
+from viewbench import RunViewBenchmark, RunObjectBenchmark, RunRenderBenchmark
+from paintprofiler import PaintProfiler
+from screenshot import SCREENSHOT_SCALES, ScaledSize, StripQueue, RenderStrips, WriteStrips
 
 ################################################################################
 ################################################################################
@@ -227,6 +233,10 @@ class ReggieWindow(QtWidgets.QMainWindow):
         Finishes initialization. (fixes bugs with some widgets calling globals_.mainWindow.something before it's init'ed)
         """
 
+        self.AutosaveWorker = None
+        self.SaveWorker = None
+        self.ScreenshotWorker = None
+        self.LevelLoader = None
         self.AutosaveTimer = QtCore.QTimer()
         self.AutosaveTimer.timeout.connect(self.Autosave)
         self.AutosaveTimer.start(20000)
@@ -245,6 +255,11 @@ class ReggieWindow(QtWidgets.QMainWindow):
         self.ZoomWidget = ZoomWidget()
         self.ZoomStatusWidget = ZoomStatusWidget()
         #self.statusBar().addPermanentWidget(self.diagnostic)
+        self.saveProgress = QtWidgets.QProgressBar()
+        self.saveProgress.setFormat(globals_.trans.string('SaveProgress', 0))
+        self.saveProgress.setMaximumWidth(200)
+        self.saveProgress.setVisible(False)
+        self.statusBar().addPermanentWidget(self.saveProgress)
         self.statusBar().addPermanentWidget(self.ZoomWidget)
         self.statusBar().addPermanentWidget(self.ZoomStatusWidget)
 
@@ -255,15 +270,25 @@ class ReggieWindow(QtWidgets.QMainWindow):
         loaded = False
         self.fileSavePath = None
 
+        # An auto-saved level is restored into the area the journal belongs to
+        area = globals_.AutoSaveArea if globals_.RestoredFromAutoSave else 1
+
         if len(sys.argv) > 1 and IsNSMBLevel(sys.argv[1]):
-            loaded = self.LoadLevel(sys.argv[1], True, 1)
+            loaded = self.LoadLevel(sys.argv[1], True, area)
         else:
             lastlevel = globals_.gamedef.GetLastLevel()
             if lastlevel is not None:
-                loaded = self.LoadLevel(lastlevel, True, 1)
+                loaded = self.LoadLevel(lastlevel, True, area)
 
         if not loaded:
-            self.LoadLevel('01-01', False, 1)
+            self.LoadLevel('01-01', False, area)
+
+        # Replay the edits that were made after the autosave was taken
+        if globals_.AutoSaveJournal:
+            autosave.ReplayJournal(globals_.AutoSaveJournal)
+            globals_.AutoSaveJournal = None
+
+            SetDirty()
 
         # call each toggle-button handler to set each feature correctly upon
         # startup
@@ -565,6 +590,18 @@ class ReggieWindow(QtWidgets.QMainWindow):
             QtGui.QKeySequence('Ctrl+G'),
         )
 
+        self.CreateAction(
+            'paintprofiler', self.HandlePaintProfilerToggle, None,
+            globals_.trans.stringOneLine('MenuItems', 144), globals_.trans.stringOneLine('MenuItems', 145),
+            None, True,
+        )
+
+        self.CreateAction(
+            'recordpaintprofile', self.HandleRecordPaintProfile, None,
+            globals_.trans.stringOneLine('MenuItems', 146), globals_.trans.stringOneLine('MenuItems', 147),
+            None, True,
+        )
+
         self.CreateAction(
             'zoommax', self.HandleZoomMax, GetIcon('zoommax'),
             globals_.trans.stringOneLine('MenuItems', 62), globals_.trans.stringOneLine('MenuItems', 63),
@@ -646,6 +683,12 @@ class ReggieWindow(QtWidgets.QMainWindow):
             QtGui.QKeySequence('Ctrl+Shift+R'),
         )
 
+        self.CreateAction(
+            'stagesearch', self.HandleStageSearch, GetIcon('open'),
+            globals_.trans.stringOneLine('MenuItems', 142), globals_.trans.stringOneLine('MenuItems', 143),
+            QtGui.QKeySequence('Ctrl+Shift+F'),
+        )
+
         self.CreateAction(
             'reloaddata', self.ReloadSpritedata, GetIcon('reload-spritedata'),
             globals_.trans.stringOneLine('MenuItems', 138), globals_.trans.stringOneLine('MenuItems', 139),
@@ -693,6 +736,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         fmenu.addAction(self.actions['openfromname'])
         fmenu.addAction(self.actions['openfromfile'])
         fmenu.addAction(self.actions['openrecent'])
+        fmenu.addAction(self.actions['stagesearch'])
         fmenu.addSeparator()
         fmenu.addAction(self.actions['save'])
         fmenu.addAction(self.actions['saveas'])
@@ -747,6 +791,9 @@ class ReggieWindow(QtWidgets.QMainWindow):
         vmenu.addSeparator()
         vmenu.addAction(self.actions['grid'])
         vmenu.addSeparator()
+        vmenu.addAction(self.actions['paintprofiler'])
+        vmenu.addAction(self.actions['recordpaintprofile'])
+        vmenu.addSeparator()
         vmenu.addAction(self.actions['zoommax'])
         vmenu.addAction(self.actions['zoomin'])
         vmenu.addAction(self.actions['zoomactual'])
@@ -1342,15 +1389,57 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
     def Autosave(self):
         """
-        Auto saves the level
+        Auto saves the level. Only the snapshot of the level is taken here, it
+        is packed, compressed and written to the autosave file by a worker.
         """
         if not globals_.AutoSaveDirty: return
 
-        data = globals_.Level.save()
-        setSetting('AutoSaveFilePath', self.fileSavePath)
-        setSetting('AutoSaveFileData', QtCore.QByteArray(data))
+        # The level is still being loaded
+        if self.LevelLoader is not None: return
+
+        # The previous autosave is still being written
+        if self.AutosaveWorker is not None: return
+
+        # The changes are already safe in the edit journal
+        if not globals_.Journal.NeedsSnapshot(): return
+
+        snapshot = globals_.Level.snapshot()
         globals_.AutoSaveDirty = False
 
+        # Changes made from now on go to the journal of this snapshot
+        serial = globals_.Journal.Start(globals_.Area.areanum)
+
+        generation = autosave.generation
+        path = self.fileSavePath
+
+        self.AutosaveWorker = RunInBackground(
+            autosave.WriteAutosaveSnapshot, snapshot, serial,
+            finished=lambda file: self.AutosaveFinished(generation, path, file, serial),
+            failed=self.AutosaveFailed,
+        )
+
+    def AutosaveFinished(self, generation, path, file, serial):
+        """
+        Stores the location of the autosave once it has been written
+        """
+        self.AutosaveWorker = None
+
+        # The level was saved or closed while the autosave was being written
+        if generation != autosave.generation: return
+
+        setSetting('AutoSaveFilePath', path)
+        setSetting('AutoSaveFile', file)
+
+        # The older journals are part of this snapshot now
+        autosave.RemoveJournals(serial)
+
+    def AutosaveFailed(self, error):
+        """
+        Writing the autosave failed, so try again next time
+        """
+        self.AutosaveWorker = None
+        globals_.AutoSaveDirty = True
+
     def TrackClipboardUpdates(self):
         """
         Catches systemwide clipboard updates
@@ -1399,6 +1488,10 @@ class ReggieWindow(QtWidgets.QMainWindow):
         Checks if the level is unsaved and attempts to save it if so.
         Returns whether the level still contains unsaved changes.
         """
+        # Let a save that is still in progress finish first
+        if self.SaveWorker is not None:
+            self.SaveWorker.wait()
+
         if not globals_.Dirty:
             return False
 
@@ -1413,7 +1506,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         if ret == QtWidgets.QMessageBox.Save:
             # If the save failed, the file is still dirty, so we need to negate
             # the return value.
-            return not self.HandleSave()
+            return not self.HandleSave(wait=True)
 
         elif ret == QtWidgets.QMessageBox.Cancel:
             return True
@@ -1698,24 +1791,28 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
             for obj in selitems:
                 if ii(obj, type_obj):
+                    JournalDelete(obj)
                     obj.delete()
                     obj.setSelected(False)
                     self.scene.removeItem(obj)
                     clipboard_o.append(obj)
                 elif ii(obj, type_spr):
+                    JournalDelete(obj)
                     obj.delete()
                     obj.setSelected(False)
                     self.scene.removeItem(obj)
                     clipboard_s.append(obj)
 
             if clipboard_o or clipboard_s:
-                SetDirty()
+                with Journaled():
+                    SetDirty()
+
                 self.actions['cut'].setEnabled(False)
                 self.actions['paste'].setEnabled(True)
                 self.clipboard = self.encodeObjects(clipboard_o, clipboard_s)
                 self.systemClipboard.setText(self.clipboard)
 
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
         self.SelectionUpdateFlag = False
         self.ChangeSelectionHandler()
 
@@ -1832,30 +1929,40 @@ class ReggieWindow(QtWidgets.QMainWindow):
             yoffset = int(0 - y1 + (yOverride / 16) - (height / 2))
             ypixeloffset = yoffset * 16
 
-        # Center and select everything
-        for item in sprites:
-            item.setNewObjPos(item.objx + xpixeloffset, item.objy + ypixeloffset)
-            item.UpdateRects()
-            if select: item.setSelected(True)
-
-        for layer in layers:
-            for item in layer:
-                item.setPos((item.objx + xoffset) * 24, (item.objy + yoffset) * 24)
+        # Center and select everything. The items are journaled where they
+        # end up, so these moves aren't.
+        globals_.DirtyOverride += 1
+        try:
+            for item in sprites:
+                item.setNewObjPos(item.objx + xpixeloffset, item.objy + ypixeloffset)
                 item.UpdateRects()
                 if select: item.setSelected(True)
 
-        globals_.OverrideSnapping = False
+            for layer in layers:
+                for item in layer:
+                    item.setPos((item.objx + xoffset) * 24, (item.objy + yoffset) * 24)
+                    item.UpdateRects()
+                    if select: item.setSelected(True)
+        finally:
+            globals_.DirtyOverride -= 1
 
-        self.levelOverview.update()
-        SetDirty()
-        self.SelectionUpdateFlag = False
-        self.ChangeSelectionHandler()
+        globals_.OverrideSnapping = False
 
         # Combine the sprites and layers
         added = sprites
         for layer in layers:
             added += layer
 
+        for item in added:
+            JournalCreate(item)
+
+        self.levelOverview.Invalidate()
+        with Journaled():
+            SetDirty()
+
+        self.SelectionUpdateFlag = False
+        self.ChangeSelectionHandler()
+
         return added
 
     def getEncodedObjects(self, encoded):
@@ -1871,54 +1978,60 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
         clip = encoded[11:-2].split('|')
 
+        # The caller marks the level as dirty once everything has been placed
+        globals_.DirtyOverride += 1
+        self.scene.beginBulkInsert()
         self.spriteList.prepareBatchAdd()
-        for item in clip:
-
-            try:
-                # Check to see whether it's an object or sprite
-                # and add it to the correct stack
-                split = item.split(':')
-                if split[0] == '0':
-                    # object
-                    if len(split) != 8: continue
-
-                    tileset = int(split[1])
-                    type = int(split[2])
-                    layer = int(split[3])
-                    objx = int(split[4])
-                    objy = int(split[5])
-                    width = int(split[6])
-                    height = int(split[7])
-
-                    # basic sanity checks
-                    if tileset < 0 or tileset > 3: continue
-                    if type < 0 or type > 255: continue
-                    if layer < 0 or layer > 2: continue
-                    if objx < 0 or objx > 1023: continue
-                    if objy < 0 or objy > 511: continue
-                    if width < 1 or width > 1023: continue
-                    if height < 1 or height > 511: continue
-
-                    newitem = self.CreateObject(tileset, type, layer, objx, objy, width, height)  # , add_to_scene = False)
-
-                    layers[layer].append(newitem)
-
-                elif split[0] == '1':
-                    # sprite
-                    if len(split) != 11: continue
-
-                    objx = int(split[2])
-                    objy = int(split[3])
-                    data = bytes(map(int, [split[4], split[5], split[6], split[7], split[8], split[9], '0', split[10]]))
-
-                    newitem = self.CreateSprite(objx, objy, int(split[1]), data)
-                    sprites.append(newitem)
-
-            except ValueError:
-                # an int() probably failed somewhere
-                pass
+        try:
+            for item in clip:
 
-        self.spriteList.endBatchAdd()
+                try:
+                    # Check to see whether it's an object or sprite
+                    # and add it to the correct stack
+                    split = item.split(':')
+                    if split[0] == '0':
+                        # object
+                        if len(split) != 8: continue
+
+                        tileset = int(split[1])
+                        type = int(split[2])
+                        layer = int(split[3])
+                        objx = int(split[4])
+                        objy = int(split[5])
+                        width = int(split[6])
+                        height = int(split[7])
+
+                        # basic sanity checks
+                        if tileset < 0 or tileset > 3: continue
+                        if type < 0 or type > 255: continue
+                        if layer < 0 or layer > 2: continue
+                        if objx < 0 or objx > 1023: continue
+                        if objy < 0 or objy > 511: continue
+                        if width < 1 or width > 1023: continue
+                        if height < 1 or height > 511: continue
+
+                        newitem = self.CreateObject(tileset, type, layer, objx, objy, width, height)  # , add_to_scene = False)
+
+                        layers[layer].append(newitem)
+
+                    elif split[0] == '1':
+                        # sprite
+                        if len(split) != 11: continue
+
+                        objx = int(split[2])
+                        objy = int(split[3])
+                        data = bytes(map(int, [split[4], split[5], split[6], split[7], split[8], split[9], '0', split[10]]))
+
+                        newitem = self.CreateSprite(objx, objy, int(split[1]), data)
+                        sprites.append(newitem)
+
+                except ValueError:
+                    # an int() probably failed somewhere
+                    pass
+        finally:
+            self.spriteList.endBatchAdd()
+            self.scene.endBulkInsert()
+            globals_.DirtyOverride -= 1
 
         return layers, sprites
 
@@ -2021,11 +2134,14 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
             new_rect |= obj.ZoneRect
 
+            JournalDelete(obj)
             obj.delete()
             obj.setSelected(False)
             self.scene.removeItem(obj)
-            self.levelOverview.update()
-            SetDirty()
+            self.levelOverview.Invalidate()
+
+            with Journaled():
+                SetDirty()
 
         if not new_rect.isValid():
             return
@@ -2071,7 +2187,10 @@ class ReggieWindow(QtWidgets.QMainWindow):
             loc.UpdateListItem()
 
             # We've changed the level, so set the dirty flag
-            SetDirty()
+            JournalCreate(loc)
+            with Journaled():
+                SetDirty()
+            self.levelOverview.InvalidateRect(self.levelOverview.ItemRect(loc))
 
         return loc
 
@@ -2091,20 +2210,19 @@ class ReggieWindow(QtWidgets.QMainWindow):
             else:
                 width = height = 1
 
-        layer_list = globals_.Area.layers[layer]
-        if not layer_list:
-            z = (2 - layer) * 8192
-        else:
-            z = layer_list[-1].zValue() + 1
+        z = globals_.Area.NextLayerZ(layer)
 
         obj = ObjectItem(tileset, object_num, layer, x, y, width, height, z)
 
         if add_to_scene:
-            layer_list.append(obj)
+            globals_.Area.AppendToLayer(obj)
             obj.positionChanged = self.HandleObjPosChange
             self.scene.addItem(obj)
 
-            SetDirty()
+            JournalCreate(obj)
+            with Journaled():
+                SetDirty()
+            self.levelOverview.InvalidateRect(self.levelOverview.ItemRect(obj))
 
         return obj
 
@@ -2138,7 +2256,10 @@ class ReggieWindow(QtWidgets.QMainWindow):
             self.scene.addItem(ent)
             ent.UpdateListItem()
 
-            SetDirty()
+            JournalCreate(ent)
+            with Journaled():
+                SetDirty()
+            self.levelOverview.InvalidateRect(self.levelOverview.ItemRect(ent))
 
         return ent
 
@@ -2198,10 +2319,41 @@ class ReggieWindow(QtWidgets.QMainWindow):
             self.scene.addItem(spr)
             spr.UpdateListItem()
 
-            SetDirty()
+            JournalCreate(spr)
+            with Journaled():
+                SetDirty()
+
+            self.levelOverview.InvalidateRect(self.levelOverview.ItemRect(spr))
 
         return spr
 
+    def CreateComment(self, x, y, text = '', add_to_scene = True):
+        """
+        Creates and returns a new comment and makes sure it's added to the
+        right lists if 'add_to_scene' is set.
+        """
+        com = CommentItem(x, y, text)
+        com.positionChanged = self.HandleComPosChange
+        com.textChanged = self.HandleComTxtChange
+
+        if add_to_scene:
+            self.scene.addItem(com)
+            com.setVisible(globals_.CommentsShown)
+
+            com.listitem = QtWidgets.QListWidgetItem()
+            self.commentList.addItem(com.listitem)
+
+            globals_.Area.comments.append(com)
+
+            self.SaveComments()
+            com.UpdateListItem()
+
+            JournalCreate(com)
+            with Journaled():
+                SetDirty()
+
+        return com
+
     def CreateZone(self, x, y, width = 408, height = 224, id_ = None, add_to_scene = True):
         """
         Creates and returns a new zone and makes sure it's added to the right
@@ -2223,7 +2375,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
             self.scene.addItem(zone)
 
             self.scene.update()
-            self.levelOverview.update()
+            self.levelOverview.Invalidate()
 
             SetDirty()
 
@@ -2244,7 +2396,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         newID = len(globals_.Level.areas) + 1
         globals_.Level.appendArea(None, None, None, None)
 
-        if not self.HandleSave():
+        if not self.HandleSave(wait=True):
             globals_.Level.deleteArea(newID)
             return
 
@@ -2327,7 +2479,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.Level.appendArea(course, L0, L1, L2)
         new_id = globals_.Level.areas[-1].areanum
 
-        if not self.HandleSave():
+        if not self.HandleSave(wait=True):
             globals_.Level.deleteArea(new_id)
             return
 
@@ -2456,6 +2608,11 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.InsertPathNode = dlg.generalTab.insertPathNode.isChecked()
         setSetting('InsertPathNode', globals_.InsertPathNode)
 
+        # OpenGL setting
+        globals_.UseOpenGL = dlg.generalTab.useOpenGL.isChecked()
+        setSetting('UseOpenGL', globals_.UseOpenGL)
+        self.view.setOpenGL(globals_.UseOpenGL)
+
         # Get the Toolbar tab settings
         boxes = (
             dlg.toolbarTab.FileBoxes, dlg.toolbarTab.EditBoxes, dlg.toolbarTab.ViewBoxes, dlg.toolbarTab.SettingsBoxes,
@@ -2490,7 +2647,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         LoadLevelNames()
         dlg = ChooseLevelNameDialog()
         if dlg.exec_() == QtWidgets.QDialog.Accepted:
-            self.LoadLevel(dlg.currentlevel, False, 1)
+            self.LoadLevel(dlg.currentlevel, False, 1, wait=False)
 
     def HandleOpenFromFile(self):
         """
@@ -2506,65 +2663,40 @@ class ReggieWindow(QtWidgets.QMainWindow):
         filetypes += globals_.trans.string('FileDlgs', 2) + ' (*)'                  # *
         fn = QtWidgets.QFileDialog.getOpenFileName(self, globals_.trans.string('FileDlgs', 0), '', filetypes)[0]
         if fn == '': return
-        self.LoadLevel(str(fn), True, 1)
+        self.LoadLevel(str(fn), True, 1, wait=False)
 
-    def HandleSave(self):
+    def HandleStageSearch(self):
         """
-        Save a level back to the archive. Returns whether saving was successful.
+        Search the levels in the Stage folder and open one of the results
         """
-        if not self.fileSavePath or self.fileSavePath.endswith('.arc.LH'):
-            # Delegate save to HandleSaveAs function
-            return self.HandleSaveAs()
-
-        data = globals_.Level.save()
-
-        # maybe need to compress the data
-        if self.fileSavePath.endswith(".arc.LZ"):
-            compressed = lz77.CompressLZ77(data)
-
-            if compressed is None:
-                # Error during compression
-                QtWidgets.QMessageBox.warning(None,
-                    globals_.trans.string('Err_Save', 0),
-                    globals_.trans.string('Err_Save', 3, '[file-size]', len(data))
-                )
-
-                # Delegate to HandleSaveAs
-                return self.HandleSaveAs()
-
-            data = compressed
-
-        # maybe pad with null bytes
-        if globals_.EnablePadding:
-            pad_length = globals_.PaddingLength - len(data)
-
-            if pad_length < 0:
-                # err: orig data is longer than padding data
-                QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Save', 0), globals_.trans.string('Err_Save', 2, '[orig-len]', len(data), '[pad-len]', globals_.PaddingLength))
-                return False
+        stage = globals_.gamedef.GetStageGamePath()
+        if not stage or not os.path.isdir(stage):
+            QtWidgets.QMessageBox.warning(self, globals_.trans.string('StageSearchDlg', 0), globals_.trans.string('StageSearchDlg', 14))
+            return
 
-            data += bytes(pad_length)
+        dlg = StageSearchDialog(stage)
+        if dlg.exec_() != QtWidgets.QDialog.Accepted:
+            return
 
-        try:
-            with open(self.fileSavePath, 'wb') as f:
-                f.write(data)
-        except IOError as e:
-            QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Save', 0),
-                                          globals_.trans.string('Err_Save', 1, '[err1]', e.args[0], '[err2]', e.args[1]))
-            return False
+        if self.CheckDirty(): return
+        self.LoadLevel(dlg.level, True, dlg.area, wait=False)
 
-        globals_.Dirty = False
-        globals_.AutoSaveDirty = False
-        self.UpdateTitle()
+    def HandleSave(self, wait=False):
+        """
+        Save a level back to the archive. Returns whether saving was successful.
+        Unless wait is set, the level is written in the background and this
+        only returns whether saving was started.
+        """
+        if not self.fileSavePath or self.fileSavePath.endswith('.arc.LH'):
+            # Delegate save to HandleSaveAs function
+            return self.HandleSaveAs(wait=wait)
 
-        setSetting('AutoSaveFilePath', self.fileSavePath)
-        setSetting('AutoSaveFileData', 'x')
-        return True
+        return self.SaveLevel(self.fileSavePath, delegate=True, wait=wait)
 
-    def HandleSaveAs(self, copy = False):
+    def HandleSaveAs(self, copy = False, wait = False):
         """
         Save a level back to the archive, with a new filename. Returns whether
-        saving was successful.
+        saving was successful (or started, see HandleSave).
         """
         fn = QtWidgets.QFileDialog.getSaveFileName(self,
             globals_.trans.string('FileDlgs', 8 if copy else 3),
@@ -2578,52 +2710,117 @@ class ReggieWindow(QtWidgets.QMainWindow):
             return False
 
         if not copy:
-            globals_.AutoSaveDirty = False
-            globals_.Dirty = False
-
             self.fileSavePath = fn
             self.fileTitle = os.path.basename(fn)
 
-        data = globals_.Level.save()
+        return self.SaveLevel(fn, copy, recent=not copy, wait=wait)
 
-        # maybe need to compress the data
-        if fn.endswith(".arc.LZ"):
-            compressed = lz77.CompressLZ77(data)
+    def SaveLevel(self, fn, copy=False, delegate=False, recent=False, wait=False):
+        """
+        Saves the level to a file. The level is snapshotted right away, but it
+        is packed, compressed and written by a worker unless wait is set. If
+        delegate is set, HandleSaveAs is used if the level can't be compressed.
+        """
+        if self.SaveWorker is not None:
+            if not wait:
+                QtWidgets.QMessageBox.information(self, 'Reggie', globals_.trans.string('SaveProgress', 1))
+                return False
 
-            if compressed is None:
-                # Error during compression
-                QtWidgets.QMessageBox.warning(None,
-                    globals_.trans.string('Err_Save', 0),
-                    globals_.trans.string('Err_Save', 3, '[file-size]', len(data))
-                )
+            # Saves must be written in order, so let the older one finish first
+            self.SaveWorker.wait()
 
-                return False
+        snapshot = globals_.Level.snapshot()
+        padding = globals_.PaddingLength if globals_.EnablePadding else None
 
-            data = compressed
+        # Edits made after this point are not part of the saved file
+        level = globals_.Level
+        count = globals_.DirtyCount
 
-        # maybe pad with null bytes
-        if globals_.EnablePadding:
-            pad_length = globals_.PaddingLength - len(data)
+        finished = lambda path: self.SaveFinished(level, count, path, copy, recent)
+        failed = lambda error: self.SaveFailed(error, copy, delegate, wait)
 
-            if pad_length < 0:
-                # err: orig data is longer than padding data
-                QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Save', 0), globals_.trans.string('Err_Save', 2, '[orig-len]', len(data), '[pad-len]', globals_.PaddingLength))
-                return False
+        if wait:
+            try:
+                path = WriteSnapshot(snapshot, fn, fn.endswith('.arc.LZ'), padding)
+            except (LevelSaveError, OSError) as e:
+                return failed(e)
 
-            data += bytes(pad_length)
+            return finished(path)
 
-        with open(fn, 'wb') as f:
-            f.write(data)
+        self.saveProgress.setValue(0)
+        self.saveProgress.setVisible(True)
 
-        if not copy:
-            setSetting('AutoSaveFilePath', fn)
-            setSetting('AutoSaveFileData', 'x')
+        self.SaveWorker = RunInBackground(
+            WriteSnapshot, snapshot, fn, fn.endswith('.arc.LZ'), padding,
+            finished=finished,
+            failed=failed,
+            progress=self.SaveProgress,
+        )
 
-            self.UpdateTitle()
-            self.RecentMenu.AddToList(self.fileSavePath)
+        return True
+
+    def SaveProgress(self, done, total):
+        """
+        Shows the progress of the save that is running in the background
+        """
+        self.saveProgress.setMaximum(total)
+        self.saveProgress.setValue(done)
+
+    def SaveFinished(self, level, count, path, copy, recent):
+        """
+        Called when the level has been written to a file
+        """
+        self.SaveWorker = None
+        self.saveProgress.setVisible(False)
+
+        # The level was closed while it was being saved
+        if copy or level is not globals_.Level:
+            return True
+
+        # Only clear the dirty flag if nothing was changed while saving
+        if globals_.DirtyCount == count:
+            globals_.Dirty = False
+            globals_.AutoSaveDirty = False
+
+            autosave.ClearAutosave(path)
+
+        self.UpdateTitle()
+
+        if recent:
+            self.RecentMenu.AddToList(path)
 
         return True
 
+    def SaveFailed(self, error, copy, delegate, wait):
+        """
+        Called when the level could not be saved. Returns whether the level was
+        saved after all.
+        """
+        self.SaveWorker = None
+        self.saveProgress.setVisible(False)
+
+        # The level on disk is out of date, so keep it marked as unsaved
+        globals_.Dirty = True
+        self.UpdateTitle()
+
+        if isinstance(error, LevelSaveError):
+            QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Save', 0), globals_.trans.string('Err_Save', *error.args))
+
+            if delegate and error.compression:
+                # Delegate to HandleSaveAs
+                return self.HandleSaveAs(wait=wait)
+
+        elif isinstance(error, OSError):
+            QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Save', 0),
+                                          globals_.trans.string('Err_Save', 1, '[err1]', error.errno, '[err2]', error.strerror))
+
+        else:
+            # Raising here would abort the editor, since this is called from
+            # a Qt slot
+            sys.excepthook(type(error), error, error.__traceback__)
+
+        return False
+
     def HandleSaveCopyAs(self):
         """
         Save a level back to the archive, with a new filename, but does not store this filename
@@ -2661,12 +2858,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         globals_.Layer0Shown = checked
 
-        if globals_.Area is None:
-            return
-
-        for obj in globals_.Area.layers[0]:
-            obj.setVisible(checked)
-
+        self.scene.layerGroups[0].setVisible(checked)
         self.scene.update()
 
     def HandleUpdateLayer1(self, checked):
@@ -2675,12 +2867,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         globals_.Layer1Shown = checked
 
-        if globals_.Area is None:
-            return
-
-        for obj in globals_.Area.layers[1]:
-            obj.setVisible(checked)
-
+        self.scene.layerGroups[1].setVisible(checked)
         self.scene.update()
 
     def HandleUpdateLayer2(self, checked):
@@ -2689,12 +2876,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         globals_.Layer2Shown = checked
 
-        if globals_.Area is None:
-            return
-
-        for obj in globals_.Area.layers[2]:
-            obj.setVisible(checked)
-
+        self.scene.layerGroups[2].setVisible(checked)
         self.scene.update()
 
     def HandleTilesetAnimToggle(self, checked):
@@ -2734,11 +2916,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.SpritesShown = checked
         setSetting('ShowSprites', globals_.SpritesShown)
 
-        if globals_.Area is None:
-            return
-
-        for spr in globals_.Area.sprites:
-            spr.setVisible(checked)
+        self.scene.spriteGroup.setVisible(checked)
 
     def HandleSpriteImages(self, checked):
         """
@@ -2777,7 +2955,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
         globals_.DirtyOverride -= 1
 
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
 
     def HandleLocationsVisibility(self, checked):
         """
@@ -2786,11 +2964,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.LocationsShown = checked
         setSetting('ShowLocations', globals_.LocationsShown)
 
-        if globals_.Area is None:
-            return
-
-        for loc in globals_.Area.locations:
-            loc.setVisible(checked)
+        self.scene.locationGroup.setVisible(checked)
 
     def HandleCommentsVisibility(self, checked):
         """
@@ -2799,11 +2973,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.CommentsShown = checked
         setSetting('ShowComments', globals_.CommentsShown)
 
-        if globals_.Area is None:
-            return
-
-        for com in globals_.Area.comments:
-            com.setVisible(checked)
+        self.scene.commentGroup.setVisible(checked)
 
     def HandlePathsVisibility(self, checked):
         """
@@ -2812,11 +2982,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.PathsShown = checked
         setSetting('ShowPaths', globals_.PathsShown)
 
-        if globals_.Area is None:
-            return
-
-        for path in globals_.Area.paths:
-            path.setVisible(checked)
+        self.scene.pathGroup.setVisible(checked)
 
     def HandleObjectsFreeze(self, checked):
         """
@@ -2825,17 +2991,8 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.ObjectsFrozen = checked
         setSetting('FreezeObjects', globals_.ObjectsFrozen)
 
-        if globals_.Area is None:
-            return
-
-        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
-        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
-        unfrozen = not checked
-
-        for layer in globals_.Area.layers:
-            for obj in layer:
-                obj.setFlag(flag1, unfrozen)
-                obj.setFlag(flag2, unfrozen)
+        for group in self.scene.layerGroups:
+            group.setFrozen(checked)
 
     def HandleSpritesFreeze(self, checked):
         """
@@ -2844,16 +3001,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.SpritesFrozen = checked
         setSetting('FreezeSprites', globals_.SpritesFrozen)
 
-        if globals_.Area is None:
-            return
-
-        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
-        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
-        unfrozen = not checked
-
-        for spr in globals_.Area.sprites:
-            spr.setFlag(flag1, unfrozen)
-            spr.setFlag(flag2, unfrozen)
+        self.scene.spriteGroup.setFrozen(checked)
 
     def HandleEntrancesFreeze(self, checked):
         """
@@ -2862,16 +3010,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.EntrancesFrozen = checked
         setSetting('FreezeEntrances', globals_.EntrancesFrozen)
 
-        if globals_.Area is None:
-            return
-
-        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
-        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
-        unfrozen = not checked
-
-        for ent in globals_.Area.entrances:
-            ent.setFlag(flag1, unfrozen)
-            ent.setFlag(flag2, unfrozen)
+        self.scene.entranceGroup.setFrozen(checked)
 
     def HandleLocationsFreeze(self, checked):
         """
@@ -2880,16 +3019,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.LocationsFrozen = checked
         setSetting('FreezeLocations', globals_.LocationsFrozen)
 
-        if globals_.Area is None:
-            return
-
-        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
-        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
-        unfrozen = not checked
-
-        for loc in globals_.Area.locations:
-            loc.setFlag(flag1, unfrozen)
-            loc.setFlag(flag2, unfrozen)
+        self.scene.locationGroup.setFrozen(checked)
 
     def HandlePathsFreeze(self, checked):
         """
@@ -2898,11 +3028,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.PathsFrozen = checked
         setSetting('FreezePaths', globals_.PathsFrozen)
 
-        if globals_.Area is None:
-            return
-
-        for path in globals_.Area.paths:
-            path.set_freeze(checked)
+        self.scene.pathGroup.setFrozen(checked)
 
     def HandleCommentsFreeze(self, checked):
         """
@@ -2911,16 +3037,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         globals_.CommentsFrozen = checked
         setSetting('FreezeComments', globals_.CommentsFrozen)
 
-        if globals_.Area is None:
-            return
-
-        flag1 = QtWidgets.QGraphicsItem.ItemIsSelectable
-        flag2 = QtWidgets.QGraphicsItem.ItemIsMovable
-        unfrozen = not checked
-
-        for com in globals_.Area.comments:
-            com.setFlag(flag1, unfrozen)
-            com.setFlag(flag2, unfrozen)
+        self.scene.commentGroup.setFrozen(checked)
 
     def HandleSwitchGrid(self):
         """
@@ -2936,6 +3053,58 @@ class ReggieWindow(QtWidgets.QMainWindow):
         setSetting('GridType', globals_.GridType)
         self.scene.update()
 
+    def HandlePaintProfilerToggle(self, checked):
+        """
+        Handle toggling of the paint profiler overlay
+        """
+        globals_.PaintProfilerShown = checked
+        self.UpdatePaintProfiler()
+
+    def HandleRecordPaintProfile(self, checked):
+        """
+        Handle starting or stopping a paint profile recording
+        """
+        if not checked:
+            if globals_.PaintProfiler is not None:
+                globals_.PaintProfiler.StopRecording()
+
+            self.UpdatePaintProfiler()
+            return
+
+        fn = QtWidgets.QFileDialog.getSaveFileName(self,
+            globals_.trans.string('FileDlgs', 11),
+            '',
+            globals_.trans.string('FileDlgs', 12) + ' (*.csv);;' +
+            globals_.trans.string('FileDlgs', 2) + ' (*)'
+        )[0]
+
+        if fn == '':
+            self.actions['recordpaintprofile'].setChecked(False)
+            return
+
+        if globals_.PaintProfiler is None:
+            globals_.PaintProfiler = PaintProfiler()
+
+        globals_.PaintProfiler.StartRecording(fn)
+        self.UpdatePaintProfiler()
+
+    def UpdatePaintProfiler(self):
+        """
+        Creates the paint profiler if the overlay is shown or a recording is
+        running, and drops it otherwise, so the level view isn't measured
+        without need
+        """
+        profiler = globals_.PaintProfiler
+        recording = profiler is not None and profiler.writer is not None
+
+        if not (globals_.PaintProfilerShown or recording):
+            globals_.PaintProfiler = None
+        elif profiler is None:
+            globals_.PaintProfiler = PaintProfiler()
+
+        self.view.updateViewportMode()
+        self.scene.update()
+
     def HandleZoomIn(self, *, towardsCursor=False):
         """
         Handle zooming in
@@ -3059,17 +3228,27 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
         globals_.gamedef.SetLastLevel(str(self.fileSavePath))
 
-        setSetting('AutoSaveFilePath', None)
-        setSetting('AutoSaveFileData', 'x')
+        autosave.ClearAutosave()
+
+        if globals_.PaintProfiler is not None:
+            globals_.PaintProfiler.StopRecording()
 
         event.accept()
 
-    def LoadLevel(self, name, isFullPath, areaNum):
+    def LoadLevel(self, name, isFullPath, areaNum, wait=True, failed=None):
         """
-        Load a level from NSMBW into the editor.
+        Load a level from NSMBW into the editor. Unless wait is set, a level
+        file is loaded in the background (see LevelLoader), and this only
+        returns whether loading was started. In that case, failed is called
+        if the file turns out to be unreadable.
         """
+        # Stop loading the previous level
+        if self.LevelLoader is not None:
+            self.LevelLoader.Cancel()
+
         new = name is None
         same = False
+        parsed = None
 
         if not new:
             checknames = []
@@ -3105,32 +3284,23 @@ class ReggieWindow(QtWidgets.QMainWindow):
         elif not same:
 
             # Get the data
-            if not globals_.RestoredFromAutoSave:
+            if not wait and not globals_.RestoredFromAutoSave:
+                self.LevelLoader = LevelLoader(self, name, areaNum, failed)
+                self.LevelLoader.Start()
+                return True
+
+            elif not globals_.RestoredFromAutoSave:
+                # Read, decompress and parse the file, like LevelLoader does
+                try:
+                    areaData, parsed = ReadLevelFile(name, areaNum)
+                except LevelLoadError as e:
+                    ShowLevelLoadError(self, e)
+                    return False
 
                 # Set the filepath variables
                 self.fileSavePath = name
                 self.fileTitle = os.path.basename(self.fileSavePath)
 
-                # Open the file
-                with open(self.fileSavePath, 'rb') as fileobj:
-                    levelData = fileobj.read()
-
-                # Decompress, if needed
-                if (levelData[0] & 0xF0) == 0x40:  # If LH-compressed
-                    try:
-                        levelData = lh.UncompressLH(levelData)
-                    except IndexError:
-                        QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Decompress', 0),
-                                                      globals_.trans.string('Err_Decompress', 1, '[file]', name))
-                        return False
-                elif not levelData.startswith(b"U\xAA8-"):  # If LZ-compressed
-                    try:
-                        levelData = lz77.UncompressLZ77(levelData)
-                    except IndexError:
-                        QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Decompress', 0),
-                                                      globals_.trans.string('Err_Decompress', 2, '[file]', name))
-                        return False
-
             else:
                 # Auto-saved level. Check if there's a path associated with it:
 
@@ -3148,6 +3318,40 @@ class ReggieWindow(QtWidgets.QMainWindow):
                 # Turn off the autosave flag
                 globals_.RestoredFromAutoSave = False
 
+        self.BeginLevelLoad()
+
+        # Load the actual level
+        if new:
+            self.newLevel()
+        elif same:
+            # We have already loaded this area's data - it's stored as
+            # AbstractAreas in the Level. This means we do not have to open and
+            # optionally decompress the level file. Hence, we can just relay
+            # this to the level.
+            globals_.Level.changeArea(areaNum)
+            self.ResetPalette()
+        elif parsed is not None:
+            for _ in self.LoadLevelSteps(areaData, areaNum, parsed):
+                pass
+        else:
+            # An auto-saved level
+            self.LoadLevel_NSMBW(levelData, areaNum)
+
+        for _ in self.RefreshLevelSteps():
+            pass
+
+        self.FinishLevelLoad(new, same, areaNum)
+
+        # If we got this far, everything worked! Return True.
+        return True
+
+    def BeginLevelLoad(self):
+        """
+        Clears out the current level, before a new level or area is loaded
+        """
+        # The edit journal belongs to the previous level (or area)
+        globals_.Journal.Stop()
+
         # Turn the dirty flag off, and keep it that way
         globals_.Dirty = False
         globals_.DirtyOverride += 1
@@ -3178,39 +3382,36 @@ class ReggieWindow(QtWidgets.QMainWindow):
         # Prevent things from snapping when they're created
         globals_.OverrideSnapping = True
 
-        # Load the actual level
-        if new:
-            self.newLevel()
-        elif not same:
-            self.LoadLevel_NSMBW(levelData, areaNum)
-        else:
-            # We have already loaded this area's data - it's stored as
-            # AbstractAreas in the Level. This means we do not have to open and
-            # optionally decompress the level file. Hence, we can just relay
-            # this to the level.
-            globals_.Level.changeArea(areaNum)
-            self.ResetPalette()
+    def RefreshLevelSteps(self):
+        """
+        Refreshes the object layouts and sprite sizes of the loaded area. This
+        is a generator that yields how many items were refreshed every now and
+        then.
+        """
+        # Refresh object layouts
+        for layer in globals_.Area.layers:
+            for start in range(0, len(layer), LOAD_BATCH_SIZE):
+                batch = layer[start:start + LOAD_BATCH_SIZE]
 
-        # Fill up the area list
-        self.areaComboBox.clear()
+                for obj in batch:
+                    obj.updateObjCache()
 
-        for area in globals_.Level.areas:
-            self.areaComboBox.addItem(globals_.trans.string('AreaCombobox', 0, '[num]', area.areanum))
+                yield len(batch)
 
-        self.areaComboBox.setCurrentIndex(areaNum - 1)
+        for start in range(0, len(globals_.Area.sprites), LOAD_BATCH_SIZE):
+            batch = globals_.Area.sprites[start:start + LOAD_BATCH_SIZE]
 
-        # Refresh object layouts
-        for layer in globals_.Area.layers:
-            for obj in layer:
-                obj.updateObjCache()
+            for sprite in batch:
+                sprite.UpdateDynamicSizing()
+                sprite.ImageObj.positionChanged()
 
-        for sprite in globals_.Area.sprites:
-            sprite.UpdateDynamicSizing()
-            sprite.ImageObj.positionChanged()
+            yield len(batch)
 
-        # Scroll to the initial entrance
+    def CenterOnStartEntrance(self):
+        """
+        Scrolls to the initial entrance
+        """
         startEntID = globals_.Area.startEntrance
-        startEnt = None
         for ent in globals_.Area.entrances:
             if ent.entid == startEntID:
                 self.view.centerOn(ent)
@@ -3218,6 +3419,21 @@ class ReggieWindow(QtWidgets.QMainWindow):
         else:
             self.view.centerOn(0, 0)
 
+    def FinishLevelLoad(self, new, same, areaNum):
+        """
+        Updates the editor after a new level or area has been loaded
+        """
+        # Fill up the area list
+        self.areaComboBox.clear()
+
+        for area in globals_.Level.areas:
+            self.areaComboBox.addItem(globals_.trans.string('AreaCombobox', 0, '[num]', area.areanum))
+
+        self.areaComboBox.setCurrentIndex(areaNum - 1)
+
+        # Scroll to the initial entrance
+        self.CenterOnStartEntrance()
+
         self.ZoomTo(100.0)
 
         # Reset some editor things
@@ -3244,7 +3460,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         self.scene.update()
 
         self.levelOverview.Reset()
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
 
         if new:
             SetDirty()
@@ -3253,8 +3469,17 @@ class ReggieWindow(QtWidgets.QMainWindow):
             # Add the path to Recent Files
             self.RecentMenu.AddToList(self.fileSavePath)
 
-        # If we got this far, everything worked! Return True.
-        return True
+    def AbortLevelLoad(self):
+        """
+        Cleans up after loading a level was cancelled while its items were
+        being created, by replacing the partially loaded level with a new one
+        """
+        self.spriteList.endBatchAdd()
+
+        globals_.OverrideSnapping = False
+        globals_.DirtyOverride -= 1
+
+        self.LoadLevel(None, False, 1)
 
     def newLevel(self):
         # Create the new level object
@@ -3279,20 +3504,81 @@ class ReggieWindow(QtWidgets.QMainWindow):
         Performs all level-loading tasks specific to New Super Mario Bros. Wii levels.
         Do not call this directly - use LoadLevel instead!
         """
+        areaData = SplitLevelArchive(levelData)
+
+        if areaData is None:
+            raise Exception
+
+        for _ in self.LoadLevelSteps(areaData, areaNum):
+            pass
+
+    def LoadLevelSteps(self, areaData, areaNum, parsed=None, tilesets=None):
+        """
+        Creates a new level from the files returned by SplitLevelArchive and
+        adds the items of the area to the scene. This is a generator that
+        yields how many items were added every now and then, so the scene can
+        be drawn while the area is being loaded. parsed and tilesets can be
+        given if the area and its tilesets have been read in the background.
+        """
         # Create the new level object
         globals_.Level = Level_NSMBW()
 
         # Load it
-        if not globals_.Level.load(levelData, areaNum):
-            raise Exception
+        steps = globals_.Level.LoadIter(areaData, areaNum, parsed, tilesets)
+
+        # The tilesets and the events are loaded before the first items are
+        # created
+        kind, items = next(steps)
+        self.PreparePalette()
 
-        self.ResetPalette()
+        self.spriteList.prepareBatchAdd()
+
+        while True:
+            self.AddLevelItems(kind, items)
+
+            if kind == 'entrances':
+                # Show the first screen while the rest is being loaded
+                self.ZoomTo(100.0)
+                self.CenterOnStartEntrance()
+
+            yield len(items)
+
+            try:
+                kind, items = next(steps)
+            except StopIteration:
+                break
+
+        self.spriteList.endBatchAdd()
 
     def ResetPalette(self):
         """
         Resets the palette and initialises the scene from the currently loaded
         Area.
         """
+        self.PreparePalette()
+
+        # Add all things to the scene
+        self.scene.beginBulkInsert()
+        try:
+            for layer in reversed(globals_.Area.layers):
+                self.AddLevelItems('objects', layer)
+
+            self.spriteList.prepareBatchAdd()
+            self.AddLevelItems('sprites', globals_.Area.sprites)
+            self.spriteList.endBatchAdd()
+
+            self.AddLevelItems('entrances', globals_.Area.entrances)
+            self.AddLevelItems('zones', globals_.Area.zones)
+            self.AddLevelItems('locations', globals_.Area.locations)
+            self.AddLevelItems('paths', globals_.Area.paths)
+            self.AddLevelItems('comments', globals_.Area.comments)
+        finally:
+            self.scene.endBulkInsert()
+
+    def PreparePalette(self):
+        """
+        Resets the palette for the currently loaded Area
+        """
         # Prepare the object picker
         self.objUseLayer1.setChecked(True)
 
@@ -3307,56 +3593,66 @@ class ReggieWindow(QtWidgets.QMainWindow):
         # Load events
         self.LoadEventTabFromLevel()
 
-        # Add all things to the scene
-        pcEvent = self.HandleObjPosChange
-        for layer in reversed(globals_.Area.layers):
-            for obj in layer:
-                obj.positionChanged = pcEvent
-                self.scene.addItem(obj)
-
-        pcEvent = self.HandleSprPosChange
-
-        self.spriteList.prepareBatchAdd()
-        for spr in globals_.Area.sprites:
-            spr.positionChanged = pcEvent
-            self.spriteList.addSprite(spr)
-            self.scene.addItem(spr)
-            spr.UpdateListItem()
-
-        self.spriteList.endBatchAdd()
-
-        pcEvent = self.HandleEntPosChange
-        for ent in globals_.Area.entrances:
-            ent.positionChanged = pcEvent
-            ent.listitem = ListWidgetItem_SortsByOther(ent)
-            ent.listitem.entid = ent.entid
-            self.entranceList.addItem(ent.listitem)
-            self.scene.addItem(ent)
-            ent.UpdateListItem()
-
-        for zone in globals_.Area.zones:
-            self.scene.addItem(zone)
-
-        pcEvent = self.HandleLocPosChange
-        scEvent = self.HandleLocSizeChange
-        for location in globals_.Area.locations:
-            location.positionChanged = pcEvent
-            location.sizeChanged = scEvent
-            location.listitem = ListWidgetItem_SortsByOther(location)
-            self.locationList.addItem(location.listitem)
-            self.scene.addItem(location)
-            location.UpdateListItem()
-
-        for path in globals_.Area.paths:
-            path.add_to_scene()
-
-        for com in globals_.Area.comments:
-            com.positionChanged = self.HandleComPosChange
-            com.textChanged = self.HandleComTxtChange
-            com.listitem = QtWidgets.QListWidgetItem()
-            self.commentList.addItem(com.listitem)
-            self.scene.addItem(com)
-            com.UpdateListItem()
+    def AddLevelItems(self, kind, items):
+        """
+        Adds level items of the currently loaded Area to the scene and to the
+        side lists. kind is one of the kinds yielded by Area.LoadIter.
+        """
+        self.scene.beginBulkInsert()
+        try:
+            if kind == 'objects':
+                pcEvent = self.HandleObjPosChange
+                for obj in items:
+                    obj.positionChanged = pcEvent
+                    self.scene.addItem(obj)
+
+            elif kind == 'sprites':
+                pcEvent = self.HandleSprPosChange
+                for spr in items:
+                    spr.positionChanged = pcEvent
+                    self.spriteList.addSprite(spr)
+                    self.scene.addItem(spr)
+                    spr.UpdateListItem()
+
+            elif kind == 'entrances':
+                pcEvent = self.HandleEntPosChange
+                for ent in items:
+                    ent.positionChanged = pcEvent
+                    ent.listitem = ListWidgetItem_SortsByOther(ent)
+                    ent.listitem.entid = ent.entid
+                    self.entranceList.addItem(ent.listitem)
+                    self.scene.addItem(ent)
+                    ent.UpdateListItem()
+
+            elif kind == 'zones':
+                for zone in items:
+                    self.scene.addItem(zone)
+
+            elif kind == 'locations':
+                pcEvent = self.HandleLocPosChange
+                scEvent = self.HandleLocSizeChange
+                for location in items:
+                    location.positionChanged = pcEvent
+                    location.sizeChanged = scEvent
+                    location.listitem = ListWidgetItem_SortsByOther(location)
+                    self.locationList.addItem(location.listitem)
+                    self.scene.addItem(location)
+                    location.UpdateListItem()
+
+            elif kind == 'paths':
+                for path in items:
+                    path.add_to_scene()
+
+            elif kind == 'comments':
+                for com in items:
+                    com.positionChanged = self.HandleComPosChange
+                    com.textChanged = self.HandleComTxtChange
+                    com.listitem = QtWidgets.QListWidgetItem()
+                    self.commentList.addItem(com.listitem)
+                    self.scene.addItem(com)
+                    com.UpdateListItem()
+        finally:
+            self.scene.endBulkInsert()
 
     def ReloadTilesets(self, soft=False):
         """
@@ -3586,7 +3882,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
         if obj == self.selObj:
             if oldx == x and oldy == y: return
             SetDirty()
-        self.levelOverview.update()
+        self.levelOverview.InvalidateMove(obj.LevelRect, oldx - x, oldy - y)
 
     def CreationTabChanged(self, nt):
         """
@@ -3673,34 +3969,21 @@ class ReggieWindow(QtWidgets.QMainWindow):
             return
 
         change.sort(key=lambda x: x.zValue())
-        newLayer = area.layers[new_layer_id]
 
-        if not newLayer:
-            z_value = (2 - new_layer_id) * 8192
-        else:
-            z_value = newLayer[-1].zValue() + 1
-
-        if new_layer_id == 0:
-            newVisibility = globals_.Layer0Shown
-        elif new_layer_id == 1:
-            newVisibility = globals_.Layer1Shown
-        else:
-            newVisibility = globals_.Layer2Shown
-
-        for item in change:
-            area.RemoveFromLayer(item)
-            item.layer = new_layer_id
-            newLayer.append(item)
+        group = self.scene.layerGroups[new_layer_id]
 
-            item.setZValue(z_value)
-            item.setVisible(newVisibility)
-            item.update()
-            item.UpdateTooltip()
+        with JournalEdit(*change):
+            for item in change:
+                area.RemoveFromLayer(item)
+                item.layer = new_layer_id
+                area.AppendToLayer(item)
 
-            z_value += 1
+                item.setParentItem(group)
+                item.update()
+                item.UpdateTooltip()
 
-        self.scene.update()
-        SetDirty()
+            self.scene.update()
+            SetDirty()
 
     def ObjectChoiceChanged(self, type_):
         """
@@ -3715,16 +3998,15 @@ class ReggieWindow(QtWidgets.QMainWindow):
         items = self.scene.selectedItems()
         type_obj = ObjectItem
         tileset = globals_.CurrentPaintType
-        changed = False
+        change = [x for x in items if isinstance(x, type_obj) and (x.tileset != tileset or x.type != type)]
 
-        for x in items:
-            if isinstance(x, type_obj) and (x.tileset != tileset or x.type != type):
+        with JournalEdit(*change):
+            for x in change:
                 x.SetType(tileset, type)
                 x.update()
-                changed = True
 
-        if changed:
-            SetDirty()
+            if change:
+                SetDirty()
 
     def SpriteChoiceChanged(self, type):
         """
@@ -3746,17 +4028,16 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         items = self.scene.selectedItems()
         type_spr = SpriteItem
-        changed = False
+        change = [x for x in items if isinstance(x, type_spr)]
 
-        for x in items:
-            if isinstance(x, type_spr):
+        with JournalEdit(*change):
+            for x in change:
                 x.spritedata = self.defaultDataEditor.data  # change this first or else images get messed up
                 x.SetType(type)
                 x.update()
-                changed = True
 
-        if changed:
-            SetDirty()
+            if change:
+                SetDirty()
 
         self.ChangeSelectionHandler()
 
@@ -3788,14 +4069,16 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         Handle the sprite being dragged
         """
+        if oldx == x and oldy == y: return
+
         if obj == self.selObj:
-            if oldx == x and oldy == y: return
             obj.UpdateListItem()
             SetDirty()
 
-            # The sprite has changed position, so its LevelRect changed, so the
-            # level overview needs to be redrawn.
-            self.levelOverview.update()
+        # The sprite has changed position, so its LevelRect changed, so the
+        # level overview needs to be redrawn where it was and where it is.
+        # This also goes for sprites that are dragged along with others.
+        self.levelOverview.InvalidateMove(obj.LevelRect, (oldx - x) / 16, (oldy - y) / 16)
 
     def SpriteDataUpdated(self, data):
         """
@@ -3803,9 +4086,11 @@ class ReggieWindow(QtWidgets.QMainWindow):
         """
         if self.spriteEditorDock.isVisible():
             obj = self.selObj
-            obj.spritedata = data
-            obj.UpdateListItem()
-            SetDirty()
+
+            with JournalEdit(obj):
+                obj.spritedata = data
+                obj.UpdateListItem()
+                SetDirty()
 
             obj.UpdateDynamicSizing()
             self.spriteList.updateSprite(obj)
@@ -3931,7 +4216,9 @@ class ReggieWindow(QtWidgets.QMainWindow):
             SetDirty()
 
         loc.UpdateListItem()
-        self.levelOverview.update()
+
+        # The location hasn't been moved yet
+        self.levelOverview.InvalidateMove(self.levelOverview.ItemRect(loc), (x - oldx) / 16, (y - oldy) / 16)
 
     def HandleLocSizeChange(self, loc, width, height):
         """
@@ -3942,7 +4229,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
             SetDirty()
 
         loc.UpdateListItem()
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
 
     def UpdateModeInfo(self):
         """
@@ -4017,19 +4304,23 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
                 self.SelectionUpdateFlag = True
 
+                # Items the journal can't describe break it here
                 for obj in sel:
+                    JournalDelete(obj)
                     obj.delete()
                     obj.setSelected(False)
                     self.scene.removeItem(obj)
 
-                SetDirty()
+                with Journaled():
+                    SetDirty()
+
                 event.accept()
-                self.levelOverview.update()
+                self.levelOverview.Invalidate()
                 self.SelectionUpdateFlag = False
                 self.ChangeSelectionHandler()
                 return
 
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
 
         QtWidgets.QMainWindow.keyPressEvent(self, event)
 
@@ -4103,7 +4394,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
 
         dlg = ZonesDialog()
         if dlg.exec_() != QtWidgets.QDialog.Accepted:
-            self.levelOverview.update()
+            self.levelOverview.Invalidate()
             return
 
         SetDirty()
@@ -4171,7 +4462,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
             spr.ImageObj.positionChanged()
 
         self.actions['backgrounds'].setEnabled(len(globals_.Area.zones) > 0)
-        self.levelOverview.update()
+        self.levelOverview.Invalidate()
 
     # Handles setting the backgrounds
     def HandleBG(self):
@@ -4217,6 +4508,7 @@ class ReggieWindow(QtWidgets.QMainWindow):
             return
 
         screenshot_type = dlg.zoneCombo.currentIndex()
+        scale = SCREENSHOT_SCALES[dlg.scaleCombo.currentIndex()]
         hide_background = dlg.hide_background.isChecked()
         do_save = dlg.save_img.isChecked()
 
@@ -4231,7 +4523,6 @@ class ReggieWindow(QtWidgets.QMainWindow):
         if screenshot_type == 0:  # Current view
             screenshot_rect = QtCore.QRect(QtCore.QPoint(), self.view.size())
             renderer = self.view
-            ss_img = QtGui.QImage(screenshot_rect.size(), QtGui.QImage.Format_ARGB32)
 
         else:
             if screenshot_type == 1:  # All zones together
@@ -4251,10 +4542,8 @@ class ReggieWindow(QtWidgets.QMainWindow):
             screenshot_rect &= QtCore.QRectF(0, 0, 1024 * 24, 512 * 24)
 
             renderer = self.scene
-            ss_img = QtGui.QImage(screenshot_rect.size().toSize(), QtGui.QImage.Format_ARGB32)
 
-        ss_img.fill(Qt.transparent)
-        ss_painter = QtGui.QPainter(ss_img)
+        ss_size = ScaledSize(screenshot_rect, scale)
 
         if hide_background:
             # Remove the background
@@ -4263,23 +4552,54 @@ class ReggieWindow(QtWidgets.QMainWindow):
             brush.setStyle(Qt.NoBrush)
             self.scene.setBackgroundBrush(brush)
 
-            # Render
-            renderer.render(ss_painter, source=screenshot_rect)
+        if do_save and renderer is self.scene:
+            # Level screenshots can be huge, so they're rendered in strips
+            # and encoded on a worker thread while the next strips render
+            self.SaveScreenshotInStrips(screenshot_rect, ss_size, scale, fn)
+
+        else:
+            ss_img = QtGui.QImage(ss_size, QtGui.QImage.Format_ARGB32)
+            ss_img.fill(Qt.transparent)
+
+            ss_painter = QtGui.QPainter(ss_img)
+            renderer.render(ss_painter, QtCore.QRectF(ss_img.rect()), screenshot_rect)
+            ss_painter.end()
+
+            if do_save:
+                ss_img.save(fn, 'PNG', 50)
+            else:
+                globals_.app.clipboard().setImage(ss_img)
 
+        if hide_background:
             # Restore the background
             brush.setStyle(style)
             self.scene.setBackgroundBrush(brush)
 
-        else:
-            # Render with background
-            renderer.render(ss_painter, source=screenshot_rect)
+    def SaveScreenshotInStrips(self, source, size, scale, fn):
+        """
+        Renders a rect of the scene in strips and saves it to a PNG file. The
+        file is written on a worker thread.
+        """
+        progress = QtWidgets.QProgressDialog(globals_.trans.string('ScrShtDlg', 9), None, 0, size.height(), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
 
-        ss_painter.end()
+        def finished(path):
+            self.ScreenshotWorker = None
 
-        if do_save:
-            ss_img.save(fn, 'PNG', 50)
-        else:
-            globals_.app.clipboard().setImage(ss_img)
+        def failed(error):
+            self.ScreenshotWorker = None
+            QtWidgets.QMessageBox.warning(self,
+                globals_.trans.string('ScrShtDlg', 10),
+                globals_.trans.string('ScrShtDlg', 11, '[error]', str(error)))
+
+        strips = StripQueue()
+        self.ScreenshotWorker = RunInBackground(WriteStrips, fn, size.width(), size.height(), strips, finished=finished, failed=failed)
+
+        try:
+            RenderStrips(self.scene, source, size, scale, strips, lambda done, total: progress.setValue(done))
+        finally:
+            progress.reset()
 
     @staticmethod
     def HandleDiagnostics():
@@ -4316,6 +4636,9 @@ def main():
     # Create an application
     globals_.app = QtWidgets.QApplication(sys.argv)
 
+    # Show how well the tile chunk cache works, for debugging
+    globals_.TileCacheStatsShown = '-tilecachestats' in sys.argv
+
     # Go to the script path
     path = module_path()
     if path is not None:
@@ -4408,6 +4731,7 @@ def main():
     globals_.PaddingLength = int(setting('PaddingLength', 0))
     globals_.PlaceObjectsAtFullSize = setting('PlaceObjectsAtFullSize', True)
     globals_.InsertPathNode = setting('InsertPathNode', False)
+    globals_.UseOpenGL = setting('UseOpenGL', False)
     SLib.RealViewEnabled = globals_.RealViewEnabled
 
     # Choose a folder for the game
@@ -4444,16 +4768,34 @@ def main():
 
     # Check to see if we have anything saved
     autofile = setting('AutoSaveFilePath')
-    autofiledata = setting('AutoSaveFileData', 'x')
-    if autofile is not None and autofiledata != 'x':
+    autofiledata, serial = autosave.ReadAutosave(setting('AutoSaveFile'))
+
+    # Older versions stored the autosave in the settings file itself
+    if globals_.settings.contains('AutoSaveFileData'):
+        if autofiledata is None and setting('AutoSaveFileData', 'x') != 'x':
+            autofiledata = bytes(setting('AutoSaveFileData'))
+
+        globals_.settings.remove('AutoSaveFileData')
+        globals_.settings.remove('typeof(AutoSaveFileData)')
+
+    if autofile is not None and autofiledata is not None:
         result = AutoSavedInfoDialog(autofile).exec_()
         if result == QtWidgets.QDialog.Accepted:
             globals_.RestoredFromAutoSave = True
             globals_.AutoSavePath = autofile
-            globals_.AutoSaveData = bytes(autofiledata)
+            globals_.AutoSaveData = autofiledata
+
+            area, records = autosave.RecoverJournal(serial)
+            if area is not None:
+                globals_.AutoSaveArea = area
+                globals_.AutoSaveJournal = records
         else:
-            setSetting('AutoSaveFilePath', None)
-            setSetting('AutoSaveFileData', 'x')
+            autosave.ClearAutosave()
+    else:
+        autosave.RemoveJournals()
+
+    # New journals continue after the ones that are still on disk
+    globals_.Journal = autosave.EditJournal(max([serial] + autosave.JournalSerials()))
 
     # Create and show the main window
     globals_.mainWindow = ReggieWindow()
@@ -4463,6 +4805,16 @@ def main():
     if '-generatestringsxml' in sys.argv:
         globals_.trans.generateXML()
 
+    # Compare how fast the level view draws with and without OpenGL
+    if '-benchmarkview' in sys.argv:
+        QtCore.QTimer.singleShot(0, lambda: RunViewBenchmark(globals_.mainWindow.view))
+
+    if '-benchmarkobjects' in sys.argv:
+        QtCore.QTimer.singleShot(0, RunObjectBenchmark)
+
+    if '-benchmarkrender' in sys.argv:
+        QtCore.QTimer.singleShot(0, RunRenderBenchmark)
+
     exitcodesys = globals_.app.exec_()
     globals_.app.deleteLater()
     sys.exit(exitcodesys)
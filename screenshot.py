@@ -0,0 +1,212 @@
+import math
+import os
+import queue
+import struct
+import zlib
+
+from PyQt5 import QtCore, QtGui
+
+# Scales a screenshot can be taken at
+SCREENSHOT_SCALES = (1, 0.5, 0.25)
+
+# How much memory one rendered strip may use, in bytes. At most
+# SCREENSHOT_QUEUED_STRIPS strips wait for the encoder at once, so this caps
+# the memory a screenshot of any size needs.
+SCREENSHOT_STRIP_BYTES = 32 * 1024 * 1024
+SCREENSHOT_QUEUED_STRIPS = 2
+
+# zlib compression level of the PNG data
+SCREENSHOT_COMPRESSION = 6
+
+# Put into the strip queue instead of None if rendering the strips failed
+STRIPS_ABORTED = object()
+
+
+def ScaledSize(rect, scale):
+    """
+    Returns the size of a screenshot of the given rect at a scale
+    """
+    return QtCore.QSize(max(math.ceil(rect.width() * scale), 1), max(math.ceil(rect.height() * scale), 1))
+
+
+def StripHeight(width, scale):
+    """
+    Returns how many rows of a screenshot with the given width (in pixels of
+    the image) are rendered at once. Strips start on whole pixels of the
+    scene, so scaled strips line up without seams.
+    """
+    step = round(1 / scale)
+    rows = max(SCREENSHOT_STRIP_BYTES // (width * 4), 1)
+
+    return max(rows // step * step, step)
+
+
+class PngStreamWriter:
+    """
+    Writes a PNG file a few rows at a time, so the whole image never has to
+    be in memory
+    """
+
+    def __init__(self, path, width, height):
+        """
+        Creates the file and writes the PNG header
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows = 0
+
+        self.file = open(path, 'wb')
+        self.compressor = zlib.compressobj(SCREENSHOT_COMPRESSION)
+
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        # 8 bits per channel, RGBA, no interlacing
+        self.WriteChunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def WriteChunk(self, kind, data):
+        """
+        Writes one PNG chunk
+        """
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def WriteRows(self, data, stride, count):
+        """
+        Writes the next rows of the image, from RGBA data with the given
+        number of bytes per row
+        """
+        length = self.width * 4
+        raw = b''.join(b'\0' + data[row * stride:row * stride + length] for row in range(count))
+
+        compressed = self.compressor.compress(raw)
+        if compressed:
+            self.WriteChunk(b'IDAT', compressed)
+
+        self.rows += count
+
+    def Close(self):
+        """
+        Writes the rest of the image data and closes the file
+        """
+        try:
+            self.WriteChunk(b'IDAT', self.compressor.flush())
+            self.WriteChunk(b'IEND', b'')
+        finally:
+            self.file.close()
+
+    def Discard(self):
+        """
+        Closes and deletes the unfinished file
+        """
+        self.file.close()
+        os.remove(self.path)
+
+
+def WriteStrips(path, width, height, strips):
+    """
+    Encodes the strips of a screenshot into a PNG file as they arrive in the
+    given queue, as (data, stride, rows). None marks the end of the image,
+    and STRIPS_ABORTED that the image won't be finished, in which case the
+    partial file is deleted and None is returned. This runs on a worker
+    thread.
+    """
+    writer = None
+    error = None
+
+    try:
+        writer = PngStreamWriter(path, width, height)
+    except OSError as e:
+        error = e
+
+    # Keep taking strips after an error, so the renderer never waits for an
+    # encoder that has stopped
+    while True:
+        strip = strips.get()
+        if strip is None: break
+
+        if strip is STRIPS_ABORTED:
+            if writer is not None:
+                try:
+                    writer.Discard()
+                except OSError:
+                    pass
+
+            return None
+
+        if error is not None: continue
+
+        try:
+            writer.WriteRows(*strip)
+        except OSError as e:
+            error = e
+
+    if writer is not None:
+        try:
+            writer.Close()
+        except OSError as e:
+            error = error or e
+
+    if error is not None:
+        raise error
+
+    return path
+
+
+def RenderStrips(scene, source, size, scale, strips, progress=None):
+    """
+    Renders a rect of the scene at a scale, one strip at a time, and puts the
+    strips into the given queue for WriteStrips. progress is called with
+    (done, total) rows after every strip. If rendering fails, the encoder is
+    told to give up on the image.
+    """
+    width = size.width()
+    height = size.height()
+    stripHeight = StripHeight(width, scale)
+
+    # The encoder waits for the end of the strips, even if rendering fails
+    complete = False
+    try:
+        RenderStripsInto(scene, source, width, height, scale, stripHeight, strips, progress)
+        complete = True
+    finally:
+        strips.put(None if complete else STRIPS_ABORTED)
+
+
+def RenderStripsInto(scene, source, width, height, scale, stripHeight, strips, progress):
+    """
+    Renders the strips for RenderStrips
+    """
+    for top in range(0, height, stripHeight):
+        rows = min(stripHeight, height - top)
+
+        image = QtGui.QImage(width, rows, QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter(image)
+        scene.render(
+            painter,
+            QtCore.QRectF(0, 0, width, rows),
+            QtCore.QRectF(source.x(), source.y() + top / scale, width / scale, rows / scale),
+            QtCore.Qt.IgnoreAspectRatio,
+        )
+        painter.end()
+
+        # PNG wants straight (not premultiplied) alpha
+        image = image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+        bits = image.constBits()
+        bits.setsize(image.byteCount())
+
+        strips.put((bytes(bits), image.bytesPerLine(), rows))
+
+        if progress is not None:
+            progress(top + rows, height)
+
+
+def StripQueue():
+    """
+    Returns a queue for the strips of a screenshot, which makes the renderer
+    wait when the encoder falls behind
+    """
+    return queue.Queue(SCREENSHOT_QUEUED_STRIPS)
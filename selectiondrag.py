@@ -0,0 +1,127 @@
+import math
+
+from PyQt5 import QtCore, QtWidgets
+
+import globals_
+from levelitems import LevelEditorItem, ObjectItem, PathEditorLineItem
+from undo import MoveItemUndoAction, SimultaneousUndoAction
+
+
+class SelectionDrag:
+    """
+    Moves a selection of several items as a group while it's dragged. Qt
+    moves every selected item on its own, so the snapping is worked out once
+    per mouse movement and applied to all of them. The areas they leave and
+    enter are repainted once per movement, and the whole drag is one undo
+    action.
+    """
+
+    def __init__(self, items):
+        """
+        Starts dragging the given items from where they are now
+        """
+        self.starts = {}
+        self.objStarts = {}
+
+        for item in items:
+            if not isinstance(item, LevelEditorItem): continue
+
+            self.starts[item] = item.pos()
+            self.objStarts[item] = (item.objx, item.objy)
+
+        # Objects can only move by whole blocks, so everything else has to
+        # move with them
+        self.objectsSelected = any(isinstance(item, ObjectItem) for item in self.starts)
+
+        self.lastDelta = None
+        self.snappedDelta = None
+
+        self.dirty = QtCore.QRectF()
+        self.dirtyBackground = QtCore.QRectF()
+        self.dirtyOverview = QtCore.QRectF()
+
+    def Has(self, item):
+        """
+        Returns True if the item is moved by this drag
+        """
+        return item in self.starts
+
+    def Position(self, item, pos):
+        """
+        Returns where an item Qt is moving to pos should actually go
+        """
+        delta = pos - self.starts[item]
+        key = (delta.x(), delta.y(), QtWidgets.QApplication.keyboardModifiers() == QtCore.Qt.AltModifier)
+
+        if key != self.lastDelta:
+            self.lastDelta = key
+
+            if globals_.OverrideSnapping or key[2]:
+                # Snap the smallest amount possible -> 1/16th of a block
+                step = 1.5
+            elif self.objectsSelected:
+                step = 24
+            else:
+                step = 12
+
+            self.snappedDelta = QtCore.QPointF(
+                math.floor(key[0] / step + 0.5) * step,
+                math.floor(key[1] / step + 0.5) * step,
+            )
+
+        return self.starts[item] + self.snappedDelta
+
+    def Update(self, rect):
+        """
+        Marks a rect of the scene to be repainted with the next Flush()
+        """
+        self.dirty |= rect
+
+    def InvalidateBackground(self, rect):
+        """
+        Marks a rect of the tiles to be redrawn with the next Flush()
+        """
+        self.dirtyBackground |= rect
+
+    def InvalidateOverview(self, rect):
+        """
+        Marks a rect of the level overview (in tiles) to be redrawn with the
+        next Flush()
+        """
+        self.dirtyOverview |= rect
+
+    def Flush(self):
+        """
+        Repaints what the items moved over since the last Flush()
+        """
+        scene = globals_.mainWindow.scene
+
+        if not self.dirtyBackground.isNull():
+            scene.invalidate(self.dirtyBackground, QtWidgets.QGraphicsScene.BackgroundLayer)
+            self.dirtyBackground = QtCore.QRectF()
+
+        if not self.dirty.isNull():
+            scene.update(self.dirty)
+            self.dirty = QtCore.QRectF()
+
+        if not self.dirtyOverview.isNull():
+            globals_.mainWindow.levelOverview.AddDirtyRect(self.dirtyOverview)
+            self.dirtyOverview = QtCore.QRectF()
+
+    def Finish(self):
+        """
+        Ends the drag, and adds one undo action that moves every item back
+        """
+        self.Flush()
+
+        acts = []
+        for item, (objx, objy) in self.objStarts.items():
+            if isinstance(item, PathEditorLineItem): continue
+            if item.objx == objx and item.objy == objy: continue
+
+            acts.append(MoveItemUndoAction(item, objx, objy, item.objx, item.objy))
+
+        if len(acts) == 1:
+            globals_.mainWindow.undoStack.addAction(acts[0])
+        elif acts:
+            globals_.mainWindow.undoStack.addAction(SimultaneousUndoAction(acts))
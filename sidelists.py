@@ -4,6 +4,7 @@ from PyQt5 import QtWidgets, QtGui, QtCore
 
 import globals_
 from tiles import RenderObject, TilesetTile
+from levelitems import ZoneItem, LocationItem
 from ui import ListWidgetWithToolTipSignal
 from misc import LoadSpriteData, LoadSpriteListData, LoadSpriteCategories
 from spriteeditor import SpriteEditorWidget
@@ -46,6 +47,66 @@ class LevelOverviewWidget(QtWidgets.QWidget):
         self.maxY = 40
         self.Rescale()
 
+        self.Invalidate()
+
+    def Invalidate(self):
+        """
+        Redraws the whole overview the next time it's painted, after the
+        level changed in a way that isn't known exactly
+        """
+        self.content = None
+        self.dirty = []
+        self.update()
+
+    def InvalidateRect(self, rect):
+        """
+        Redraws a rect of the level (in tiles) the next time the overview is
+        painted, after the items in it changed
+        """
+        if self.content is None: return
+
+        if globals_.SelectionDrag is not None:
+            # Every dragged item invalidates where it was and where it is. The
+            # drag merges those rects, and redraws them once per movement.
+            globals_.SelectionDrag.InvalidateOverview(rect)
+            return
+
+        self.AddDirtyRect(rect)
+
+    def AddDirtyRect(self, rect):
+        """
+        Adds a rect of the level (in tiles) to the parts of the overview that
+        are redrawn the next time it's painted
+        """
+        if self.content is None: return
+
+        if rect.right() > self.maxX or rect.bottom() > self.maxY:
+            # The level grew, so the scale changes
+            self.content = None
+            self.dirty = []
+        else:
+            self.dirty.append(QtCore.QRectF(rect))
+
+        self.update()
+
+    def InvalidateMove(self, rect, dx, dy):
+        """
+        Redraws a rect of the level (in tiles), and the rect moved by (dx, dy),
+        after an item moved from one of them to the other
+        """
+        self.InvalidateRect(rect)
+        self.InvalidateRect(rect.translated(dx, dy))
+
+    @staticmethod
+    def ItemRect(item):
+        """
+        Returns the rect (in tiles) that an item covers in the overview
+        """
+        if isinstance(item, (ZoneItem, LocationItem)):
+            return (QtGui.QTransform() / 24).mapRect(item.sceneBoundingRect())
+
+        return QtCore.QRectF(item.LevelRect)
+
     def mouseMoveEvent(self, event):
         """
         Handles mouse movement over the widget
@@ -64,24 +125,85 @@ class LevelOverviewWidget(QtWidgets.QWidget):
         if event.button() == QtCore.Qt.LeftButton:
             self.moveIt.emit(event.pos().x() * self.posmult, event.pos().y() * self.posmult)
 
+    def resizeEvent(self, event):
+        """
+        Redraws the overview at its new size
+        """
+        QtWidgets.QWidget.resizeEvent(self, event)
+        self.Invalidate()
+
     def paintEvent(self, event):
         """
-        Paints the level overview widget
+        Paints the level overview widget. The level is drawn from a cached
+        pixmap, so only the view box is drawn again when the view scrolls.
         """
         if not hasattr(globals_.Area, 'layers'):
             # fixes race condition where this widget is painted after
             # the level is created, but before it's loaded
             return
 
+        self.UpdateContent()
+
         painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        painter.drawPixmap(0, 0, self.content)
 
-        self.CalcSize()
-        self.Rescale()
+        painter.scale(self.scale, self.scale)
+        painter.setPen(QtGui.QPen(globals_.theme.color('overview_viewbox'), 1))
+
+        scalar = 1 / (24 * self.mainWindowScale)
+        painter.drawRect(QtCore.QRectF(
+            scalar * self.Xposlocator, scalar * self.Yposlocator,
+            scalar * self.Wlocator, scalar * self.Hlocator
+        ))
+
+    def UpdateContent(self):
+        """
+        Draws the parts of the cached pixmap that are out of date
+        """
+        if self.content is not None and not self.dirty:
+            return
 
-        painter.fillRect(event.rect(), self.bgbrush)
+        full = self.content is None
+        if full:
+            self.CalcSize()
+            self.Rescale()
+
+            self.content = QtGui.QPixmap(self.size())
+            self.dirty = []
+
+        painter = QtGui.QPainter(self.content)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
         painter.scale(self.scale, self.scale)
 
+        if full:
+            painter.fillRect(QtCore.QRectF(0, 0, self.width() / self.scale, self.height() / self.scale), self.bgbrush)
+            self.DrawLevel(painter)
+
+        scale = QtGui.QTransform.fromScale(self.scale, self.scale)
+
+        for rect in self.dirty:
+            # Item outlines reach one tile beyond the items. The rect is
+            # widened to whole pixels, so its edges aren't blended twice.
+            rect = scale.mapRect(rect.adjusted(-1, -1, 1, 1)).toAlignedRect()
+            rect = QtCore.QRectF(rect.x() / self.scale, rect.y() / self.scale, rect.width() / self.scale, rect.height() / self.scale)
+
+            painter.save()
+            painter.setClipRect(rect)
+            painter.fillRect(rect, self.bgbrush)
+            self.DrawLevel(painter, rect)
+            painter.restore()
+
+        painter.end()
+        self.dirty = []
+
+    def DrawLevel(self, painter, rect=None):
+        """
+        Draws the items of the level. If a rect (in tiles) is given, only the
+        items that touch it are drawn.
+        """
+        def touches(itemrect):
+            return rect is None or rect.intersects(itemrect)
+
         transform = QtGui.QTransform() / 24
 
         dr = painter.drawRect
@@ -91,41 +213,44 @@ class LevelOverviewWidget(QtWidgets.QWidget):
         painter.setPen(QtGui.QPen(globals_.theme.color('overview_zone_lines'), 1))
 
         for zone in globals_.Area.zones:
-            rect = transform.mapRect(zone.sceneBoundingRect())
-            fr(rect, b)
-            dr(rect)
+            zonerect = transform.mapRect(zone.sceneBoundingRect())
+            if not touches(zonerect): continue
+
+            fr(zonerect, b)
+            dr(zonerect)
 
         b = self.objbrush
 
-        for layer in globals_.Area.layers:
+        for idx, layer in enumerate(globals_.Area.layers):
+            if rect is not None:
+                # Let the spatial index find the objects in the rect
+                layer = globals_.Area.layerIndexes[idx].ObjectsIn(rect.x(), rect.y(), rect.width(), rect.height())
+
             for obj in layer:
-                fr(obj.LevelRect, b)
+                if touches(obj.LevelRect):
+                    fr(obj.LevelRect, b)
 
         b = self.spritebrush
 
         for sprite in globals_.Area.sprites:
-            fr(sprite.LevelRect, b)
+            if touches(sprite.LevelRect):
+                fr(sprite.LevelRect, b)
 
         b = self.entrancebrush
 
         for ent in globals_.Area.entrances:
-            fr(ent.LevelRect, b)
+            if touches(ent.LevelRect):
+                fr(ent.LevelRect, b)
 
         b = self.locationbrush
         painter.setPen(QtGui.QPen(globals_.theme.color('overview_location_lines'), 1))
 
         for location in globals_.Area.locations:
-            rect = transform.mapRect(location.sceneBoundingRect())
-            fr(rect, b)
-            dr(rect)
-
-        painter.setPen(QtGui.QPen(globals_.theme.color('overview_viewbox'), 1))
+            locrect = transform.mapRect(location.sceneBoundingRect())
+            if not touches(locrect): continue
 
-        scalar = 1 / (24 * self.mainWindowScale)
-        painter.drawRect(QtCore.QRectF(
-            scalar * self.Xposlocator, scalar * self.Yposlocator,
-            scalar * self.Wlocator, scalar * self.Hlocator
-        ))
+            fr(locrect, b)
+            dr(locrect)
 
     def CalcSize(self):
         """
@@ -0,0 +1,320 @@
+import os
+import sqlite3
+import struct
+
+import globals_
+import archive
+from autosave import AUTOSAVE_FOLDER
+from libs import lh, lz77
+from level import Metadata
+
+# The index is kept next to the autosave, rather than wherever Reggie happens
+# to be started from
+STAGE_INDEX_FILE = os.path.join(AUTOSAVE_FOLDER, 'stageindex.db')
+
+# Bump this whenever the layout of the tables changes. Databases with another
+# version are thrown away and rebuilt from scratch.
+SCHEMA_VERSION = 1
+
+SCHEMA = (
+    'CREATE TABLE levels (path TEXT PRIMARY KEY, stage TEXT, name TEXT, mtime REAL, size INTEGER)',
+    'CREATE TABLE areas (path TEXT, area INTEGER, entrances INTEGER, zones INTEGER, locations INTEGER, sprites INTEGER, start_entrance INTEGER, PRIMARY KEY (path, area))',
+    'CREATE TABLE tilesets (path TEXT, area INTEGER, slot INTEGER, name TEXT)',
+    'CREATE TABLE sprites (path TEXT, area INTEGER, type INTEGER, count INTEGER)',
+    'CREATE TABLE metadata (path TEXT, key TEXT, value TEXT)',
+    'CREATE INDEX levels_stage ON levels (stage)',
+    'CREATE INDEX tilesets_name ON tilesets (name)',
+    'CREATE INDEX sprites_type ON sprites (type)',
+)
+
+
+def ReadLevelData(path):
+    """
+    Reads a level file and returns the uncompressed U8 archive data, or None if
+    the file could not be decompressed
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if not data:
+        return None
+
+    try:
+        if (data[0] & 0xF0) == 0x40:  # If LH-compressed
+            return lh.UncompressLH(data)
+        elif not data.startswith(b"U\xAA8-"):  # If LZ-compressed
+            return lz77.UncompressLZ77(data)
+    except IndexError:
+        return None
+
+    return data
+
+
+def ParseCourse(course):
+    """
+    Extracts the indexable information from a course file, without creating
+    any level editor items
+    """
+    getblock = struct.Struct('>II')
+    blocks = []
+    for i in range(14):
+        start, length = getblock.unpack_from(course, i * 8)
+        blocks.append(course[start:start + length])
+
+    block1pos = getblock.unpack_from(course, 0)[0]
+
+    tilesets = [name.strip(b'\0').decode('latin-1') for name in struct.unpack('>32s32s32s32s', blocks[0])]
+    start_entrance = blocks[1][16] if len(blocks[1]) > 16 else 0
+
+    # Ignore the last 4 bytes of the sprite block, because they are always
+    # 0xFFFFFFFF
+    spritedata = blocks[7]
+    sprites = {}
+    for offset in range(0, len(spritedata) - 4, 16):
+        type_, = struct.unpack_from('>H', spritedata, offset)
+        sprites[type_] = sprites.get(type_, 0) + 1
+
+    metadata = {}
+    if block1pos != 0x70:
+        try:
+            md = Metadata(course[0x70:block1pos])
+        except Exception:
+            md = Metadata()
+
+        for key, types in md.DataDict.items():
+            if 1 not in types:
+                continue
+
+            try:
+                metadata[key] = types[1].decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+
+    return {
+        'tilesets': tilesets,
+        'start_entrance': start_entrance,
+        'entrances': len(blocks[6]) // 20,
+        'zones': len(blocks[9]) // 24,
+        'locations': len(blocks[10]) // 12,
+        'sprites': sprites,
+        'metadata': metadata,
+    }
+
+
+def ParseLevel(data):
+    """
+    Returns a dict of {area number: parsed course info} for level archive data
+    """
+    arc = archive.U8.load(data)
+    areas = {}
+
+    for name, val in arc.files:
+        if val is None: continue
+        name = name.replace('\\', '/').split('/')[-1]
+
+        # Only the course files are interesting, the layers are not indexed
+        if len(name) != 11 or not name.startswith('course') or not name.endswith('.bin'):
+            continue
+
+        try:
+            area = int(name[6])
+        except ValueError:
+            continue
+
+        if not (0 < area < 5): continue
+
+        areas[area] = ParseCourse(val)
+
+    return areas
+
+
+def ContainsPattern(text):
+    """
+    Returns a LIKE pattern (with ESCAPE '\\') that matches strings containing
+    the given text. '%' and '_' in the text are matched literally.
+    """
+    text = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%' + text + '%'
+
+
+class StageIndex:
+    """
+    Persistent index of the contents of all levels in a Stage folder
+    """
+
+    def __init__(self, path=STAGE_INDEX_FILE):
+        """
+        Opens (and creates, if needed) the index database
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.db = sqlite3.connect(path)
+
+        version, = self.db.execute('PRAGMA user_version').fetchone()
+        if version != SCHEMA_VERSION:
+            self.CreateTables()
+
+    def CreateTables(self):
+        """
+        Drops all existing tables and creates new, empty ones
+        """
+        with self.db:
+            for table in ('levels', 'areas', 'tilesets', 'sprites', 'metadata'):
+                self.db.execute('DROP TABLE IF EXISTS %s' % table)
+
+            for statement in SCHEMA:
+                self.db.execute(statement)
+
+            self.db.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    def close(self):
+        self.db.close()
+
+    def RemoveLevel(self, path):
+        """
+        Removes all indexed data of a level file
+        """
+        for table in ('levels', 'areas', 'tilesets', 'sprites', 'metadata'):
+            self.db.execute('DELETE FROM %s WHERE path = ?' % table, (path,))
+
+    def IndexLevel(self, stage, path, mtime, size):
+        """
+        (Re)indexes a single level file. Returns whether the file was a valid
+        level.
+        """
+        self.RemoveLevel(path)
+
+        try:
+            data = ReadLevelData(path)
+            areas = ParseLevel(data) if data is not None else {}
+        except Exception:
+            areas = {}
+
+        name = os.path.basename(path)
+        for ext in globals_.FileExtentions:
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+                break
+
+        # Broken files are still recorded, so they are not parsed again until
+        # they change
+        self.db.execute('INSERT INTO levels VALUES (?, ?, ?, ?, ?)', (path, stage, name, mtime, size))
+
+        for area, info in areas.items():
+            self.db.execute(
+                'INSERT INTO areas VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, area, info['entrances'], info['zones'], info['locations'], sum(info['sprites'].values()), info['start_entrance'])
+            )
+
+            self.db.executemany(
+                'INSERT INTO tilesets VALUES (?, ?, ?, ?)',
+                ((path, area, slot, tileset) for slot, tileset in enumerate(info['tilesets']) if tileset)
+            )
+
+            self.db.executemany(
+                'INSERT INTO sprites VALUES (?, ?, ?, ?)',
+                ((path, area, type_, count) for type_, count in info['sprites'].items())
+            )
+
+            # Metadata is stored in the course file of every area, but it is
+            # only edited through area 1
+            if area == 1:
+                self.db.executemany(
+                    'INSERT INTO metadata VALUES (?, ?, ?)',
+                    ((path, key, value) for key, value in info['metadata'].items())
+                )
+
+        return bool(areas)
+
+    def Refresh(self, stage, progress=None):
+        """
+        Brings the index up to date with the given Stage folder. Only files
+        whose modification time or size changed are parsed again. The optional
+        progress callback is called with (done, total) and can return False to
+        abort the refresh. Returns the number of files that were (re)indexed.
+        """
+        stage = os.path.normpath(stage)
+
+        files = {}
+        if os.path.isdir(stage):
+            for name in os.listdir(stage):
+                if not name.endswith(globals_.FileExtentions):
+                    continue
+
+                path = os.path.join(stage, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+
+                files[path] = (st.st_mtime, st.st_size)
+
+        known = {
+            path: (mtime, size) for path, mtime, size in
+            self.db.execute('SELECT path, mtime, size FROM levels WHERE stage = ?', (stage,))
+        }
+
+        outdated = sorted(path for path, stat in files.items() if known.get(path) != stat)
+        removed = [path for path in known if path not in files]
+
+        with self.db:
+            for path in removed:
+                self.RemoveLevel(path)
+
+        count = 0
+        for i, path in enumerate(outdated):
+            if progress is not None and progress(i, len(outdated)) is False:
+                break
+
+            with self.db:
+                self.IndexLevel(stage, path, *files[path])
+
+            count += 1
+
+        if progress is not None:
+            progress(len(outdated), len(outdated))
+
+        return count
+
+    def FindSprite(self, stage, type_):
+        """
+        Returns (name, path, area, count) for every area that uses a sprite type
+        """
+        return self.db.execute(
+            'SELECT l.name, l.path, s.area, s.count FROM sprites s JOIN levels l ON s.path = l.path '
+            'WHERE l.stage = ? AND s.type = ? ORDER BY l.name, s.area',
+            (os.path.normpath(stage), type_)
+        ).fetchall()
+
+    def FindTileset(self, stage, name):
+        """
+        Returns (name, path, area, tileset) for every area that loads a tileset
+        whose name contains the given text
+        """
+        return self.db.execute(
+            'SELECT l.name, l.path, t.area, t.name FROM tilesets t JOIN levels l ON t.path = l.path '
+            "WHERE l.stage = ? AND t.name LIKE ? ESCAPE '\\' ORDER BY l.name, t.area, t.slot",
+            (os.path.normpath(stage), ContainsPattern(name))
+        ).fetchall()
+
+    def FindMetadata(self, stage, text):
+        """
+        Returns (name, path, key, value) for every metadata string containing the
+        given text
+        """
+        return self.db.execute(
+            'SELECT l.name, l.path, m.key, m.value FROM metadata m JOIN levels l ON m.path = l.path '
+            "WHERE l.stage = ? AND m.value LIKE ? ESCAPE '\\' ORDER BY l.name, m.key",
+            (os.path.normpath(stage), ContainsPattern(text))
+        ).fetchall()
+
+    def AreaSummary(self, path, area):
+        """
+        Returns (entrances, zones, locations, sprites) of an indexed area, or None
+        """
+        return self.db.execute(
+            'SELECT entrances, zones, locations, sprites FROM areas WHERE path = ? AND area = ?',
+            (path, area)
+        ).fetchone()
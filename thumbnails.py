@@ -0,0 +1,298 @@
+# Renders thumbnails of every area of a set of levels, without the editor:
+#
+#     python thumbnails.py [options] <level archives or Stage folders> -o <output folder>
+#
+# Each level is rendered by a process of a pool, on Qt's offscreen platform.
+
+import argparse
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyQt5 import QtCore, QtGui
+
+import globals_
+from level import ReadLevelFile, ParseArea
+from screenshot import ScaledSize
+from tiles import ReadTileset, RenderObject, LoadTexture_NSMBW, TilesetError
+
+# Scale of the thumbnails, unless another one is given
+THUMBNAIL_SCALE = 0.25
+
+# Colours of the boxes drawn for sprites, like the editor's spriteboxes
+SPRITEBOX_FILL = QtGui.QColor(0, 92, 196, 120)
+SPRITEBOX_LINES = QtGui.QColor(0, 0, 0)
+
+# The application of a worker process
+WorkerApp = None
+
+# The tileset cache of a worker process
+WorkerTilesets = None
+
+
+class TilesetCache:
+    """
+    Cache of decoded tilesets, shared by all processes through a folder. A
+    cached tileset is keyed by its file name, size and modification time, so
+    a changed tileset is decoded again.
+    """
+
+    def __init__(self, directory):
+        """
+        Creates a cache that is stored in the given folder
+        """
+        self.directory = directory
+        self.loaded = {}
+
+    def Get(self, idx, name, folder):
+        """
+        Returns (texture, object definitions) of a tileset in a slot, decoding
+        it first if no process has done so yet
+        """
+        arcname, compressed = self.Find(name, folder)
+        stat = os.stat(arcname)
+        key = '%s_%d_%x_%x' % (name, idx, stat.st_mtime_ns, stat.st_size)
+
+        tileset = self.loaded.get(key)
+        if tileset is not None: return tileset
+
+        path = os.path.join(self.directory, key + '.pickle')
+
+        try:
+            with open(path, 'rb') as fileobj:
+                tiledata, defs = pickle.load(fileobj)
+
+        except (OSError, EOFError, pickle.UnpicklingError):
+            tiledata, defs = ReadTileset(idx, name, arcname, compressed)[2:]
+            tiledata = bytes(tiledata)
+
+            # Other processes may be reading the cache, so only whole files
+            # may appear in it
+            temp = '%s.%d' % (path, os.getpid())
+            with open(temp, 'wb') as fileobj:
+                pickle.dump((tiledata, defs), fileobj, pickle.HIGHEST_PROTOCOL)
+
+            os.replace(temp, path)
+
+        # The image doesn't copy the data it's created from
+        tileset = (LoadTexture_NSMBW(tiledata).copy(), defs)
+        self.loaded[key] = tileset
+
+        return tileset
+
+    @staticmethod
+    def Find(name, folder):
+        """
+        Returns (path, compressed) of the archive of a tileset in a folder
+        """
+        arcname = os.path.join(folder, name + '.arc.LH')
+        if os.path.isfile(arcname):
+            return arcname, True
+
+        arcname = os.path.join(folder, name + '.arc')
+        if os.path.isfile(arcname):
+            return arcname, False
+
+        raise TilesetError('Err_MissingTileset')
+
+
+def AreaRect(parsed):
+    """
+    Returns the rect of an area that a thumbnail shows, in scene coordinates:
+    all zones with some padding, like a screenshot of all zones
+    """
+    rect = QtCore.QRectF()
+
+    for zone in parsed['zones'][3]:
+        rect |= QtCore.QRectF(zone[0] * 1.5, zone[1] * 1.5, zone[2] * 1.5, zone[3] * 1.5)
+
+    # Without zones, show all objects instead
+    if rect.isEmpty():
+        for layer in parsed['layers']:
+            for tileset, type, x, y, width, height in layer:
+                rect |= QtCore.QRectF(x * 24, y * 24, width * 24, height * 24)
+
+    rect += QtCore.QMarginsF(40, 40, 40, 40)
+    return rect & QtCore.QRectF(0, 0, 1024 * 24, 512 * 24)
+
+
+def RenderArea(parsed, folder, scale, sprites=False):
+    """
+    Renders a parsed area with the tilesets from a folder, and returns the
+    image. Tiles are drawn as they are in the tileset textures, without the
+    editor's overrides for special tiles. Sprites are drawn as spriteboxes,
+    because sprite images need the game data of the editor.
+    """
+    textures = [None] * 4
+    defs = [None] * 4
+    files = [None] * 4
+
+    for idx, name in enumerate(parsed['tilesets']):
+        if not name: continue
+
+        try:
+            textures[idx], defs[idx] = WorkerTilesets.Get(idx, name, folder)
+            files[idx] = WorkerTilesets.Find(name, folder)[0]
+        except (OSError, TilesetError):
+            pass
+
+    # RenderObject takes the object definitions from here, and caches the
+    # objects it renders by the tileset files
+    globals_.ObjectDefinitions = defs
+    globals_.TilesetFilesLoaded = files
+
+    rect = AreaRect(parsed)
+
+    image = QtGui.QImage(ScaledSize(rect, scale), QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+    painter.scale(scale, scale)
+    painter.translate(-rect.x(), -rect.y())
+
+    visible = QtCore.QRectF(rect.x() / 24, rect.y() / 24, rect.width() / 24, rect.height() / 24)
+
+    # Draw the layers back to front, and the objects of a layer in order
+    for layer in (2, 1, 0):
+        for tileset, type, x, y, width, height in parsed['layers'][layer]:
+            if tileset > 3 or textures[tileset] is None: continue
+            if not visible.intersects(QtCore.QRectF(x, y, width, height)): continue
+
+            for row_y, row in enumerate(RenderObject(tileset, type, width, height), y):
+                for tile_x, tile in enumerate(row, x):
+                    if tile <= 0: continue
+
+                    num = tile & 0xFF
+                    painter.drawImage(
+                        QtCore.QPointF(tile_x * 24, row_y * 24),
+                        textures[tile >> 8],
+                        QtCore.QRectF((num & 31) * 32 + 4, (num >> 5) * 32 + 4, 24, 24),
+                    )
+
+    if sprites:
+        painter.setPen(SPRITEBOX_LINES)
+        painter.setBrush(SPRITEBOX_FILL)
+
+        for type, x, y, data in parsed['sprites']:
+            box = QtCore.QRectF(x * 1.5 + 1, y * 1.5 + 1, 22, 22)
+            painter.drawRoundedRect(box, 4, 4)
+            painter.drawText(box, QtCore.Qt.AlignCenter, str(type))
+
+    painter.end()
+    return image
+
+
+def LevelName(path):
+    """
+    Returns the name of a level archive, without its extension
+    """
+    name = os.path.basename(path)
+
+    for ext in sorted(globals_.FileExtentions, key=len, reverse=True):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+
+    return name
+
+
+def InitWorker(cache):
+    """
+    Sets up a process of the pool
+    """
+    global WorkerApp, WorkerTilesets
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    WorkerApp = QtGui.QGuiApplication([])
+    WorkerTilesets = TilesetCache(cache)
+
+
+def RenderLevel(path, folder, output, scale, sprites):
+    """
+    Renders every area of a level archive into a PNG file in the output
+    folder. Returns the paths of the files.
+    """
+    areaData, parsed = ReadLevelFile(path, 1)
+
+    # Areas are numbered by their position in the level, like in the editor
+    areas = [(i, data) for i, data in enumerate(areaData, 1) if data[0] is not None]
+    name = LevelName(path)
+    written = []
+
+    for num, (areanum, data) in enumerate(areas, 1):
+        if num > 1:
+            parsed = ParseArea(areanum, *data)
+
+        image = RenderArea(parsed, folder, scale, sprites)
+        fn = os.path.join(output, '%s_%d.png' % (name, num))
+
+        if not image.save(fn, 'PNG'):
+            raise OSError('Could not write %s' % fn)
+
+        written.append(fn)
+
+    return written
+
+
+def FindLevels(paths):
+    """
+    Returns the level archives among the given paths, and in the given folders
+    """
+    levels = []
+
+    for path in paths:
+        if not os.path.isdir(path):
+            levels.append(path)
+            continue
+
+        for fn in sorted(os.listdir(path)):
+            if fn.endswith(globals_.FileExtentions):
+                levels.append(os.path.join(path, fn))
+
+    return levels
+
+
+def main(argv=None):
+    """
+    Renders the thumbnails of the levels given on the command line
+    """
+    parser = argparse.ArgumentParser(description='Renders thumbnails of every area of NSMBW levels.')
+    parser.add_argument('levels', nargs='+', help='level archives, or Stage folders')
+    parser.add_argument('-o', '--output', required=True, help='folder the thumbnails are written to')
+    parser.add_argument('-t', '--textures', help='tileset folder (default: the Texture folder next to each level)')
+    parser.add_argument('-s', '--scale', type=float, default=THUMBNAIL_SCALE, help='scale of the thumbnails (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, help='number of processes (default: one per CPU)')
+    parser.add_argument('--sprites', action='store_true', help='draw spriteboxes')
+    parser.add_argument('--cache', help='folder of the shared tileset cache (default: .tilesets in the output folder)')
+    args = parser.parse_args(argv)
+
+    cache = args.cache or os.path.join(args.output, '.tilesets')
+    os.makedirs(args.output, exist_ok=True)
+    os.makedirs(cache, exist_ok=True)
+
+    levels = FindLevels(args.levels)
+    failed = 0
+
+    with ProcessPoolExecutor(args.jobs, initializer=InitWorker, initargs=(cache,)) as pool:
+        jobs = {}
+
+        for path in levels:
+            folder = args.textures or os.path.join(os.path.dirname(os.path.abspath(path)), 'Texture')
+            jobs[pool.submit(RenderLevel, path, folder, args.output, args.scale, args.sprites)] = path
+
+        for job in as_completed(jobs):
+            try:
+                written = job.result()
+            except Exception as e:
+                # A broken level shouldn't stop the others
+                print('%s: %r' % (jobs[job], e), file=sys.stderr)
+                failed += 1
+            else:
+                print('%s: %d areas' % (jobs[job], len(written)))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
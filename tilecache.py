@@ -0,0 +1,232 @@
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui
+
+import globals_
+from layerindex import INDEX_CELL_SIZE, LAYER_WIDTH, LAYER_HEIGHT, GRID_EMPTY, GRID_UNKNOWN
+
+# Size of a pre-rendered chunk, in pixels. Chunks are the cells of the layer
+# index, so a changed cell invalidates exactly one chunk.
+CHUNK_SIZE = INDEX_CELL_SIZE * 24
+
+# How much memory the pre-rendered chunks may use, in bytes
+CHUNK_CACHE_BUDGET = 128 * 1024 * 1024
+
+# Chunks are also rendered at 1/2, 1/4 and 1/8 of their size, for views that
+# are zoomed out
+MAX_CHUNK_LOD = 3
+
+
+def LevelOfDetail(scale):
+    """
+    Returns the level of detail to use for chunks at the given view scale:
+    0 for full size, 1 for half size and so on. The chunks are never smaller
+    than they appear on the screen.
+    """
+    lod = 0
+    while lod < MAX_CHUNK_LOD and scale <= 0.5 ** (lod + 1):
+        lod += 1
+
+    return lod
+
+
+def ChunkBytes(lod):
+    """
+    Returns how much memory a chunk pixmap uses at a level of detail
+    """
+    return (CHUNK_SIZE >> lod) ** 2 * 4
+
+
+def CountTiles(grid, x1, y1, x2, y2):
+    """
+    Returns how many tiles of a layer grid in the given window (in tiles, with
+    the end being exclusive) aren't empty
+    """
+    return sum(x2 - x1 - grid.Row(y, x1, x2).count(GRID_EMPTY) for y in range(y1, y2))
+
+
+def DrawTiles(painter, grid, collisions, x1, y1, x2, y2, skipAnimated=False):
+    """
+    Draws the tiles of a layer grid in the given window (in tiles, with the
+    end being exclusive). If skipAnimated is True, animated tiles are left out
+    and returned as a list of (x, y, tile) instead.
+    """
+    tiles = globals_.Tiles
+    unkn_tile = globals_.Overrides[globals_.OVERRIDE_UNKNOWN].getCurrentTile()
+    drawPixmap = painter.drawPixmap
+    animated = []
+
+    desty = y1 * 24 - 24
+    for y in range(y1, y2):
+        desty += 24
+        destx = x1 * 24 - 24
+        for x, tile in enumerate(grid.Row(y, x1, x2), x1):
+            destx += 24
+            if tile == GRID_EMPTY:
+                continue
+            elif tile == GRID_UNKNOWN:
+                # Draw unknown tiles
+                drawPixmap(destx, desty, unkn_tile)
+            elif skipAnimated and tiles[tile].isAnimated:
+                animated.append((x, y, tile))
+            else:
+                drawPixmap(destx, desty, tiles[tile].getCurrentTile(collisions))
+
+    return animated
+
+
+class TileChunk:
+    """
+    A pre-rendered chunk of a layer grid
+    """
+
+    def __init__(self, grid, version, state, pixmap, animated, count):
+        """
+        Creates a chunk. The pixmap is None if the chunk is empty.
+        """
+        self.grid = grid
+        self.version = version
+        self.state = state
+        self.pixmap = pixmap
+        self.animated = animated
+        self.count = count
+
+
+class ChunkCache:
+    """
+    Cache of pre-rendered chunks of the layer grids, so a repaint only has to
+    draw a few pixmaps per layer. Zoomed out views use chunks that are
+    rendered at a smaller size, so drawing them needs (almost) no scaling. The
+    least recently used chunks are dropped when the cache uses up its memory
+    budget.
+
+    Animated tiles (while tileset animations are playing) aren't rendered into
+    the chunks, but drawn on top of them, so they don't invalidate the chunks
+    on every frame.
+    """
+
+    def __init__(self, budget=CHUNK_CACHE_BUDGET):
+        """
+        Creates an empty cache
+        """
+        self.chunks = OrderedDict()
+        self.budget = budget
+        self.used = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def Clear(self):
+        """
+        Drops all chunks
+        """
+        self.chunks.clear()
+        self.used = 0
+
+    def CanHold(self, count, lod):
+        """
+        Returns whether the given number of chunks at a level of detail fit
+        into the cache at once. If they don't, caching them would only drop
+        each chunk before it's used again.
+        """
+        return count * ChunkBytes(lod) <= self.budget
+
+    def HitRate(self):
+        """
+        Returns the share of chunk lookups that found a valid chunk
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def Draw(self, painter, layer_idx, grid, key, lod):
+        """
+        Draws one chunk of a layer grid, rendering it first if needed. Returns
+        how many tiles the chunk holds.
+        """
+        chunk = self.Chunk(layer_idx, grid, key, lod)
+        x = key[0] * CHUNK_SIZE
+        y = key[1] * CHUNK_SIZE
+
+        if chunk.pixmap is None:
+            pass
+        elif lod == 0:
+            painter.drawPixmap(x, y, chunk.pixmap)
+        else:
+            painter.drawPixmap(
+                QtCore.QRectF(x, y, CHUNK_SIZE, CHUNK_SIZE),
+                chunk.pixmap,
+                QtCore.QRectF(chunk.pixmap.rect()),
+            )
+
+        if chunk.animated:
+            tiles = globals_.Tiles
+            collisions = layer_idx == 1
+
+            for tx, ty, tile in chunk.animated:
+                painter.drawPixmap(tx * 24, ty * 24, tiles[tile].getCurrentTile(collisions))
+
+        return chunk.count
+
+    def Chunk(self, layer_idx, grid, key, lod):
+        """
+        Returns the pre-rendered chunk of a layer grid at the given index cell
+        and level of detail
+        """
+        ckey = (layer_idx, key, lod)
+        version = grid.versions.get(key, 0)
+        state = (globals_.TilesetsAnimating, globals_.CollisionsShown and layer_idx == 1)
+
+        chunk = self.chunks.get(ckey)
+        if chunk is not None and chunk.grid is grid and chunk.version == version and chunk.state == state:
+            self.chunks.move_to_end(ckey)
+            self.hits += 1
+            return chunk
+
+        self.misses += 1
+        self.Drop(ckey)
+
+        chunk = self.Render(layer_idx, grid, key, lod, version, state)
+        self.chunks[ckey] = chunk
+        if chunk.pixmap is not None:
+            self.used += ChunkBytes(lod)
+
+        # Drop the least recently used chunks
+        while self.used > self.budget:
+            self.Drop(next(iter(self.chunks)))
+
+        return chunk
+
+    def Drop(self, ckey):
+        """
+        Drops one chunk, if it's in the cache
+        """
+        chunk = self.chunks.pop(ckey, None)
+        if chunk is not None and chunk.pixmap is not None:
+            self.used -= ChunkBytes(ckey[2])
+
+    @staticmethod
+    def Render(layer_idx, grid, key, lod, version, state):
+        """
+        Renders one chunk of a layer grid at a level of detail
+        """
+        x1 = key[0] * INDEX_CELL_SIZE
+        y1 = key[1] * INDEX_CELL_SIZE
+        x2 = min(x1 + INDEX_CELL_SIZE, LAYER_WIDTH)
+        y2 = min(y1 + INDEX_CELL_SIZE, LAYER_HEIGHT)
+
+        # Empty chunks don't need a pixmap
+        count = CountTiles(grid, x1, y1, x2, y2)
+        if count == 0:
+            return TileChunk(grid, version, state, None, [], 0)
+
+        pixmap = QtGui.QPixmap(CHUNK_SIZE >> lod, CHUNK_SIZE >> lod)
+        pixmap.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter(pixmap)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        painter.scale(0.5 ** lod, 0.5 ** lod)
+        painter.translate(-x1 * 24, -y1 * 24)
+        animated = DrawTiles(painter, grid, layer_idx == 1, x1, y1, x2, y2, globals_.TilesetsAnimating)
+        painter.end()
+
+        return TileChunk(grid, version, state, pixmap, animated, count)
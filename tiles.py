@@ -1,4 +1,5 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
+from collections import OrderedDict
 import os
 import struct
 
@@ -14,8 +15,12 @@ from libs import lh, lz77, tpl, lib_versions
 
 class ObjectDef:
     """
-    Class for the object definitions
+    Class for the object definitions. A definition is compiled when it's
+    loaded: everything rendering it needs that doesn't depend on the size of
+    the object is worked out once, so rendering an object only has to stretch
+    the compiled rows.
     """
+    compiled = False
 
     def __init__(self):
         """
@@ -58,6 +63,36 @@ class ObjectDef:
                 elif len(tile) == 3 and tile[1] != 0:
                     tile[1] = (tile[1] & 0xFF) + tileoffset
 
+        self.Compile()
+
+    def Compile(self):
+        """
+        Compiles the definition. This has to be done again whenever the rows
+        are changed.
+        """
+        self.compiled = True
+        self.slope = bool(self.rows) and (self.rows[0][0][0] & 0x80) != 0
+
+        if self.slope:
+            # The main block and the sub block, as tuples of rows of tile
+            # numbers, and the control byte with the direction
+            self.mainBlock, self.subBlock = GetSlopeSections(self)
+            self.slopeByte = self.rows[0][0][0]
+            self.rowTiles = self.rowGroups = None
+            return
+
+        self.mainBlock = self.subBlock = self.slopeByte = None
+
+        # Every row as (tiles before the repeat, repeating tiles, tiles after
+        # the repeat), and the rows grouped the same way, as indices into
+        # rowTiles
+        rows = [row for row in self.rows if row]
+        self.rowTiles = tuple(
+            SplitRepeat((tile[0] & 1, tile[1]) for tile in row if len(tile) == 3)
+            for row in rows
+        )
+        self.rowGroups = SplitRepeat((row[0][0] & 2, i) for i, row in enumerate(rows))
+
 
 class TilesetTile:
     """
@@ -573,13 +608,103 @@ class TilesetTile:
         self.collOverlay = collPix
 
 
+# How many tiles the objects in the render cache may have in total
+RENDER_CACHE_TILES = 1024 * 1024
+
+
+class RenderCache:
+    """
+    Cache of rendered objects, so objects of the same type and size (and the
+    object picker, which renders every object of a tileset) are only rendered
+    once. The least recently used objects are dropped when the cache holds
+    too many tiles.
+    """
+
+    def __init__(self, limit=RENDER_CACHE_TILES):
+        """
+        Creates an empty cache
+        """
+        self.objects = OrderedDict()
+        self.limit = limit
+        self.used = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def Clear(self):
+        """
+        Drops all objects
+        """
+        self.objects.clear()
+        self.used = 0
+
+    def ClearSlot(self, idx):
+        """
+        Drops the objects of the tileset in a slot
+        """
+        for key in [key for key in self.objects if key[0] == idx]:
+            del self.objects[key]
+            self.used -= key[3] * key[4]
+
+    def HitRate(self):
+        """
+        Returns the share of renders that were found in the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def Render(self, tileset, objnum, width, height, fullslope):
+        """
+        Returns the rows of a rendered object, as tuples, rendering it first
+        if it isn't cached
+        """
+        try:
+            filename = globals_.TilesetFilesLoaded[tileset]
+        except (IndexError, TypeError):
+            filename = None
+
+        key = (tileset, filename, objnum, width, height, fullslope)
+
+        rows = self.objects.get(key)
+        if rows is not None:
+            self.objects.move_to_end(key)
+            self.hits += 1
+            return rows
+
+        self.misses += 1
+        rows = tuple(map(tuple, RenderObjectUncached(tileset, objnum, width, height, fullslope)))
+
+        # Objects that would fill most of the cache by themselves aren't kept
+        if width * height > self.limit // 4:
+            return rows
+
+        self.objects[key] = rows
+        self.used += width * height
+
+        # Drop the least recently used objects
+        while self.used > self.limit:
+            key, _ = self.objects.popitem(False)
+            self.used -= key[3] * key[4]
+
+        return rows
+
+
+RenderObjectCache = RenderCache()
+
+
 def RenderObject(tileset, objnum, width, height, fullslope=False):
     """
-    Render a tileset object into an array
+    Render a tileset object into an array (a list of rows). The array is the
+    caller's own, so it may be changed.
     """
-    # allocate an array
-    dest = [[0] * width for _ in range(height)]
+    return [list(row) for row in RenderObjectCache.Render(tileset, objnum, width, height, fullslope)]
 
+
+def FindObjectDef(tileset, objnum):
+    """
+    Returns the compiled definition of an object, or None if it doesn't
+    exist
+    """
     # ignore non-existent objects
     try:
         tileset_defs = globals_.ObjectDefinitions[tileset]
@@ -587,7 +712,7 @@ def RenderObject(tileset, objnum, width, height, fullslope=False):
         tileset_defs = None
 
     if tileset_defs is None:
-        return dest
+        return None
 
     try:
         obj = tileset_defs[objnum]
@@ -595,86 +720,76 @@ def RenderObject(tileset, objnum, width, height, fullslope=False):
         obj = None
 
     if obj is None or not obj.rows:
+        return None
+
+    if not obj.compiled:
+        obj.Compile()
+
+    return obj
+
+
+def RenderObjectUncached(tileset, objnum, width, height, fullslope=False):
+    """
+    Render a tileset object into an array, without the render cache
+    """
+    # allocate an array
+    dest = [[0] * width for _ in range(height)]
+
+    obj = FindObjectDef(tileset, objnum)
+    if obj is None:
         return dest
 
     # diagonal objects are rendered differently
-    if (obj.rows[0][0][0] & 0x80) != 0:
+    if obj.slope:
         RenderDiagonalObject(dest, obj, width, height, fullslope)
         return dest
 
     # standard object
-    repeatFound = False
-    beforeRepeat = []
-    inRepeat = []
-    afterRepeat = []
+    if not obj.rowTiles:
+        return dest
 
-    for row in obj.rows:
-        if not row: continue
+    # Rows that repeat are only worked out once
+    rendered = {}
+    for y, idx in enumerate(SpreadSection(obj.rowGroups, height)):
+        row = rendered.get(idx)
 
-        if (row[0][0] & 2) != 0:
-            repeatFound = True
-            inRepeat.append(row)
-        else:
-            if repeatFound:
-                afterRepeat.append(row)
-            else:
-                beforeRepeat.append(row)
-
-    bc = len(beforeRepeat)
-    ic = len(inRepeat)
-    ac = len(afterRepeat)
-    if ic == 0:
-        for y in range(height):
-            RenderStandardRow(dest[y], beforeRepeat[y % bc], y, width)
-    else:
-        afterthreshold = height - ac - 1
-        for y in range(height):
-            if y < bc:
-                RenderStandardRow(dest[y], beforeRepeat[y], y, width)
-            elif y > afterthreshold:
-                RenderStandardRow(dest[y], afterRepeat[y - height + ac], y, width)
-            else:
-                RenderStandardRow(dest[y], inRepeat[(y - bc) % ic], y, width)
+        if row is None:
+            row = rendered[idx] = SpreadSection(obj.rowTiles[idx], width)
+
+        dest[y][:] = row
 
     return dest
 
 
-def RenderStandardRow(dest, row, y, width):
+def SpreadSection(parts, length):
     """
-    Render a row from an object
+    Stretches a compiled row or column of an object to a length. parts is
+    (before the repeat, the repeat, after the repeat): the repeat is repeated
+    to fill what's left between the parts before and after it. If nothing
+    repeats, the whole row or column is repeated.
     """
-    repeatFound = False
-    beforeRepeat = []
-    inRepeat = []
-    afterRepeat = []
+    before, repeat, after = parts
+    bc = len(before)
 
-    for tile in row:
-        tiling = (tile[0] & 1) != 0
+    if not repeat:
+        if not bc:
+            return [0] * length
 
-        if tiling:
-            repeatFound = True
-            inRepeat.append(tile)
-        else:
-            if repeatFound:
-                afterRepeat.append(tile)
-            else:
-                beforeRepeat.append(tile)
+        return list((before * (length // bc + 1))[:length])
 
-    bc = len(beforeRepeat)
-    ic = len(inRepeat)
-    ac = len(afterRepeat)
-    if ic == 0:
-        for x in range(width):
-            dest[x] = beforeRepeat[x % bc][1]
-    else:
-        afterthreshold = width - ac - 1
-        for x in range(width):
-            if x < bc:
-                dest[x] = beforeRepeat[x][1]
-            elif x > afterthreshold:
-                dest[x] = afterRepeat[x - width + ac][1]
-            else:
-                dest[x] = inRepeat[(x - bc) % ic][1]
+    ic = len(repeat)
+    ac = len(after)
+
+    # The parts before and after the repeat are kept whole if they fit, and
+    # the part before the repeat comes first if they don't
+    middle = max(length - bc - ac, 0)
+    afterStart = max(length - ac, bc)
+
+    return (
+        list(before[:length])
+        + list((repeat * (middle // ic + 1))[:middle])
+        + list(after[afterStart - length + ac:])
+    )
 
 
 def RenderDiagonalObject(dest, obj, width, height, fullslope):
@@ -687,8 +802,8 @@ def RenderDiagonalObject(dest, obj, width, height, fullslope):
             row[x] = -1
 
     # get sections
-    mainBlock, subBlock = GetSlopeSections(obj)
-    cbyte = obj.rows[0][0][0]
+    mainBlock, subBlock = obj.mainBlock, obj.subBlock
+    cbyte = obj.slopeByte
 
     # get direction
     goLeft = ((cbyte & 1) != 0)
@@ -752,19 +867,38 @@ def RenderDiagonalObject(dest, obj, width, height, fullslope):
 
 def PutObjectArray(dest, xo, yo, block, width, height):
     """
-    Places a tile array into an object
+    Places a compiled tile array into an object
     """
-    # for y in range(yo,min(yo+len(block),height)):
-    for y in range(yo, yo + len(block)):
-        if y < 0: continue
-        if y >= height: continue
-        drow = dest[y]
-        srow = block[y - yo]
-        # for x in range(xo,min(xo+len(srow),width)):
-        for x in range(xo, xo + len(srow)):
-            if x < 0: continue
-            if x >= width: continue
-            drow[x] = srow[x - xo][1]
+    # Only the part of the block that's inside the object
+    left = max(xo, 0)
+    right = min(xo + len(block[0]), width) if block else left
+
+    for y in range(max(yo, 0), min(yo + len(block), height)):
+        if right > left:
+            dest[y][left:right] = block[y - yo][left - xo:right - xo]
+
+
+def SplitRepeat(items):
+    """
+    Splits the tiles of a row (or the rows of an object), given as pairs of
+    (repeats, value), into the values before the repeating ones, the
+    repeating ones and the ones after them
+    """
+    repeatFound = False
+    beforeRepeat = []
+    inRepeat = []
+    afterRepeat = []
+
+    for repeats, value in items:
+        if repeats:
+            repeatFound = True
+            inRepeat.append(value)
+        elif repeatFound:
+            afterRepeat.append(value)
+        else:
+            beforeRepeat.append(value)
+
+    return tuple(beforeRepeat), tuple(inRepeat), tuple(afterRepeat)
 
 
 def GetSlopeSections(obj):
@@ -800,18 +934,18 @@ def CreateSection(rows):
         thiswidth = CountTiles(row)
         if width < thiswidth: width = thiswidth
 
-    # create the section
+    # create the section, as tile numbers
     section = []
     for row in rows:
         drow = [0] * width
         x = 0
         for tile in row:
             if (tile[0] & 0x80) == 0:
-                drow[x] = tile
+                drow[x] = tile[1]
                 x += 1
-        section.append(drow)
+        section.append(tuple(drow))
 
-    return section
+    return tuple(section)
 
 
 def CountTiles(row):
@@ -837,19 +971,26 @@ def CreateTilesets():
     globals_.TilesetAnimTimer.start(90)
     globals_.ObjectDefinitions = [None] * 4
     SLib.Tiles = globals_.Tiles
+    RenderObjectCache.Clear()
 
 
-def LoadTileset(idx, name, reload_=False):
+class TilesetError(Exception):
     """
-    Load in a tileset into a specific slot
+    Raised if a tileset can't be read. Holds the translation section of the
+    message that describes the problem.
     """
-    if not name:
-        return False
+    def __init__(self, section):
+        super().__init__(section)
+        self.section = section
 
+
+def FindTileset(name):
+    """
+    Returns (path, compressed) of the archive of a tileset
+    """
     # find the tileset path
     tileset_paths = reversed(globals_.gamedef.GetTexturePaths())
 
-    found = False
     for path in tileset_paths:
         if path is None: break
 
@@ -857,24 +998,24 @@ def LoadTileset(idx, name, reload_=False):
 
         # Prioritise .arc.LH over regular .arc, just like the game does.
         if os.path.isfile(arcname):
-            compressed = True
-            found = True
-            break
+            return arcname, True
 
         arcname = os.path.splitext(arcname)[0]  # strip away the .LH suffix
         if os.path.isfile(arcname):
-            compressed = False
-            found = True
-            break
-
-    # warning if not found
-    if not found:
-        QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_MissingTileset', 0),
-                                      globals_.trans.string('Err_MissingTileset', 1, '[file]', name))
-        return False
+            return arcname, False
 
-    # if this file's already loaded, return
-    if globals_.TilesetFilesLoaded[idx] == arcname and not reload_: return
+    raise TilesetError('Err_MissingTileset')
+
+
+def ReadTileset(idx, name, arcname=None, compressed=False):
+    """
+    Reads and decompresses a tileset archive, its texture and its object
+    definitions. Returns (arcname, arc, texture data, object definitions).
+    This does not create any Qt objects, so it can be called from a worker
+    thread.
+    """
+    if arcname is None:
+        arcname, compressed = FindTileset(name)
 
     # get the data
     with open(arcname, 'rb') as fileobj:
@@ -885,12 +1026,70 @@ def LoadTileset(idx, name, reload_=False):
             try:
                 arcdata = lh.UncompressLH(arcdata)
             except IndexError:
-                QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_Decompress', 0),
-                                              globals_.trans.string('Err_Decompress', 1, '[file]', name))
-                return False
+                raise TilesetError('Err_Decompress')
 
     arc = archive.U8.load(arcdata)
 
+    try:
+        comptiledata = arc['BG_tex/%s_tex.bin.LZ' % name]
+        arc['BG_chk/d_bgchk_%s.bin' % name]
+    except:
+        raise TilesetError('Err_CorruptedTilesetData')
+
+    # decompress the textures
+    tiledata = tpl.decodeRGB4A3(lz77.UncompressLZ77(comptiledata), 1024, 256, False)
+
+    # load the object definitions
+    defs = [None] * 256
+
+    indexfile = arc['BG_unt/%s_hd.bin' % name]
+    deffile = arc['BG_unt/%s.bin' % name]
+    objcount = len(indexfile) // 4
+    indexstruct = struct.Struct('>HBB')
+    tileoffset = idx * 256
+
+    for i in range(objcount):
+        data = indexstruct.unpack_from(indexfile, i << 2)
+        obj = ObjectDef()
+        obj.width = data[1]
+        obj.height = data[2]
+        obj.load(deffile, data[0], tileoffset)
+        defs[i] = obj
+
+    return arcname, arc, tiledata, defs
+
+
+def LoadTileset(idx, name, reload_=False, data=None):
+    """
+    Load in a tileset into a specific slot. data can be the result of
+    ReadTileset (or the TilesetError it raised), if the tileset has already
+    been read in the background.
+    """
+    if not name:
+        return False
+
+    try:
+        if data is None:
+            arcname, compressed = FindTileset(name)
+
+            # if this file's already loaded, return
+            if globals_.TilesetFilesLoaded[idx] == arcname and not reload_: return
+
+            data = ReadTileset(idx, name, arcname, compressed)
+
+        elif isinstance(data, Exception):
+            raise data
+
+    except TilesetError as e:
+        QtWidgets.QMessageBox.warning(None, globals_.trans.string(e.section, 0),
+                                      globals_.trans.string(e.section, 1, '[file]', name))
+        return False
+
+    arcname, arc, tiledata, defs = data
+
+    # if this file's already loaded, return
+    if globals_.TilesetFilesLoaded[idx] == arcname and not reload_: return
+
     def exists(fn):
         nonlocal arc
         try:
@@ -899,20 +1098,10 @@ def LoadTileset(idx, name, reload_=False):
             return False
         return True
 
-    # decompress the textures
-    found = exists('BG_tex/%s_tex.bin.LZ' % name)
-    found2 = exists('BG_chk/d_bgchk_%s.bin' % name)
-
-    if found and found2:
-        comptiledata = arc['BG_tex/%s_tex.bin.LZ' % name]
-        colldata = arc['BG_chk/d_bgchk_%s.bin' % name]
-    else:
-        QtWidgets.QMessageBox.warning(None, globals_.trans.string('Err_CorruptedTilesetData', 0),
-                                      globals_.trans.string('Err_CorruptedTilesetData', 1, '[file]', name))
-        return False
+    colldata = arc['BG_chk/d_bgchk_%s.bin' % name]
 
     # load in the textures
-    img = LoadTexture_NSMBW(lz77.UncompressLZ77(comptiledata))
+    img = LoadTexture_NSMBW(tiledata)
 
     # Divide it into individual tiles and
     # add collisions at the same time
@@ -1027,23 +1216,8 @@ def LoadTileset(idx, name, reload_=False):
             col = 0
             row += 1
 
-    # load the object definitions
-    defs = [None] * 256
-
-    indexfile = arc['BG_unt/%s_hd.bin' % name]
-    deffile = arc['BG_unt/%s.bin' % name]
-    objcount = len(indexfile) // 4
-    indexstruct = struct.Struct('>HBB')
-
-    for i in range(objcount):
-        data = indexstruct.unpack_from(indexfile, i << 2)
-        obj = ObjectDef()
-        obj.width = data[1]
-        obj.height = data[2]
-        obj.load(deffile, data[0], tileoffset)
-        defs[i] = obj
-
     globals_.ObjectDefinitions[idx] = defs
+    RenderObjectCache.ClearSlot(idx)
 
     ProcessOverrides(idx, name)
 
@@ -1056,9 +1230,7 @@ def LoadTileset(idx, name, reload_=False):
     return True
 
 
-def LoadTexture_NSMBW(tiledata):
-    data = tpl.decodeRGB4A3(tiledata, 1024, 256, False)
-
+def LoadTexture_NSMBW(data):
     # nsmblib returns the image data with premultiplied alpha, while the cython
     # and python implementations do not. As such, we have to set the correct
     # format for Qt - ARGB32 premultiplied if nsmblib is used, and ARGB32 by
@@ -1129,6 +1301,7 @@ def UnloadTileset(idx):
     globals_.Tiles[tileoffset:tileoffset + 256] = [None] * 256
     globals_.ObjectDefinitions[idx] = [None] * 256
     globals_.TilesetFilesLoaded[idx] = None
+    RenderObjectCache.ClearSlot(idx)
 
 
 def ProcessOverrides(idx, name):
@@ -1181,6 +1354,7 @@ def ProcessOverrides(idx, name):
         for i, a in zip(rangeA, range(2, 12)):
             t[replace].main = overlay(baseblock, globals_.Overrides_safe[a].main)
             defs[i].rows[0][0] = (0, replace, 0)
+            defs[i].Compile()
             replace += 1
 
         replace += 1
@@ -1189,6 +1363,7 @@ def ProcessOverrides(idx, name):
         for i, a in zip(rangeB, (1, 12, 2, 3, 13, 5, 7, 8, 9, 10, 11)):
             t[replace].main = overlay(baseblock, globals_.Overrides_safe[a].main)
             defs[i].rows[0][0] = (0, replace, 0)
+            defs[i].Compile()
             replace += 1
 
         # now the extra stuff (invisible collisions etc)
@@ -349,6 +349,8 @@ class ReggieTranslation:
                 8: 'Save Copy: Choose a new filename',
                 9: 'All Supported Level Archives',
                 10: 'LZ-Compressed Level Archives',
+                11: 'Record Paint Profile: Choose a filename',
+                12: 'Comma-Separated Values',
             },
             'Gamedefs': {
                 0: 'This game has custom sprite images',
@@ -559,6 +561,12 @@ class ReggieTranslation:
                 139: 'Reload the spritedata file, including any changes made since the level was loaded',
                 140: 'Camera Profiles...',
                 141: 'Edit event-activated camera settings',
+                142: 'Search Stage Folder...',
+                143: 'Search all levels in the Stage folder for sprites, tilesets or level information',
+                144: 'Paint Profiler',
+                145: 'Show how long the level view takes to paint, and which sprite images are the slowest to paint',
+                146: 'Record Paint Profile...',
+                147: 'Record the paint profiler stats of every frame to a CSV file',
             },
             'Objects': {
                 0: '[b]Tileset [tileset], object [obj]:[/b][br][width]x[height] on layer [layer]',
@@ -670,6 +678,7 @@ class ReggieTranslation:
                 39: 'Insert new path node after selected node',
                 40: 'Themes',
                 41: 'Theme:',
+                42: 'Draw the level view with OpenGL',
             },
             'ScrShtDlg': {
                 0: 'Choose a Screenshot source',
@@ -680,6 +689,10 @@ class ReggieTranslation:
                 5: 'Hide background',
                 6: 'Save image to file',
                 7: 'Copy image',
+                8: 'Scale',
+                9: 'Rendering screenshot...',
+                10: 'Screenshot Failed',
+                11: 'The screenshot could not be saved:[br][error]',
             },
             'ShftItmDlg': {
                 0: 'Shift Items',
@@ -1001,6 +1014,32 @@ class ReggieTranslation:
                 5: 'Triggering Event ID:',
                 6: '[b]Triggering Event ID:[/b][br]Sets the event ID that will trigger the camera profile. If switching away from a different profile, the previous profile\'s event ID will be automatically deactivated (so the game doesn\'t instantly switch back to it).',
                 7: 'Camera Profile on Event [id]',
+            },
+            'StageSearchDlg': {
+                0: 'Search Stage Folder',
+                1: 'Sprite ID',
+                2: 'Tileset',
+                3: 'Level Information',
+                4: 'Search',
+                5: 'Rebuild Index',
+                6: 'Level',
+                7: 'Area',
+                8: 'Details',
+                9: 'Indexing the Stage folder...',
+                10: 'Cancel',
+                11: '[count] level(s) indexed',
+                12: 'Used [count] time(s)',
+                13: '[count] result(s)',
+                14: 'The Stage folder could not be found. Please set the game path first.',
+            },
+            'SaveProgress': {
+                0: 'Saving... %p%',
+                1: 'The level is still being saved. Please try again once it has been saved.',
+            },
+            'LevelLoadDlg': {
+                0: 'Reading [file]...',
+                1: 'Loading [file]...',
+                2: 'Cancel',
             }
         }
 
@@ -44,6 +44,9 @@ class UndoStack:
         act.undo()
         self.futureActions.append(act)
 
+        if globals_.Journal is not None:
+            globals_.Journal.RecordAction(act, True)
+
         self.enableOrDisableMenuItems()
 
     def redo(self):
@@ -60,6 +63,9 @@ class UndoStack:
         act.redo()
         self.pastActions.append(act)
 
+        if globals_.Journal is not None:
+            globals_.Journal.RecordAction(act)
+
         self.enableOrDisableMenuItems()
 
     def enableOrDisableMenuItems(self):
@@ -178,7 +184,7 @@ class MoveItemUndoAction(UndoAction):
             obj.objx, obj.objy = newX, newY
             obj.setPos(newX * 1.5, newY * 1.5)
 
-        globals_.mainWindow.levelOverview.update()
+        globals_.mainWindow.levelOverview.Invalidate()
 
     def isExtentionOf(self, other):
         """
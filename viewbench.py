@@ -0,0 +1,158 @@
+import random
+import time
+import tracemalloc
+
+from PyQt5 import QtWidgets
+
+import globals_
+import tiles
+from layerindex import LayerIndex
+from levelitems import ObjectItem
+
+# How many frames are drawn for each viewport
+BENCHMARK_FRAMES = 120
+
+# How many objects the object benchmark creates
+BENCHMARK_OBJECTS = 10000
+
+# Object sizes (width, height) the render benchmark renders every object at
+BENCHMARK_RENDER_SIZES = ((1, 1), (4, 4), (16, 4), (64, 8), (256, 16), (512, 32))
+
+
+def TimeFrames(view, frames):
+    """
+    Scrolls the view diagonally across the level, drawing it synchronously at
+    every step. Returns the frame times, in milliseconds.
+    """
+    xbar = view.horizontalScrollBar()
+    ybar = view.verticalScrollBar()
+    viewport = view.viewport()
+    opengl = isinstance(viewport, QtWidgets.QOpenGLWidget)
+
+    times = []
+    for frame in range(frames):
+        xbar.setValue(xbar.minimum() + (xbar.maximum() - xbar.minimum()) * frame // frames)
+        ybar.setValue(ybar.minimum() + (ybar.maximum() - ybar.minimum()) * frame // frames)
+
+        start = time.perf_counter()
+        viewport.repaint()
+
+        if opengl:
+            # Wait until the GPU (or Mesa) has actually drawn the frame
+            viewport.makeCurrent()
+            viewport.context().functions().glFinish()
+            viewport.doneCurrent()
+
+        times.append((time.perf_counter() - start) * 1000)
+
+    return times
+
+
+def RunViewBenchmark(view, frames=BENCHMARK_FRAMES):
+    """
+    Draws the level view with the raster engine and with OpenGL, and prints
+    the frame times of both. Each viewport scrolls across the level once to
+    fill the tile cache before it is timed.
+    """
+    xpos = view.horizontalScrollBar().value()
+    ypos = view.verticalScrollBar().value()
+
+    results = []
+    for name, opengl in (('Raster', False), ('OpenGL', True)):
+        if view.setOpenGL(opengl) != opengl:
+            print('%s: not available' % name)
+            continue
+
+        TimeFrames(view, frames)
+        times = sorted(TimeFrames(view, frames))
+        results.append((name, times))
+
+    view.setOpenGL(globals_.UseOpenGL)
+    view.horizontalScrollBar().setValue(xpos)
+    view.verticalScrollBar().setValue(ypos)
+
+    print('Level view benchmark (%d frames, zoom %d%%)' % (frames, globals_.mainWindow.ZoomLevel))
+    for name, times in results:
+        print('%-8s mean %7.2f ms   median %7.2f ms   95th percentile %7.2f ms' % (
+            name, sum(times) / len(times), times[len(times) // 2], times[len(times) * 95 // 100],
+        ))
+
+
+def RunObjectBenchmark(count=BENCHMARK_OBJECTS):
+    """
+    Creates objects like loading an area with that many objects does, and
+    prints how long it took and how much memory each object uses. The objects
+    are of types the open area already uses, and are never added to the area.
+    """
+    types = {(obj.tileset, obj.type) for layer in globals_.Area.layers for obj in layer}
+    types = sorted(types) or [(0, 0)]
+
+    rand = random.Random(0)
+    records = []
+    for i in range(count):
+        tileset, type = rand.choice(types)
+        records.append((tileset, type, rand.randrange(1024 - 8), rand.randrange(512 - 8), rand.randint(1, 8), rand.randint(1, 8)))
+
+    index = LayerIndex()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    # The index of the open area ignores objects that were never added to it
+    objects = [ObjectItem(tileset, type, 0, x, y, width, height, i) for i, (tileset, type, x, y, width, height) in enumerate(records)]
+    for obj in objects:
+        index.Add(obj)
+
+    spent = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print('Object benchmark (%d objects)' % count)
+    print('Created in %.1f ms, %.2f us per object' % (spent * 1000, spent * 1000000 / count))
+    print('%d bytes per object (Python objects only, without Qt\'s own data)' % (used // count))
+
+
+def TimeRenders(render, objects, width, height):
+    """
+    Renders every (tileset, type) at a size, and returns the mean time per
+    render in milliseconds
+    """
+    start = time.perf_counter()
+
+    for tileset, type in objects:
+        render(tileset, type, width, height)
+
+    return (time.perf_counter() - start) * 1000 / len(objects)
+
+
+def RunRenderBenchmark(sizes=BENCHMARK_RENDER_SIZES):
+    """
+    Renders every standard object of the loaded tilesets at a few sizes, and
+    prints the mean time per render without the render cache, and with the
+    object already in it
+    """
+    objects = []
+    for tileset, defs in enumerate(globals_.ObjectDefinitions):
+        if defs is None: continue
+
+        for type in range(len(defs)):
+            obj = tiles.FindObjectDef(tileset, type)
+            if obj is not None and not obj.slope:
+                objects.append((tileset, type))
+
+    if not objects:
+        print('Render benchmark: no objects loaded')
+        return
+
+    renderers = [('Uncached', tiles.RenderObjectUncached), ('Cached', tiles.RenderObject)]
+
+    print('Render benchmark (%d objects, ms per render)' % len(objects))
+    print('%-10s' % 'Size' + ''.join('%14s' % name for name, render in renderers))
+
+    for width, height in sizes:
+        # Fill the cache, so the cached column only measures hits
+        TimeRenders(tiles.RenderObject, objects, width, height)
+
+        times = [TimeRenders(render, objects, width, height) for name, render in renderers]
+        print('%-10s' % ('%dx%d' % (width, height)) + ''.join('%14.4f' % ms for ms in times))
@@ -0,0 +1,98 @@
+import threading
+
+from PyQt5 import QtCore
+
+
+class WorkerSignals(QtCore.QObject):
+    """
+    Signals emitted by a Worker. QRunnable is not a QObject, so it can't
+    define signals itself.
+    """
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+    progress = QtCore.pyqtSignal(int, int)
+
+
+class Worker(QtCore.QRunnable):
+    """
+    Runs a function on the global thread pool. The return value (or the
+    exception that was raised) is delivered to the GUI thread through the
+    signals. The function must not touch any widgets or level items.
+    """
+    # Workers that haven't reported back yet. Keeping a reference here
+    # prevents them (and their signals) from being garbage collected while
+    # the queued signals are still on their way to the GUI thread.
+    running = set()
+
+    def __init__(self, function, *args, **kwargs):
+        """
+        Creates the worker
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.done = threading.Event()
+
+        self.signals.finished.connect(self._done)
+        self.signals.failed.connect(self._done)
+
+    def run(self):
+        """
+        Runs the function. This is called from a thread of the pool.
+        """
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            self.done.set()
+
+    def emitProgress(self, done, total):
+        """
+        Progress callback that can be passed to the function
+        """
+        self.signals.progress.emit(done, total)
+
+    def start(self):
+        """
+        Queues the worker on the global thread pool
+        """
+        Worker.running.add(self)
+        QtCore.QThreadPool.globalInstance().start(self)
+
+    def wait(self):
+        """
+        Blocks until the function has returned, and delivers its result to the
+        connected callbacks right away
+        """
+        self.done.wait()
+        QtCore.QCoreApplication.sendPostedEvents()
+
+    def _done(self, result):
+        Worker.running.discard(self)
+
+
+def RunInBackground(function, *args, finished=None, failed=None, progress=None, **kwargs):
+    """
+    Helper function that runs function(*args, **kwargs) on a worker thread and
+    connects the given callbacks, which are called on the GUI thread. If a
+    progress callback is given, the function is passed a 'progress' keyword
+    argument it can call with (done, total).
+    """
+    worker = Worker(function, *args, **kwargs)
+
+    if finished is not None: worker.signals.finished.connect(finished)
+    if failed is not None: worker.signals.failed.connect(failed)
+
+    if progress is not None:
+        worker.signals.progress.connect(progress)
+        worker.kwargs['progress'] = worker.emitProgress
+
+    worker.start()
+    return worker